@@ -0,0 +1,123 @@
+"""
+Benchmark: GET /api/events listing for an organizer with 500 events.
+
+Compares the old per-event count_documents loop with the single query used
+by get_events (media counts come from the denormalized per-event counters),
+reporting Mongo round-trips and p50/p99 latency.
+
+Needs a local mongod. Run from backend/:
+    MONGO_URL=mongodb://localhost:27017 python -m benchmarks.bench_event_listing
+"""
+import asyncio
+import os
+import random
+import statistics
+import time
+from datetime import datetime, timezone, timedelta
+
+from pymongo import monitoring
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ["DB_NAME"] = os.environ.get("BENCH_DB_NAME", "snapvault_bench")
+os.environ.setdefault("UPLOAD_DIR", "/tmp/snapvault-bench-uploads")
+
+EVENTS = 500
+ITERATIONS = 50
+
+
+class RoundTripCounter(monitoring.CommandListener):
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+counter = RoundTripCounter()
+monitoring.register(counter)
+
+import server  # noqa: E402  (must be imported after the listener is registered)
+
+db = server.db
+ORGANIZER_ID = "bench-organizer"
+
+
+async def seed():
+    await db.events.delete_many({"organizer_id": ORGANIZER_ID})
+    await db.media.delete_many({"uploader_name": "bench"})
+    now = datetime.now(timezone.utc)
+    events = [{
+        "title": f"Bench Event {i}",
+        "event_type": "wedding",
+        "template": "golden_elegance",
+        "slug": f"bench{i:04d}",
+        "organizer_id": ORGANIZER_ID,
+        "is_paid": False,
+        "payment_status": "unpaid",
+        "created_at": (now - timedelta(minutes=i)).isoformat(),
+    } for i in range(EVENTS)]
+    for e in events:
+        e["media_count"] = random.randint(0, 20)
+    result = await db.events.insert_many(events)
+    media = []
+    for e, oid in zip(events, result.inserted_ids):
+        for _ in range(e["media_count"]):
+            media.append({
+                "event_id": str(oid),
+                "filename": "x.jpg",
+                "original_name": "x.jpg",
+                "file_type": "image",
+                "file_size": 1,
+                "uploader_name": "bench",
+                "created_at": now.isoformat(),
+            })
+    if media:
+        await db.media.insert_many(media)
+
+
+async def legacy_listing():
+    events = await db.events.find({"organizer_id": ORGANIZER_ID}).sort("created_at", -1).to_list(EVENTS)
+    return [
+        server.fmt_event(e, await db.media.count_documents({"event_id": str(e["_id"])}))
+        for e in events
+    ]
+
+
+async def pipeline_listing():
+    pipeline = server.event_listing_pipeline({"organizer_id": ORGANIZER_ID}, server.MAX_PAGE_SIZE)
+    events = await db.events.aggregate(pipeline).to_list(EVENTS + 1)
+    return [server.fmt_event(e) for e in events]
+
+
+async def measure(name, fn):
+    timings = []
+    counter.count = 0
+    for _ in range(ITERATIONS):
+        start = time.perf_counter()
+        rows = await fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    round_trips = counter.count / ITERATIONS
+    timings.sort()
+    p99 = timings[max(0, int(len(timings) * 0.99) - 1)]
+    print(f"{name:<10} rows={len(rows):<4} round_trips={round_trips:<6.0f} "
+          f"p50={statistics.median(timings):7.1f}ms p99={p99:7.1f}ms")
+    return rows
+
+
+async def main():
+    await seed()
+    legacy = await measure("legacy", legacy_listing)
+    current = await measure("pipeline", pipeline_listing)
+    assert legacy == current, "pipeline listing must match the legacy response shape"
+    await db.events.delete_many({"organizer_id": ORGANIZER_ID})
+    await db.media.delete_many({"uploader_name": "bench"})
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
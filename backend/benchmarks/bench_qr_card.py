@@ -0,0 +1,96 @@
+"""
+Benchmark: time to render one printable QR card (without PNG encoding).
+
+"uncached" is the renderer as it was before qrcards.CardAssets. It loads the
+fonts, opens and LANCZOS-resizes the background and composites the panel on
+every call, and resamples a box_size=10 QR code down to size. "cached" is
+qrcards.render_card with assets preloaded, as the server runs it. Needs Pillow
+and qrcode. Run from backend/:
+    python -m benchmarks.bench_qr_card          # 20 cards per template and size
+    python -m benchmarks.bench_qr_card 100
+"""
+import statistics
+import sys
+import time
+
+import qrcode
+from PIL import Image, ImageDraw, ImageFont
+
+import qrcards
+from qrcards import QR_CARD_TEMPLATES, QR_CARD_SIZES, TEMPLATE_DIR, FONT_FILES, hex_to_rgb, resolve_template
+
+TITLE = "Sophie & James"
+SUBTITLE = "20th June 2026 · The Old Rectory"
+URL = "https://snapvault.uk/e/abcd1234"
+
+
+def render_uncached(event_type, template_key, size_key, event_title, event_subtitle, guest_url):
+    tmpl = resolve_template(event_type, template_key)
+    width, height = QR_CARD_SIZES[size_key]
+    border_rgb, text_rgb = hex_to_rgb(tmpl["borderColor"]), hex_to_rgb(tmpl["textColor"])
+    accent_rgb = hex_to_rgb(tmpl["accentColor"])
+    bg_path = TEMPLATE_DIR / tmpl["bgImage"] if tmpl.get("bgImage") else None
+    has_bg_image = bool(bg_path and bg_path.exists())
+    if has_bg_image:
+        img = Image.open(bg_path).convert("RGB").resize((width, height), Image.LANCZOS)
+        overlay = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+        panel = (0, 0, 0, 100) if tmpl["bgColor"].lower() in qrcards.DARK_BACKGROUNDS else (255, 255, 255, 180)
+        ImageDraw.Draw(overlay).rounded_rectangle(
+            [int(width * 0.12), int(height * 0.04), width - int(width * 0.12), height - int(height * 0.04)],
+            radius=20, fill=panel)
+        img = Image.alpha_composite(img.convert("RGBA"), overlay).convert("RGB")
+    else:
+        img = Image.new("RGB", (width, height), hex_to_rgb(tmpl["bgColor"]))
+        ImageDraw.Draw(img).rectangle([3, 3, width - 3, height - 3], outline=border_rgb, width=6)
+    draw = ImageDraw.Draw(img)
+    fonts = {}
+    for name, size in qrcards.font_sizes(width, has_bg_image).items():
+        try:
+            fonts[name] = ImageFont.truetype(FONT_FILES[name], size)
+        except OSError:
+            fonts[name] = ImageFont.load_default()
+    for y, text, font, fill in [(0.07, qrcards.HEADERS[event_type], "sans_reg", accent_rgb),
+                                (0.13, event_title, "serif_bold", text_rgb),
+                                (0.22, event_subtitle, "sans_reg", accent_rgb)]:
+        qrcards.draw_centered(draw, width, int(height * y), text, fonts[font], fill)
+    qr = qrcode.QRCode(version=1, error_correction=qrcode.constants.ERROR_CORRECT_H, box_size=10, border=2)
+    qr.add_data(guest_url)
+    qr.make(fit=True)
+    qr_size = int(min(width, height) * 0.38)
+    qr_img = qr.make_image(fill_color="black", back_color="white").convert("RGB").resize((qr_size, qr_size), Image.LANCZOS)
+    qr_x, qr_y = (width - qr_size) // 2, (height - qr_size) // 2 + int(height * 0.02)
+    draw.rounded_rectangle([qr_x - 16, qr_y - 16, qr_x + qr_size + 16, qr_y + qr_size + 16],
+                           radius=12, fill=(255, 255, 255), outline=border_rgb, width=4)
+    img.paste(qr_img, (qr_x, qr_y))
+    for y, text, font, fill in [(0.82, "Scan to Upload", "sans_bold", text_rgb),
+                                (0.88, "Photos & Videos", "sans_reg", accent_rgb),
+                                (0.93, "SnapVault", "sans_reg", accent_rgb)]:
+        qrcards.draw_centered(draw, width, int(height * y), text, fonts[font], fill)
+    return img
+
+
+def time_cards(render, repeat: int) -> list:
+    timings = []
+    for event_type, templates in QR_CARD_TEMPLATES.items():
+        for template_key in templates:
+            for size_key in QR_CARD_SIZES:
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    render(event_type, template_key, size_key, TITLE, SUBTITLE, URL)
+                    timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    start = time.perf_counter()
+    backgrounds = qrcards.assets.preload()
+    print(f"preload   {backgrounds} backgrounds in {(time.perf_counter() - start) * 1000:.0f}ms (once, at startup)")
+    for name, render in (("uncached", render_uncached), ("cached", qrcards.render_card)):
+        timings = sorted(time_cards(render, repeat))
+        print(f"{name:<9} cards={len(timings):5d} mean={statistics.mean(timings):7.2f}ms "
+              f"p50={timings[len(timings) // 2]:7.2f}ms p99={timings[int(len(timings) * 0.99)]:7.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark: peak RSS of the gallery ZIP download as the archive grows.
+
+Each size runs in a fresh child process so ru_maxrss reflects that run alone.
+"stream" is ZipStream as used by /events/{id}/download; "buffered" is the old
+zipfile-into-BytesIO approach. Only needs the standard library. Run from backend/:
+    python -m benchmarks.bench_zip_memory            # 64, 256, 1024 MB
+    python -m benchmarks.bench_zip_memory 128 2048
+"""
+import asyncio
+import io
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+FILE_MB = 8
+DEFAULT_SIZES_MB = [64, 256, 1024]
+
+
+def make_files(root: Path, total_mb: int) -> list:
+    paths = []
+    block = os.urandom(1024 * 1024)
+    for i in range(max(1, total_mb // FILE_MB)):
+        path = root / f"photo_{i:04d}.jpg"
+        with open(path, "wb") as f:
+            for _ in range(FILE_MB):
+                f.write(block)
+        paths.append(path)
+    return paths
+
+
+async def run_stream(paths: list) -> int:
+    from zipstream import ZipStream
+    zs = ZipStream()
+    written = 0
+    with open(os.devnull, "wb") as sink:
+        for path in paths:
+            async for chunk in zs.add_file(path.name, path):
+                sink.write(chunk)
+                written += len(chunk)
+        tail = zs.finish()
+        sink.write(tail)
+    return written + len(tail)
+
+
+def run_buffered(paths: list) -> int:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        for path in paths:
+            zf.write(path, path.name)
+    return buf.getbuffer().nbytes
+
+
+def child(mode: str, total_mb: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = make_files(Path(tmp), total_mb)
+        baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        start = time.perf_counter()
+        size = asyncio.run(run_stream(paths)) if mode == "stream" else run_buffered(paths)
+        elapsed = time.perf_counter() - start
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux
+    print(f"{mode:<9} archive={size / 2**20:8.0f}MB peak_rss={peak / 1024:7.1f}MB "
+          f"(+{(peak - baseline) / 1024:6.1f}MB over baseline) time={elapsed:6.2f}s")
+
+
+def main():
+    if len(sys.argv) == 4 and sys.argv[1] == "--child":
+        child(sys.argv[2], int(sys.argv[3]))
+        return
+    sizes = [int(a) for a in sys.argv[1:]] or DEFAULT_SIZES_MB
+    for total_mb in sizes:
+        for mode in ("stream", "buffered"):
+            subprocess.run([sys.executable, "-m", "benchmarks.bench_zip_memory", "--child", mode, str(total_mb)],
+                           check=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Content-addressed, reference-counted media blobs.
+
+Every upload is hashed (SHA-256) while it streams. blobs holds one document
+per distinct content per event, keyed by (event_id, sha256), with the stored
+file it lives in and a count of the media docs pointing at it. Uploading bytes
+the event already has adds a reference instead of a second copy. Deleting
+media drops a reference, and the blob's files are removed with the last one.
+
+A blob's sha256 and length are those of what was uploaded. What is stored may
+have been transcoded since, so filename/size/crc32 follow the stored file.
+Files keep their unique upload names, which keeps them immutable for caching.
+"""
+import hashlib
+import zlib
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def file_digests(path: Path, chunk_size: int = CHUNK_SIZE) -> tuple:
+    """(crc32, sha256 hex) of a file, in one pass."""
+    crc, sha = 0, hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            crc = zlib.crc32(chunk, crc)
+            sha.update(chunk)
+    return crc, sha.hexdigest()
+
+
+class BlobStore:
+    def __init__(self, collection):
+        self.blobs = collection
+
+    async def acquire(self, event_id: str, sha256: str, filename: str, size: int, crc: int) -> tuple:
+        """
+        Add a reference to the event's blob with this content, creating it (stored
+        as `filename`) if there is none. Returns (blob, created); when created is
+        False the caller's copy of the bytes is redundant.
+        """
+        for _ in range(2):
+            try:
+                blob = await self.blobs.find_one_and_update(
+                    {"event_id": event_id, "sha256": sha256},
+                    {"$inc": {"refs": 1}, "$setOnInsert": {
+                        "length": size, "filename": filename, "size": size, "crc32": crc, "renditions": [],
+                        "created_at": datetime.now(timezone.utc).isoformat(),
+                    }},
+                    upsert=True, return_document=ReturnDocument.AFTER,
+                )
+                return blob, blob["filename"] == filename
+            except DuplicateKeyError:
+                continue  # a concurrent upload of the same bytes created it first; add to that one
+        raise RuntimeError(f"Could not reference blob {sha256} in event {event_id}")
+
+    async def add_ref(self, event_id: str, sha256: str, length: int) -> Optional[dict]:
+        """Reference content the event already has by its hash alone; None if it has none."""
+        return await self.blobs.find_one_and_update(
+            {"event_id": event_id, "sha256": sha256, "length": length, "refs": {"$gt": 0}},
+            {"$inc": {"refs": 1}}, return_document=ReturnDocument.AFTER,
+        )
+
+    async def release(self, blob_id) -> Optional[dict]:
+        """Drop a reference. Returns the blob if that was the last one: its files are now garbage."""
+        blob = await self.blobs.find_one_and_update(
+            {"_id": blob_id, "refs": {"$gt": 0}}, {"$inc": {"refs": -1}},
+            return_document=ReturnDocument.AFTER,
+        )
+        if not blob or blob["refs"] > 0:
+            return None
+        # Only collect it if nobody referenced it again in between
+        return await self.blobs.find_one_and_delete({"_id": blob_id, "refs": 0})
+
+    async def update_stored(self, blob_id, fields: dict, expected_filename: Optional[str] = None) -> bool:
+        """Record a new stored file or renditions for the blob (after a transcode or thumbnail job)."""
+        query = {"_id": blob_id}
+        if expected_filename:
+            query["filename"] = expected_filename
+        result = await self.blobs.update_one(query, {"$set": fields})
+        return bool(result.matched_count)
@@ -0,0 +1,155 @@
+"""
+Durable background job queue stored in MongoDB.
+
+A job is claimed by atomically flipping it to "running" with a lease. The
+worker holding it renews the lease with heartbeats. If the worker dies, the
+lease expires and another worker reclaims the job (visibility timeout).
+Failures are retried with exponential backoff up to max_attempts, after which
+the job is marked failed. Because all state lives in the jobs collection,
+queued and half-finished jobs survive server and worker restarts.
+"""
+from datetime import datetime, timezone, timedelta
+from typing import Optional
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def claim_filter(kinds: list, now: datetime) -> dict:
+    """Runnable jobs of `kinds`: queued and due, or running with an expired lease, with attempts left."""
+    return {
+        "kind": {"$in": kinds},
+        "run_at": {"$lte": now},
+        "$or": [
+            {"status": QUEUED},
+            {"status": RUNNING, "lease_until": {"$lt": now}},
+        ],
+        "$expr": {"$lt": ["$attempts", "$max_attempts"]},
+    }
+
+
+# claim() takes the job due soonest
+CLAIM_SORT = [("run_at", 1)]
+
+
+def expired_filter(now: datetime) -> dict:
+    """Running jobs whose lease expired on their last allowed attempt."""
+    return {
+        "status": RUNNING,
+        "lease_until": {"$lt": now},
+        "$expr": {"$gte": ["$attempts", "$max_attempts"]},
+    }
+
+
+class JobQueue:
+    def __init__(self, collection, visibility_timeout: int = 120, max_attempts: int = 3,
+                 backoff_base: int = 30):
+        self.jobs = collection
+        self.visibility_timeout = timedelta(seconds=visibility_timeout)
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+
+    def _job(self, kind: str, payload: dict, delay: int = 0, job_id: Optional[ObjectId] = None) -> dict:
+        now = utcnow()
+        return {
+            "_id": job_id or ObjectId(),
+            "kind": kind,
+            "payload": payload,
+            "status": QUEUED,
+            "attempts": 0,
+            "max_attempts": self.max_attempts,
+            "run_at": now + timedelta(seconds=delay),
+            "lease_until": None,
+            "worker_id": None,
+            "progress": 0.0,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+        }
+
+    async def enqueue(self, kind: str, payload: dict, delay: int = 0,
+                      job_id: Optional[ObjectId] = None) -> ObjectId:
+        result = await self.jobs.insert_one(self._job(kind, payload, delay, job_id))
+        return result.inserted_id
+
+    async def enqueue_many(self, jobs: list) -> list:
+        """Queue (kind, payload, job_id) jobs with one insert."""
+        if not jobs:
+            return []
+        result = await self.jobs.insert_many([self._job(kind, payload, job_id=job_id) for kind, payload, job_id in jobs])
+        return result.inserted_ids
+
+    async def claim(self, worker_id: str, kinds: list) -> Optional[dict]:
+        """Lease the next runnable job: queued and due, or running with an expired lease."""
+        now = utcnow()
+        return await self.jobs.find_one_and_update(
+            claim_filter(kinds, now),
+            {
+                "$set": {"status": RUNNING, "worker_id": worker_id,
+                         "lease_until": now + self.visibility_timeout, "updated_at": now},
+                "$inc": {"attempts": 1},
+            },
+            sort=CLAIM_SORT,
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def heartbeat(self, job: dict, progress: Optional[float] = None) -> bool:
+        """Extend the lease (and record progress); False if the lease was lost to another worker."""
+        now = utcnow()
+        update = {"lease_until": now + self.visibility_timeout, "updated_at": now}
+        if progress is not None:
+            update["progress"] = progress
+        result = await self.jobs.update_one(
+            {"_id": job["_id"], "worker_id": job["worker_id"], "status": RUNNING},
+            {"$set": update},
+        )
+        return result.matched_count == 1
+
+    async def complete(self, job: dict, result: Optional[dict] = None):
+        await self.jobs.update_one(
+            {"_id": job["_id"], "worker_id": job["worker_id"]},
+            {"$set": {"status": DONE, "progress": 1.0, "result": result or {},
+                      "lease_until": None, "updated_at": utcnow()}},
+        )
+
+    async def fail(self, job: dict, error: str) -> bool:
+        """Record a failed attempt. Returns True if the job is out of attempts."""
+        exhausted = job["attempts"] >= job["max_attempts"]
+        update = {"error": error, "lease_until": None, "updated_at": utcnow()}
+        if exhausted:
+            update["status"] = FAILED
+        else:
+            update["status"] = QUEUED
+            update["run_at"] = utcnow() + timedelta(seconds=self.backoff_base * 2 ** (job["attempts"] - 1))
+        await self.jobs.update_one({"_id": job["_id"], "worker_id": job["worker_id"]}, {"$set": update})
+        return exhausted
+
+    async def release(self, job: dict):
+        """Hand a job back untouched (worker shutting down); the attempt is not counted."""
+        await self.jobs.update_one(
+            {"_id": job["_id"], "worker_id": job["worker_id"], "status": RUNNING},
+            {"$set": {"status": QUEUED, "lease_until": None, "worker_id": None, "updated_at": utcnow()},
+             "$inc": {"attempts": -1}},
+        )
+
+    async def expired(self, limit: int = 100) -> list:
+        """Running jobs whose lease expired on their last allowed attempt (the worker died)."""
+        return await self.jobs.find(expired_filter(utcnow())).to_list(limit)
+
+    async def mark_failed(self, job: dict, error: str):
+        await self.jobs.update_one(
+            {"_id": job["_id"], "status": RUNNING, "lease_until": job["lease_until"]},
+            {"$set": {"status": FAILED, "error": error, "lease_until": None, "updated_at": utcnow()}},
+        )
+
+    async def get(self, job_id) -> Optional[dict]:
+        return await self.jobs.find_one({"_id": ObjectId(job_id)})
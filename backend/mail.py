@@ -0,0 +1,194 @@
+"""
+Outbound email: templates, reused SMTP connections and a durable outbox.
+
+Messages are rendered from the Jinja2 templates in templates/email, compiled
+once at import, and queued in an outbox collection driven by a JobQueue of
+its own. The API drains the outbox in the background and retries failures
+with the queue's exponential backoff, so a slow or unreachable mail server
+never holds up a request.
+
+SMTPPool keeps up to `size` authenticated connections open between messages.
+A connection is replaced when it drops, when it has been idle too long, or
+when the SMTP settings change. Settings are read through SettingsCache, which
+the admin routes invalidate on save. Other processes pick up a change within
+its TTL.
+"""
+import asyncio
+import time
+from email.mime.image import MIMEImage
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from pathlib import Path
+from typing import Optional
+
+import aiosmtplib
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+TEMPLATE_DIR = Path(__file__).parent / "templates" / "email"
+EMAIL = "email"
+
+env = Environment(loader=FileSystemLoader(TEMPLATE_DIR), autoescape=select_autoescape(["html"]))
+TEMPLATES = {name: env.get_template(f"{name}.html") for name in ("qr_card", "password_reset", "smtp_test")}
+
+
+def render(template: str, **context) -> str:
+    return TEMPLATES[template].render(**context)
+
+
+def is_configured(settings: Optional[dict]) -> bool:
+    return bool(settings and settings.get("smtp_password"))
+
+
+def build_message(sender: str, to: str, subject: str, html: str, attachments=()) -> MIMEMultipart:
+    """attachments: {"filename", "subtype", "content"} dicts, as stored in the outbox."""
+    msg = MIMEMultipart()
+    msg["From"] = sender
+    msg["To"] = to
+    msg["Subject"] = subject
+    msg.attach(MIMEText(html, "html"))
+    for a in attachments:
+        part = MIMEImage(a["content"], _subtype=a["subtype"], name=a["filename"])
+        part.add_header("Content-Disposition", "attachment", filename=a["filename"])
+        msg.attach(part)
+    return msg
+
+
+class SettingsCache:
+    """The smtp settings document, re-read at most every `ttl` seconds."""
+
+    def __init__(self, collection, ttl: float = 60):
+        self.settings = collection
+        self.ttl = ttl
+        self.value = None
+        self.expires = 0.0
+
+    async def get(self) -> Optional[dict]:
+        if time.monotonic() >= self.expires:
+            self.value = await self.settings.find_one({"type": "smtp"})
+            self.expires = time.monotonic() + self.ttl
+        return self.value
+
+    def invalidate(self) -> None:
+        self.expires = 0.0
+
+
+def connection_options(settings: dict) -> dict:
+    """Port 465 is implicit TLS and anything else STARTTLS, unless smtp_security says otherwise."""
+    port = int(settings["smtp_port"])
+    security = settings.get("smtp_security") or ("ssl" if port == 465 else "starttls")
+    return {"hostname": settings["smtp_host"], "port": port,
+            "use_tls": security == "ssl", "start_tls": security == "starttls"}
+
+
+def settings_key(settings: dict) -> tuple:
+    return tuple(settings.get(k) for k in ("smtp_host", "smtp_port", "smtp_security", "smtp_user", "smtp_password"))
+
+
+class SMTPPool:
+    """Up to `size` concurrent sends, each over a connection reused from earlier ones when possible."""
+
+    def __init__(self, size: int = 2, timeout: float = 30, idle_timeout: float = 60):
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.slots = asyncio.Semaphore(size)
+        self.idle = []  # (client, settings key, last used), most recently used last
+        self.connections = 0  # opened so far, for tests and logs
+
+    async def _connect(self, settings: dict) -> aiosmtplib.SMTP:
+        client = aiosmtplib.SMTP(timeout=self.timeout, **connection_options(settings))
+        await client.connect()
+        try:
+            if settings.get("smtp_password"):
+                await client.login(settings["smtp_user"], settings["smtp_password"])
+        except Exception:
+            client.close()
+            raise
+        self.connections += 1
+        return client
+
+    def _checkout(self, key: tuple) -> Optional[aiosmtplib.SMTP]:
+        now = time.monotonic()
+        while self.idle:
+            client, client_key, last_used = self.idle.pop()
+            if client_key == key and now - last_used < self.idle_timeout and client.is_connected:
+                return client
+            client.close()
+        return None
+
+    async def send(self, settings: dict, message) -> None:
+        key = settings_key(settings)
+        async with self.slots:
+            client = self._checkout(key)
+            try:
+                if client:
+                    try:
+                        await client.send_message(message)
+                    except (aiosmtplib.SMTPServerDisconnected, ConnectionError):
+                        # The server closed a connection we thought was still good
+                        client.close()
+                        client = None
+                if not client:
+                    client = await self._connect(settings)
+                    await client.send_message(message)
+            except Exception:
+                if client:
+                    client.close()
+                raise
+            self.idle.append((client, key, time.monotonic()))
+
+    async def close(self) -> None:
+        idle, self.idle = self.idle, []
+        for client, _key, _last_used in idle:
+            try:
+                await client.quit()
+            except Exception:
+                client.close()
+
+
+class Outbox:
+    """Messages waiting to be sent, with the attempts and errors of each."""
+
+    def __init__(self, queue, settings: SettingsCache, pool: SMTPPool):
+        self.queue = queue
+        self.settings = settings
+        self.pool = pool
+        self.wake = asyncio.Event()
+
+    async def enqueue(self, to: str, subject: str, html: str, attachments=()):
+        job_id = await self.queue.enqueue(EMAIL, {"to": to, "subject": subject, "html": html,
+                                                  "attachments": list(attachments)})
+        self.wake.set()
+        return job_id
+
+    async def send_now(self, to: str, subject: str, html: str, attachments=()) -> None:
+        """Send directly, bypassing the outbox (for the admin's SMTP test, which wants the error)."""
+        settings = await self.settings.get()
+        if not is_configured(settings):
+            raise RuntimeError("SMTP is not configured")
+        await self.pool.send(settings, build_message(settings["smtp_user"], to, subject, html, attachments))
+
+    async def deliver(self, job: dict) -> None:
+        p = job["payload"]
+        await self.send_now(p["to"], p["subject"], p["html"], p["attachments"])
+
+    async def fail_expired(self) -> int:
+        """Mark failed the messages whose sender died during their last allowed attempt.
+
+        The queue never hands those out again, so without this they stay running forever.
+        """
+        expired = await self.queue.expired()
+        for job in expired:
+            await self.queue.mark_failed(job, "sender lease expired")
+        return len(expired)
+
+    async def next_message(self, worker_id: str, poll_interval: float) -> Optional[dict]:
+        """Claim a due message, waiting up to poll_interval (or until one is queued here) if none is."""
+        self.wake.clear()
+        job = await self.queue.claim(worker_id, [EMAIL])
+        if job:
+            return job
+        try:
+            await asyncio.wait_for(self.wake.wait(), poll_interval)
+        except asyncio.TimeoutError:
+            pass
+        return None
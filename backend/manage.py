@@ -0,0 +1,121 @@
+"""
+SnapVault maintenance commands.
+
+    python manage.py ensure-indexes   # create/verify the INDEXES registry
+    python manage.py explain          # explain() every route query shape; exit 1 on COLLSCAN
+    python manage.py reconcile        # recount per-event media/storage counters now
+    python manage.py backfill-crc     # store CRC-32 for media uploaded before it was captured
+    python manage.py transcode-report # worker transcode decisions, bytes saved and CPU time
+    python manage.py backfill-thumbnails  # queue WebP/JPEG renditions for images that have none
+    python manage.py backfill-blobs   # hash older media into blobs, collapsing identical files
+    python manage.py backfill-metadata  # read EXIF capture times for media uploaded before the timeline
+"""
+import argparse
+import asyncio
+import sys
+
+import server
+
+
+async def cmd_ensure_indexes(args) -> int:
+    await server.ensure_indexes()
+    for collection in server.INDEXES:
+        names = sorted((await server.db[collection].index_information()).keys())
+        print(f"{collection}: {', '.join(names)}")
+    return 0
+
+
+async def cmd_explain(args) -> int:
+    await server.ensure_indexes()
+    collscans = await server.explain_query_shapes()
+    for name, _collection, _command in server.query_shapes():
+        print(f"{'COLLSCAN' if name in collscans else 'ok':<9} {name}")
+    if collscans:
+        print(f"\n{len(collscans)} query shape(s) fall back to a collection scan", file=sys.stderr)
+        return 1
+    return 0
+
+
+async def cmd_reconcile(args) -> int:
+    await server.reconcile_usage()
+    print("Usage counters reconciled")
+    return 0
+
+
+async def cmd_backfill_crc(args) -> int:
+    updated = await server.backfill_crc32()
+    print(f"Stored CRC-32 for {updated} media files")
+    return 0
+
+
+async def cmd_backfill_thumbnails(args) -> int:
+    queued = await server.backfill_thumbnails()
+    print(f"Queued thumbnails for {queued} images (rendered by worker.py)")
+    return 0
+
+
+async def cmd_backfill_blobs(args) -> int:
+    linked, freed = await server.backfill_blobs()
+    print(f"Linked {linked} media files to blobs, freed {freed / 1048576:.1f}MB of duplicates")
+    return 0
+
+
+async def cmd_backfill_metadata(args) -> int:
+    updated = await server.backfill_metadata()
+    print(f"Stored capture metadata for {updated} media files")
+    return 0
+
+
+async def cmd_transcode_report(args) -> int:
+    rows = await server.db.media.aggregate([
+        {"$match": {"transcode": {"$exists": True}}},
+        {"$group": {
+            "_id": {"decision": "$transcode.decision", "kept": "$transcode.kept"},
+            "videos": {"$sum": 1},
+            "input_size": {"$sum": "$transcode.input_size"},
+            "output_size": {"$sum": "$transcode.output_size"},
+            "seconds": {"$sum": "$transcode.seconds"},
+        }},
+        {"$sort": {"_id.decision": 1, "_id.kept": 1}},
+    ]).to_list(None)
+    print(f"{'decision':<10}{'kept':<10}{'videos':>8}{'in MB':>12}{'out MB':>12}{'saved MB':>12}{'seconds':>10}")
+    for r in rows:
+        saved = r["input_size"] - r["output_size"] if r["_id"]["kept"] == "output" else 0
+        print(f"{r['_id']['decision']:<10}{r['_id']['kept']:<10}{r['videos']:>8}"
+              f"{r['input_size'] / 1048576:>12.1f}{r['output_size'] / 1048576:>12.1f}"
+              f"{saved / 1048576:>12.1f}{r['seconds']:>10.0f}")
+    return 0
+
+
+COMMANDS = {
+    "ensure-indexes": cmd_ensure_indexes,
+    "explain": cmd_explain,
+    "reconcile": cmd_reconcile,
+    "backfill-crc": cmd_backfill_crc,
+    "transcode-report": cmd_transcode_report,
+    "backfill-thumbnails": cmd_backfill_thumbnails,
+    "backfill-blobs": cmd_backfill_blobs,
+    "backfill-metadata": cmd_backfill_metadata,
+}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="SnapVault maintenance commands")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("ensure-indexes", help="Create the managed Mongo indexes")
+    sub.add_parser("explain", help="Fail if any route query shape uses a COLLSCAN")
+    sub.add_parser("reconcile", help="Repair media/storage counters")
+    sub.add_parser("backfill-crc", help="Store CRC-32 for older media so downloads can resume")
+    sub.add_parser("transcode-report", help="Summarize video transcode decisions and savings")
+    sub.add_parser("backfill-thumbnails", help="Queue gallery renditions for images uploaded before them")
+    sub.add_parser("backfill-blobs", help="Deduplicate media uploaded before content addressing")
+    sub.add_parser("backfill-metadata", help="Add capture times to older media for the timeline")
+    args = parser.parse_args()
+    try:
+        return asyncio.run(COMMANDS[args.command](args))
+    finally:
+        server.client.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
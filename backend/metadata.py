@@ -0,0 +1,129 @@
+"""
+Capture-time metadata for the gallery timeline.
+
+Photos: EXIF (DateTimeOriginal, dimensions, orientation, camera) parsed from the
+first METADATA_HEAD_BYTES of the upload, which the upload path keeps as it
+streams; JPEG EXIF sits in an APP1 segment at the start of the file, so the rest
+is never read again. Videos: the container tags from the worker's ffprobe run.
+
+Capture times are stored as UTC ISO strings, like created_at, so the two sort
+together. EXIF times without an offset are read in the given default zone.
+"""
+import io
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Optional
+
+from PIL import Image
+
+import transcode
+
+METADATA_HEAD_BYTES = 256 * 1024
+
+EXIF_IFD = 0x8769
+ORIENTATION, MAKE, MODEL, DATETIME = 274, 271, 272, 306
+DATETIME_ORIGINAL, DATETIME_DIGITIZED = 36867, 36868
+OFFSET_TIME, OFFSET_TIME_ORIGINAL = 36880, 36881
+
+# Cameras that never had their clock set write the format epoch instead
+MIN_CAPTURE_YEAR = 1980
+
+VIDEO_MAKE_TAGS = ("com.apple.quicktime.make", "com.android.manufacturer", "make")
+VIDEO_MODEL_TAGS = ("com.apple.quicktime.model", "com.android.model", "model")
+
+
+def _text(value) -> Optional[str]:
+    if isinstance(value, bytes):
+        value = value.decode(errors="replace")
+    value = str(value).strip().strip("\x00").strip() if value is not None else ""
+    return value or None
+
+
+def _utc_iso(dt: datetime) -> Optional[str]:
+    if dt.year < MIN_CAPTURE_YEAR:
+        return None
+    return dt.astimezone(timezone.utc).isoformat()
+
+
+def parse_exif_datetime(value, offset=None, default_tz=timezone.utc) -> Optional[str]:
+    """EXIF "YYYY:MM:DD HH:MM:SS" (+ optional "+HH:MM" offset tag) as a UTC ISO string."""
+    value = _text(value)
+    if not value:
+        return None
+    try:
+        dt = datetime.strptime(value[:19], "%Y:%m:%d %H:%M:%S")
+    except ValueError:
+        return None
+    tz = default_tz
+    offset = _text(offset)
+    if offset and len(offset) == 6 and offset[0] in "+-":
+        try:
+            minutes = int(offset[1:3]) * 60 + int(offset[4:6])
+            tz = timezone(timedelta(minutes=minutes if offset[0] == "+" else -minutes))
+        except ValueError:
+            pass
+    return _utc_iso(dt.replace(tzinfo=tz))
+
+
+def parse_iso_datetime(value) -> Optional[str]:
+    """An ISO 8601 container timestamp (UTC unless it says otherwise) as a UTC ISO string."""
+    value = _text(value)
+    if not value:
+        return None
+    try:
+        dt = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    return _utc_iso(dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc))
+
+
+def camera_name(make, model) -> Optional[str]:
+    make, model = _text(make), _text(model)
+    if make and model and model.lower().startswith(make.lower()):
+        return model
+    return " ".join(p for p in (make, model) if p) or None
+
+
+def image_metadata(head: bytes, default_tz=timezone.utc) -> dict:
+    """Metadata from the start of an image file; {} if Pillow can't make sense of it."""
+    try:
+        with Image.open(io.BytesIO(head)) as im:
+            width, height = im.size
+            exif = im.getexif()
+            exif_ifd = exif.get_ifd(EXIF_IFD)
+    except Exception:
+        return {}  # untrusted and possibly truncated input: metadata is best effort
+    meta = {
+        "width": width,
+        "height": height,
+        "orientation": exif.get(ORIENTATION) or 1,
+        "camera": camera_name(exif.get(MAKE), exif.get(MODEL)),
+        "captured_at": (
+            parse_exif_datetime(exif_ifd.get(DATETIME_ORIGINAL), exif_ifd.get(OFFSET_TIME_ORIGINAL), default_tz)
+            or parse_exif_datetime(exif_ifd.get(DATETIME_DIGITIZED), exif_ifd.get(OFFSET_TIME_ORIGINAL), default_tz)
+            or parse_exif_datetime(exif.get(DATETIME), exif_ifd.get(OFFSET_TIME), default_tz)
+        ),
+    }
+    return {k: v for k, v in meta.items() if v is not None}
+
+
+def image_file_metadata(path: Path, default_tz=timezone.utc) -> dict:
+    with open(path, "rb") as f:
+        return image_metadata(f.read(METADATA_HEAD_BYTES), default_tz)
+
+
+def video_metadata(data: dict, probe: dict) -> dict:
+    """Metadata from raw ffprobe JSON and its parse_probe() summary."""
+    tags = {k.lower(): v for k, v in (data.get("format", {}).get("tags") or {}).items()}
+    width, height = transcode.display_size(probe)
+    meta = {
+        "width": width or None,
+        "height": height or None,
+        "duration": probe.get("duration") or None,
+        "camera": camera_name(next((tags[t] for t in VIDEO_MAKE_TAGS if t in tags), None),
+                              next((tags[t] for t in VIDEO_MODEL_TAGS if t in tags), None)),
+        # Apple's creationdate keeps the local offset; creation_time is UTC
+        "captured_at": (parse_iso_datetime(tags.get("com.apple.quicktime.creationdate"))
+                        or parse_iso_datetime(tags.get("creation_time"))),
+    }
+    return {k: v for k, v in meta.items() if v is not None}
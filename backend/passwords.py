@@ -0,0 +1,93 @@
+"""
+Password hashing off the event loop.
+
+bcrypt is deliberately slow (a few hundred milliseconds per call), and on the
+event loop every call stalls every other request. PasswordHasher runs hashes and
+checks on a small dedicated thread pool (bcrypt releases the GIL) and admits at
+most `workers + max_pending` calls at once; past that it raises PasswordBusy
+rather than letting a login burst queue up without bound.
+
+The bcrypt cost is either configured or calibrated at startup to the largest
+that hashes within a target time on this machine. Stored hashes below the
+current cost are re-hashed the next time their owner logs in. Hashes above it
+are left alone, so processes that calibrate slightly differently don't keep
+rewriting each other's hashes.
+"""
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from passlib.context import CryptContext
+from passlib.hash import bcrypt
+
+MIN_ROUNDS = 10
+MAX_ROUNDS = 16
+DEFAULT_ROUNDS = 12
+
+
+class PasswordBusy(Exception):
+    """Too many password hashes already running or waiting."""
+
+
+def make_context(rounds: int) -> CryptContext:
+    return CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__default_rounds=rounds, bcrypt__min_rounds=rounds)
+
+
+def calibrate_rounds(target_seconds: float, low: int = MIN_ROUNDS, high: int = MAX_ROUNDS) -> int:
+    """The highest cost in [low, high] whose hash is expected to take at most target_seconds.
+
+    Times the cheapest cost (best of three, to ride out scheduler noise) and
+    doubles from there, as each extra round doubles bcrypt's work.
+    """
+    hasher = bcrypt.using(rounds=low)
+    elapsed = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        hasher.hash("calibration")
+        elapsed = min(elapsed, time.perf_counter() - start)
+    rounds = low
+    while rounds < high and elapsed * 2 <= target_seconds:
+        rounds += 1
+        elapsed *= 2
+    return rounds
+
+
+class PasswordHasher:
+    """Async bcrypt hash/verify on a bounded thread pool."""
+
+    def __init__(self, workers: int, max_pending: int, rounds: int = DEFAULT_ROUNDS):
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self.capacity = workers + max_pending
+        self.in_flight = 0
+        self.set_rounds(rounds)
+
+    def set_rounds(self, rounds: int) -> None:
+        self.rounds = rounds
+        self.context = make_context(rounds)
+
+    async def _run(self, fn, *args):
+        if self.in_flight >= self.capacity:
+            raise PasswordBusy()
+        self.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.pool, fn, *args)
+        finally:
+            self.in_flight -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    async def verify(self, password: str, hashed: Optional[str]) -> bool:
+        if not hashed:
+            return False
+        return await self._run(self.context.verify, password, hashed)
+
+    async def verify_and_update(self, password: str, hashed: Optional[str]) -> Tuple[bool, Optional[str]]:
+        """(matches, new hash or None); the new hash is set when the stored one is below the current cost."""
+        if not hashed:
+            return False, None
+        return await self._run(self.context.verify_and_update, password, hashed)
+
+    def shutdown(self) -> None:
+        self.pool.shutdown(cancel_futures=True)
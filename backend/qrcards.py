@@ -0,0 +1,264 @@
+"""
+Printable QR cards for events (mirrors frontend PrintableQRCards.jsx).
+
+Everything about a card except its text and QR code depends only on the
+template and the card size. That covers the fonts, the template background
+resized to the card, and the translucent panel composited over it.
+CardAssets prepares those once per process; preload() prepares them for
+every template and size up front. Each render then starts from a copy of
+the prepared background.
+
+The QR code is drawn from its module matrix at a whole number of pixels per
+module. It is never resampled, so the modules stay crisp black and white
+and nothing is interpolated.
+
+render_card_file() is the process-pool entry point. It writes the PNG that
+previews, payment approval and the organiser's email all share, under
+cache_key(), which hashes everything that shows on the card. Cards with few
+colours are stored as exact palette PNGs (no colour is approximated).
+Photo-backed cards stay RGB.
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Optional
+
+import qrcode
+from PIL import Image, ImageDraw, ImageFont
+
+TEMPLATE_DIR = Path(__file__).parent / "templates"
+
+QR_CARD_TEMPLATES = {
+    "wedding": {
+        "golden_elegance": {"bgColor": "#FDF8F3", "borderColor": "#D4AF37", "textColor": "#2C1810", "accentColor": "#B8960C", "bgImage": "golden_elegance.png"},
+        "botanical_garden": {"bgColor": "#FFFFFF", "borderColor": "#7BA883", "textColor": "#2D3B2E", "accentColor": "#6B8E6B", "bgImage": "botanical_garden.png"},
+        "midnight_romance": {"bgColor": "#0F1B33", "borderColor": "#C5A55A", "textColor": "#FFFFFF", "accentColor": "#C5A55A", "bgImage": "midnight_romance.png"},
+        "modern_minimal": {"bgColor": "#FFFFFF", "borderColor": "#1A1A1A", "textColor": "#1A1A1A", "accentColor": "#666666"},
+    },
+    "birthday": {
+        "confetti_party": {"bgColor": "#FFF9E6", "borderColor": "#FF6B9D", "textColor": "#333333", "accentColor": "#FF6B9D"},
+        "balloon_fun": {"bgColor": "#E8F4FD", "borderColor": "#4ECDC4", "textColor": "#2C3E50", "accentColor": "#FF6B6B"},
+        "elegant_gold": {"bgColor": "#1A1A2E", "borderColor": "#FFD700", "textColor": "#FFFFFF", "accentColor": "#FFD700"},
+        "rainbow_bright": {"bgColor": "#FFFFFF", "borderColor": "#FF6B6B", "textColor": "#333333", "accentColor": "#4ECDC4"},
+    },
+    "corporate": {
+        "professional_navy": {"bgColor": "#0F2744", "borderColor": "#3B82F6", "textColor": "#FFFFFF", "accentColor": "#60A5FA"},
+        "clean_white": {"bgColor": "#FFFFFF", "borderColor": "#E5E7EB", "textColor": "#111827", "accentColor": "#6B7280"},
+        "tech_modern": {"bgColor": "#111827", "borderColor": "#10B981", "textColor": "#FFFFFF", "accentColor": "#10B981"},
+        "executive_grey": {"bgColor": "#F3F4F6", "borderColor": "#374151", "textColor": "#1F2937", "accentColor": "#4B5563"},
+    },
+}
+
+QR_CARD_SIZES = {
+    "10x8": (960, 768),
+    "8x6": (768, 576),
+}
+
+# Mapping old template keys to new ones for backward compatibility
+TEMPLATE_KEY_MIGRATION = {
+    "elegant_frame": "golden_elegance",
+    "romantic_floral": "botanical_garden",
+    "rustic_kraft": "midnight_romance",
+}
+
+FONT_FILES = {
+    "serif_bold": "/usr/share/fonts/truetype/liberation/LiberationSerif-Bold.ttf",
+    "sans_reg": "/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf",
+    "sans_bold": "/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf",
+}
+DARK_BACKGROUNDS = ("#0f1b33", "#1a1a2e", "#111827", "#0f2744")
+HEADERS = {"wedding": "SHARE YOUR MEMORIES", "birthday": "CAPTURE THE FUN!", "corporate": "EVENT PHOTOS"}
+QR_BORDER_MODULES = 2
+# Bump when the card layout changes, so cached cards are rendered again
+RENDER_VERSION = 1
+# Cards with fewer colours than this are flat graphics rather than photos
+FLAT_CARD_COLORS = 4096
+
+
+def hex_to_rgb(hex_color: str) -> tuple:
+    hex_color = hex_color.lstrip('#')
+    return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
+
+
+def resolve_template(event_type: str, template_key: str) -> dict:
+    templates = QR_CARD_TEMPLATES.get(event_type, QR_CARD_TEMPLATES["wedding"])
+    return templates.get(TEMPLATE_KEY_MIGRATION.get(template_key, template_key)) or list(templates.values())[0]
+
+
+def font_sizes(width: int, has_bg_image: bool) -> dict:
+    """Larger text over photo backgrounds, for readability."""
+    if has_bg_image:
+        return {"serif_bold": int(width * 0.07), "sans_reg": int(width * 0.038), "sans_bold": int(width * 0.045)}
+    return {"serif_bold": int(width * 0.052), "sans_reg": int(width * 0.028), "sans_bold": int(width * 0.035)}
+
+
+class CardAssets:
+    """Fonts by (name, size) and prepared backgrounds by (template, size), loaded on first use."""
+
+    def __init__(self, template_dir: Path = TEMPLATE_DIR):
+        self.template_dir = template_dir
+        self.fonts = {}
+        self.backgrounds = {}
+
+    def font(self, name: str, size: int):
+        key = (name, size)
+        if key not in self.fonts:
+            try:
+                self.fonts[key] = ImageFont.truetype(FONT_FILES[name], size)
+            except OSError:
+                self.fonts[key] = ImageFont.load_default()
+        return self.fonts[key]
+
+    def background(self, tmpl: dict, width: int, height: int):
+        """(prepared background, whether it is a photo) for a template at a card size; copy before drawing."""
+        key = (tmpl.get("bgImage"), tmpl["bgColor"], tmpl["borderColor"], width, height)
+        if key not in self.backgrounds:
+            self.backgrounds[key] = self._prepare(tmpl, width, height)
+        return self.backgrounds[key]
+
+    def _prepare(self, tmpl: dict, width: int, height: int):
+        bg_path = self.template_dir / tmpl["bgImage"] if tmpl.get("bgImage") else None
+        if not bg_path or not bg_path.exists():
+            img = Image.new("RGB", (width, height), hex_to_rgb(tmpl["bgColor"]))
+            if not bg_path:
+                bw = 6
+                ImageDraw.Draw(img).rectangle([bw // 2, bw // 2, width - bw // 2, height - bw // 2],
+                                              outline=hex_to_rgb(tmpl["borderColor"]), width=bw)
+            return img, False
+
+        with Image.open(bg_path) as src:
+            img = src.convert("RGB").resize((width, height), Image.LANCZOS)
+        # A translucent centre panel keeps the text readable over the photo
+        overlay = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+        panel_color = (0, 0, 0, 100) if tmpl["bgColor"].lower() in DARK_BACKGROUNDS else (255, 255, 255, 180)
+        margin_x, margin_y = int(width * 0.12), int(height * 0.04)
+        ImageDraw.Draw(overlay).rounded_rectangle(
+            [margin_x, margin_y, width - margin_x, height - margin_y], radius=20, fill=panel_color
+        )
+        return Image.alpha_composite(img.convert("RGBA"), overlay).convert("RGB"), True
+
+    def preload(self) -> int:
+        """Prepare every template at every card size; returns the number of backgrounds held."""
+        for templates in QR_CARD_TEMPLATES.values():
+            for tmpl in templates.values():
+                for width, height in QR_CARD_SIZES.values():
+                    _img, has_bg_image = self.background(tmpl, width, height)
+                    for name, size in font_sizes(width, has_bg_image).items():
+                        self.font(name, size)
+        return len(self.backgrounds)
+
+
+assets = CardAssets()
+
+
+def qr_image(data: str, max_size: int) -> Image.Image:
+    """The QR code at the largest whole number of pixels per module that fits in max_size."""
+    qr = qrcode.QRCode(version=1, error_correction=qrcode.constants.ERROR_CORRECT_H, border=QR_BORDER_MODULES)
+    qr.add_data(data)
+    qr.make(fit=True)
+    matrix = qr.get_matrix()  # includes the quiet zone
+    modules = len(matrix)
+    img = Image.new("L", (modules, modules))
+    img.putdata([0 if dark else 255 for row in matrix for dark in row])
+    box = max(1, max_size // modules)
+    return img.resize((modules * box, modules * box), Image.NEAREST).convert("RGB")
+
+
+def draw_centered(draw: ImageDraw.ImageDraw, width: int, y: int, text: str, font, fill) -> None:
+    box = draw.textbbox((0, 0), text, font=font)
+    draw.text(((width - (box[2] - box[0])) // 2, y), text, fill=fill, font=font)
+
+
+def render_card(event_type: str, template_key: str, size_key: str,
+                event_title: str, event_subtitle: str, guest_url: str,
+                card_assets: Optional[CardAssets] = None) -> Image.Image:
+    """A printable QR card with the QR code centred."""
+    card_assets = card_assets or assets
+    tmpl = resolve_template(event_type, template_key)
+    width, height = QR_CARD_SIZES.get(size_key, QR_CARD_SIZES["10x8"])
+    border_rgb = hex_to_rgb(tmpl["borderColor"])
+    text_rgb = hex_to_rgb(tmpl["textColor"])
+    accent_rgb = hex_to_rgb(tmpl["accentColor"])
+
+    background, has_bg_image = card_assets.background(tmpl, width, height)
+    img = background.copy()
+    draw = ImageDraw.Draw(img)
+    sizes = font_sizes(width, has_bg_image)
+    serif_bold = card_assets.font("serif_bold", sizes["serif_bold"])
+    sans_reg = card_assets.font("sans_reg", sizes["sans_reg"])
+    sans_bold = card_assets.font("sans_bold", sizes["sans_bold"])
+
+    draw_centered(draw, width, int(height * 0.07), HEADERS.get(event_type, "EVENT PHOTOS"), sans_reg, accent_rgb)
+
+    # Event title, shortened with an ellipsis to fit
+    display_title = event_title
+    tbox = draw.textbbox((0, 0), display_title, font=serif_bold)
+    if tbox[2] - tbox[0] > width * 0.80:
+        while tbox[2] - tbox[0] > width * 0.80 and len(display_title) > 10:
+            display_title = display_title[:-1]
+            tbox = draw.textbbox((0, 0), display_title + "...", font=serif_bold)
+        display_title += "..."
+    draw_centered(draw, width, int(height * 0.13), display_title, serif_bold, text_rgb)
+
+    if event_subtitle:
+        draw_centered(draw, width, int(height * 0.22), event_subtitle, sans_reg, accent_rgb)
+
+    # QR code on a white rounded panel, centred in the same square as always
+    qr_size = int(min(width, height) * 0.38)
+    qr_x = (width - qr_size) // 2
+    qr_y = (height - qr_size) // 2 + int(height * 0.02)
+    pad = 16
+    draw.rounded_rectangle(
+        [qr_x - pad, qr_y - pad, qr_x + qr_size + pad, qr_y + qr_size + pad],
+        radius=12, fill=(255, 255, 255), outline=border_rgb, width=4
+    )
+    code = qr_image(guest_url, qr_size)
+    inset = (qr_size - code.width) // 2
+    img.paste(code, (qr_x + inset, qr_y + inset))
+
+    draw_centered(draw, width, int(height * 0.82), "Scan to Upload", sans_bold, text_rgb)
+    draw_centered(draw, width, int(height * 0.88), "Photos & Videos", sans_reg, accent_rgb)
+    draw_centered(draw, width, int(height * 0.93), "SnapVault", sans_reg, accent_rgb)
+    return img
+
+
+def cache_key(event_type: str, template_key: str, size_key: str,
+              event_title: str, event_subtitle: str, guest_url: str) -> str:
+    """File name for a rendered card: a hash of the template as resolved and of everything drawn on it."""
+    parts = [RENDER_VERSION, resolve_template(event_type, template_key),
+             QR_CARD_SIZES.get(size_key, QR_CARD_SIZES["10x8"]), HEADERS.get(event_type, "EVENT PHOTOS"),
+             event_title, event_subtitle or "", guest_url]
+    digest = hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+    return f"{digest}.png"
+
+
+def encode_png(img: Image.Image, dest) -> None:
+    """Losslessly as small as is worth it: a palette PNG with at most 256 colours, else RGB.
+
+    Flat cards get maximum compression, which is cheap for them. Over a photo
+    background it costs about 8x the time for a few percent, so those keep
+    the default level.
+    """
+    colors = img.getcolors(FLAT_CARD_COLORS)
+    if colors and len(colors) <= 256:
+        palette = Image.new("P", (1, 1))
+        palette.putpalette([channel for _count, rgb in colors for channel in rgb])
+        # Every pixel's colour is in the palette, so nearest-colour mapping is exact
+        img = img.quantize(palette=palette, dither=Image.Dither.NONE)
+    img.save(dest, "PNG", optimize=bool(colors))
+
+
+def render_card_file(event_type: str, template_key: str, size_key: str, event_title: str,
+                     event_subtitle: str, guest_url: str, dest: Path) -> int:
+    """Render a card to `dest` as PNG (atomically); returns its size."""
+    img = render_card(event_type, template_key, size_key, event_title, event_subtitle, guest_url)
+    tmp = dest.with_name(f".{dest.name}.{os.getpid()}.tmp")
+    encode_png(img, tmp)
+    tmp.replace(dest)
+    return dest.stat().st_size
+
+
+def preload() -> int:
+    """Process-pool initializer: prepare this process's assets before its first card."""
+    return assets.preload()
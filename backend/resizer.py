@@ -0,0 +1,144 @@
+"""
+On-demand image resizing for /api/files/... ?w=&fmt= requests.
+
+The output format is negotiated from the Accept header (AVIF, then WebP,
+then JPEG). The width honours the DPR and Save-Data client hints and is
+rounded up to a WIDTH_STEP bucket, so that arbitrary layout widths reuse a
+bounded set of renditions.
+
+Rendered files live in an on-disk LRU cache with a byte budget. Concurrent
+requests for the same rendition share one render. The budget is tracked per
+process: with several API processes on one cache directory, each process
+evicts from its own view, so the directory can briefly exceed the budget.
+"""
+import asyncio
+import hashlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+from PIL import features
+
+from thumbnails import FORMATS
+
+WIDTH_STEP = 64
+MAX_WIDTH = 4096
+MAX_DPR = 3.0
+QUALITY = {"avif": 60, "webp": 80, "jpeg": 82}
+SAVE_DATA_QUALITY = {"avif": 45, "webp": 55, "jpeg": 60}
+RESIZABLE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".gif", ".bmp", ".tif", ".tiff"}
+
+
+def is_resizable(filename: str) -> bool:
+    return Path(filename).suffix.lower() in RESIZABLE_EXTENSIONS
+
+
+def negotiate_format(fmt: str, accept: str) -> str:
+    """Resolve fmt=auto against the Accept header; explicit formats pass through."""
+    avif = features.check("avif")
+    if fmt != "auto":
+        return "webp" if fmt == "avif" and not avif else fmt
+    accept = accept or ""
+    if "image/avif" in accept and avif:
+        return "avif"
+    if "image/webp" in accept:
+        return "webp"
+    return "jpeg"
+
+
+def parse_dpr(value: Optional[str]) -> float:
+    try:
+        dpr = float(value) if value else 1.0
+    except ValueError:
+        return 1.0
+    return min(max(dpr, 1.0), MAX_DPR)
+
+
+def target_width(width: int, dpr: float, save_data: bool) -> int:
+    """Physical pixels to render: CSS width x DPR (1x under Save-Data), rounded up to a bucket."""
+    pixels = width * (1.0 if save_data else dpr)
+    bucket = -(-int(pixels) // WIDTH_STEP) * WIDTH_STEP
+    return min(max(bucket, WIDTH_STEP), MAX_WIDTH)
+
+
+def cache_key(event_id: str, filename: str, width: int, fmt: str, quality: int) -> str:
+    digest = hashlib.sha1(f"{event_id}/{filename}:{width}:{fmt}:{quality}".encode()).hexdigest()
+    return f"{digest}{FORMATS[fmt][0]}"
+
+
+class RenditionCache:
+    """LRU of rendered files under `root`; past `max_bytes` the least recently served go first."""
+
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.entries: OrderedDict = OrderedDict()  # key -> size, least recently used first
+        self.total = 0
+        self.inflight: dict = {}  # key -> Task of the render in progress
+        self.loaded = False
+        self.load_lock = asyncio.Lock()
+
+    def path(self, key: str) -> Path:
+        return self.root / key[:2] / key
+
+    def load(self):
+        """Index what earlier runs left on disk, oldest access first."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        found = []
+        for path in self.root.glob("*/*"):
+            if path.name.startswith("."):
+                path.unlink(missing_ok=True)  # interrupted render
+                continue
+            st = path.stat()
+            found.append((st.st_atime, path.name, st.st_size))
+        for _atime, key, size in sorted(found):
+            self.entries[key] = size
+            self.total += size
+        self.loaded = True
+        self.evict()
+
+    def touch(self, key: str) -> Optional[Path]:
+        if key not in self.entries:
+            return None
+        path = self.path(key)
+        if not path.exists():  # evicted by another process
+            self.total -= self.entries.pop(key)
+            return None
+        self.entries.move_to_end(key)
+        return path
+
+    def add(self, key: str, size: int):
+        self.total += size - self.entries.pop(key, 0)
+        self.entries[key] = size
+        self.evict()
+
+    def evict(self):
+        while self.total > self.max_bytes and len(self.entries) > 1:
+            key, size = self.entries.popitem(last=False)
+            self.total -= size
+            self.path(key).unlink(missing_ok=True)
+
+    async def _render(self, key: str, render: Callable[[Path], Awaitable[int]]) -> Path:
+        try:
+            path = self.path(key)
+            path.parent.mkdir(exist_ok=True)
+            self.add(key, await render(path))
+            return path
+        finally:
+            del self.inflight[key]
+
+    async def get_or_render(self, key: str, render: Callable[[Path], Awaitable[int]]) -> Path:
+        """The cached file for `key`, rendered once however many requests ask for it at once."""
+        if not self.loaded:
+            async with self.load_lock:
+                if not self.loaded:
+                    await asyncio.to_thread(self.load)
+        path = self.touch(key)
+        if path:
+            return path
+        task = self.inflight.get(key)
+        if task is None:
+            # The render is its own task so a client hanging up doesn't cancel it for the others
+            task = self.inflight[key] = asyncio.create_task(self._render(key, render))
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return await asyncio.shield(task)
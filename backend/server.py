@@ -1,29 +1,51 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, UploadFile, File, Form
-from fastapi.responses import FileResponse, StreamingResponse
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, UploadFile, File, Form, Query, Request, Response
+from fastapi.responses import FileResponse, StreamingResponse, RedirectResponse, JSONResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import ClientDisconnect
+from starlette.datastructures import UploadFile as StarletteUploadFile
 from motor.motor_asyncio import AsyncIOMotorClient
 from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import IndexModel, ASCENDING, DESCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
 from pydantic import BaseModel, EmailStr
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from pathlib import Path
 from datetime import datetime, timezone, timedelta
 from typing import Optional
+from collections import OrderedDict
+from zoneinfo import ZoneInfo
+from email.utils import formatdate
+from urllib.parse import quote
 from dotenv import load_dotenv
 import os
 import uuid
-import subprocess
+import json
+import base64
+import re
+import mimetypes
 import logging
-import shutil
-import zipfile
-import io
-import smtplib
-import qrcode
-from PIL import Image, ImageDraw, ImageFont
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from email.mime.image import MIMEImage
+import asyncio
+import zlib
+import hashlib
+import time
+import socket
+from PIL import Image, UnidentifiedImageError
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from zipstream import ZipStream, ZipLayout, StoredFile, crc32_file, read_file_range, unique_arcname
+from jobs import JobQueue, RUNNING, CLAIM_SORT, claim_filter, expired_filter
+from storage import storage_from_env, media_key
+from blobs import BlobStore, file_digests
+from metadata import image_metadata, image_file_metadata, METADATA_HEAD_BYTES
+from uploads import UploadSessions, OPEN, COMPLETE, contiguous_offset, missing_spans, write_at
+from thumbnails import render_resized
+from passwords import PasswordHasher, PasswordBusy, calibrate_rounds
+import resizer
+import qrcards
+import qrcode.exceptions
+import mail
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -33,16 +55,64 @@ DB_NAME = os.environ['DB_NAME']
 JWT_SECRET = os.environ.get('JWT_SECRET_KEY', 'dev-secret-change-this')
 JWT_ALGO = "HS256"
 JWT_EXPIRE_DAYS = 30
+# Authenticated users are cached per process for this long; it bounds how long a
+# revoked token keeps working on *other* processes (this one drops it at once)
+USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL_SECONDS', 30))
+USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 10000))
+# Unset: calibrated at startup to the highest cost that hashes within BCRYPT_TARGET_MS
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', 0))
+BCRYPT_TARGET_MS = int(os.environ.get('BCRYPT_TARGET_MS', 250))
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+PASSWORD_HASH_QUEUE = int(os.environ.get('PASSWORD_HASH_QUEUE', 32))
+MAIL_MAX_ATTEMPTS = int(os.environ.get('MAIL_MAX_ATTEMPTS', 6))
+MAIL_CONCURRENCY = int(os.environ.get('MAIL_CONCURRENCY', 2))
+MAIL_POLL_INTERVAL = 5
+MAIL_SWEEP_INTERVAL = 300
+SMTP_SETTINGS_TTL = 60  # other processes see saved SMTP settings within this many seconds
 UPLOAD_DIR = Path(os.environ.get('UPLOAD_DIR', '/app/uploads'))
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 MAX_FILE_SIZE = 200 * 1024 * 1024  # 200MB
-VIDEO_COMPRESS_THRESHOLD = 80 * 1024 * 1024  # 80MB
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+MEDIA_STREAM_BATCH = 200
+JOB_VISIBILITY_TIMEOUT = int(os.environ.get('JOB_VISIBILITY_TIMEOUT_SECONDS', 120))
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 3))
+RECONCILE_INTERVAL = int(os.environ.get('RECONCILE_INTERVAL_SECONDS', 3600))  # 0 disables
+RESIZE_CACHE_DIR = Path(os.environ.get('RESIZE_CACHE_DIR', UPLOAD_DIR / '.resized'))
+RESIZE_CACHE_MAX_BYTES = int(os.environ.get('RESIZE_CACHE_MAX_MB', 2048)) * 1024 * 1024
+RESIZE_WORKERS = int(os.environ.get('RESIZE_WORKERS', 2))
+QR_CARD_CACHE_DIR = Path(os.environ.get('QR_CARD_CACHE_DIR', UPLOAD_DIR / '.qrcards'))
+QR_CARD_CACHE_MAX_BYTES = int(os.environ.get('QR_CARD_CACHE_MAX_MB', 256)) * 1024 * 1024
+QR_CARD_WORKERS = int(os.environ.get('QR_CARD_WORKERS', 1))
+MAX_GUEST_URL_LENGTH = 512
+FILE_CHUNK_SIZE = int(os.environ.get('FILE_CHUNK_SIZE_KB', 256)) * 1024
+# Offload: the API only looks files up; nginx sends the bytes from an internal location
+ACCEL_REDIRECT_PREFIX = os.environ.get('ACCEL_REDIRECT_PREFIX', '').rstrip('/')  # e.g. /_media
+ACCEL_ZIP = os.environ.get('ACCEL_ZIP', '').lower() == 'mod_zip'  # nginx built with mod_zip
+MAX_RANGES = 16
+PRESIGNED_REDIRECT_MAX_AGE = 300
+UPLOAD_CHUNK_SIZE = int(os.environ.get('UPLOAD_CHUNK_SIZE_MB', 8)) * 1024 * 1024
+UPLOAD_SESSION_TTL = int(os.environ.get('UPLOAD_SESSION_HOURS', 24)) * 3600
+# EXIF capture times carry no zone unless the camera wrote an offset tag
+CAPTURE_TIMEZONE = ZoneInfo(os.environ.get('CAPTURE_TIMEZONE', 'UTC'))
+BATCH_UPLOAD_MAX_FILES = int(os.environ.get('BATCH_UPLOAD_MAX_FILES', 50))
+BATCH_UPLOAD_CONCURRENCY = int(os.environ.get('BATCH_UPLOAD_CONCURRENCY', 4))
+BATCH_UPLOAD_MAX_BYTES = int(os.environ.get('BATCH_UPLOAD_MAX_MB', 200)) * 1024 * 1024
+UPLOAD_SWEEP_INTERVAL = 600
+RECONCILE_BATCH_SIZE = 200
 ADMIN_EMAIL = os.environ.get('ADMIN_EMAIL', '').lower().strip()
 
 client = AsyncIOMotorClient(MONGO_URL)
 db = client[DB_NAME]
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+job_queue = JobQueue(db.jobs, visibility_timeout=JOB_VISIBILITY_TIMEOUT, max_attempts=JOB_MAX_ATTEMPTS)
+storage = storage_from_env(UPLOAD_DIR)  # with S3, UPLOAD_DIR only holds in-progress uploads
+upload_sessions = UploadSessions(db.upload_sessions, UPLOAD_DIR, ttl=UPLOAD_SESSION_TTL)
+blob_store = BlobStore(db.blobs)
+smtp_settings = mail.SettingsCache(db.settings, ttl=SMTP_SETTINGS_TTL)
+outbox = mail.Outbox(JobQueue(db.mail_outbox, max_attempts=MAIL_MAX_ATTEMPTS, backoff_base=60),
+                     smtp_settings, mail.SMTPPool(size=MAIL_CONCURRENCY))
+
+passwords = PasswordHasher(PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE)
 security = HTTPBearer(auto_error=False)
 
 logging.basicConfig(level=logging.INFO)
@@ -57,9 +127,16 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Location", "Upload-Offset", "Upload-Length", "Upload-Expires"],
 )
 
 
+@app.exception_handler(PasswordBusy)
+async def password_busy(request: Request, exc: PasswordBusy):
+    return JSONResponse({"detail": "Too many sign-ins right now, please try again in a moment"},
+                        status_code=503, headers={"Retry-After": "2"})
+
+
 # --- Models ---
 class UserCreate(BaseModel):
     email: EmailStr
@@ -87,9 +164,10 @@ class EventUpdate(BaseModel):
 
 
 # --- Helpers ---
-def create_token(user_id: str) -> str:
+def create_token(user_id: str, token_version: int = 0) -> str:
+    """Session JWT; "ver" must match the user's token_version, which password changes bump."""
     expire = datetime.now(timezone.utc) + timedelta(days=JWT_EXPIRE_DAYS)
-    return jwt.encode({"sub": user_id, "exp": expire}, JWT_SECRET, algorithm=JWT_ALGO)
+    return jwt.encode({"sub": user_id, "ver": token_version, "exp": expire}, JWT_SECRET, algorithm=JWT_ALGO)
 
 
 def is_admin(user: dict) -> bool:
@@ -109,36 +187,282 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
             raise HTTPException(401, "Invalid token")
     except JWTError:
         raise HTTPException(401, "Invalid token")
-    user = await db.users.find_one({"_id": ObjectId(user_id)})
+    user = await cached_user(user_id)
     if not user:
         raise HTTPException(401, "User not found")
+    if payload.get("ver", 0) != user.get("token_version", 0):
+        raise HTTPException(401, "Session has been revoked, please log in again")
+    return user
+
+
+# user id -> (monotonic expiry, user without hashed_password), least recently used first
+user_cache: OrderedDict = OrderedDict()
+USER_PROJECTION = {"hashed_password": 0}
+
+
+async def cached_user(user_id: str) -> Optional[dict]:
+    """The user record for an authenticated request, from the cache when fresh."""
+    hit = user_cache.get(user_id)
+    if hit and hit[0] > time.monotonic():
+        user_cache.move_to_end(user_id)
+        return hit[1]
+    try:
+        user = await db.users.find_one({"_id": ObjectId(user_id)}, USER_PROJECTION)
+    except InvalidId:
+        return None
+    if user:
+        user_cache[user_id] = (time.monotonic() + USER_CACHE_TTL, user)
+        user_cache.move_to_end(user_id)
+        if len(user_cache) > USER_CACHE_SIZE:
+            user_cache.popitem(last=False)
+    else:
+        user_cache.pop(user_id, None)
     return user
 
 
+def forget_user(user_id) -> None:
+    user_cache.pop(str(user_id), None)
+
+
+async def revoke_tokens(user_id) -> int:
+    """Invalidate every session token issued to a user so far; returns the new token_version."""
+    user = await db.users.find_one_and_update(
+        {"_id": ObjectId(user_id)}, {"$inc": {"token_version": 1}},
+        projection={"token_version": 1}, return_document=ReturnDocument.AFTER,
+    )
+    forget_user(user_id)
+    return user["token_version"] if user else 0
+
+
 async def get_admin_user(current_user=Depends(get_current_user)):
     if not is_admin(current_user):
         raise HTTPException(403, "Admin access required")
     return current_user
 
 
-def compress_video(input_path: Path, output_path: Path) -> bool:
+def encode_cursor(value, oid) -> str:
+    """Opaque keyset cursor holding the last row's (sort value, _id)."""
+    raw = json.dumps([value, str(oid)]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple:
     try:
-        cmd = [
-            'ffmpeg', '-i', str(input_path),
-            '-vf', "scale=-2:'min(ih,1080)'",
-            '-crf', '18', '-preset', 'medium',
-            '-c:a', 'aac', '-b:a', '192k',
-            '-movflags', '+faststart', '-y',
-            str(output_path)
-        ]
-        result = subprocess.run(cmd, capture_output=True, timeout=600)
-        return result.returncode == 0 and output_path.exists()
-    except Exception as e:
-        logger.error(f"Video compression failed: {e}")
-        return False
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        value, oid = json.loads(raw)
+        return value, ObjectId(oid)
+    except Exception:
+        raise HTTPException(400, "Invalid cursor")
+
+
+def keyset_after(cursor: Optional[str], field: str = "created_at", descending: bool = True) -> dict:
+    """Match clause for the page that follows `cursor` when sorted on (field, _id)."""
+    if not cursor:
+        return {}
+    value, oid = decode_cursor(cursor)
+    op = "$lt" if descending else "$gt"
+    return {"$or": [
+        {field: {op: value}},
+        {field: value, "_id": {op: oid}},
+    ]}
+
+
+def keyset_sort(field: str = "created_at", descending: bool = True) -> dict:
+    direction = -1 if descending else 1
+    return {field: direction, "_id": direction}
+
+
+def paginate(docs: list, limit: int, response: Response, field: str = "created_at") -> list:
+    """Trim a limit+1 fetch to one page and advertise the next cursor if there is one."""
+    if len(docs) > limit:
+        docs = docs[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(docs[-1].get(field), docs[-1]["_id"])
+    return docs
+
+
+def event_listing_pipeline(match: dict, limit: int, field: str = "created_at", descending: bool = True) -> list:
+    return [
+        {"$match": match},
+        {"$sort": keyset_sort(field, descending)},
+        {"$limit": limit + 1},
+    ]
+
+
+# Sort keys accepted by the admin listings
+ADMIN_EVENT_SORTS = {"created_at", "title", "event_date", "media_count", "storage_bytes"}
+ADMIN_USER_SORTS = {"created_at", "name", "email"}
+
+ORGANIZER_LOOKUP = {"$lookup": {
+    "from": "users",
+    "let": {"oid": {"$convert": {"input": "$organizer_id", "to": "objectId", "onError": None, "onNull": None}}},
+    "pipeline": [
+        {"$match": {"$expr": {"$eq": ["$_id", "$$oid"]}}},
+        {"$project": {"name": 1, "email": 1}},
+    ],
+    "as": "organizer",
+}}
+
+# Counts each user's events (events.organizer_id is the stringified user _id)
+EVENTS_COUNT_LOOKUP = {"$lookup": {
+    "from": "events",
+    "let": {"uid": {"$toString": "$_id"}},
+    "pipeline": [
+        {"$match": {"$expr": {"$eq": ["$organizer_id", "$$uid"]}}},
+        {"$group": {"_id": None, "n": {"$sum": 1}}},
+    ],
+    "as": "events_counts",
+}}
+
+
+# --- Usage Counters ---
+# Each event carries media_count / storage_bytes, and counters{_id: "totals"} holds the
+# platform-wide sums. Writers keep them current with $inc; reconcile_usage() repairs drift.
+# A writer changes media or files first and bumps the counters after, so it calls
+# hold_usage() beforehand: until the hold lapses the reconciler leaves the event alone,
+# rather than recount the change and then have the writer's $inc count it again.
+TOTALS_ID = "totals"
+USAGE_HOLD = timedelta(minutes=15)
+
+
+async def hold_usage(event_id: str):
+    until = datetime.now(timezone.utc) + USAGE_HOLD
+    await db.events.update_one({"_id": ObjectId(event_id)}, {"$max": {"usage_hold_until": until}})
+
+
+async def bump_usage(event_id: str, media: int, nbytes: int):
+    inc = {"media_count": media, "storage_bytes": nbytes}
+    await db.events.update_one({"_id": ObjectId(event_id)}, {"$inc": inc})
+    await db.counters.update_one({"_id": TOTALS_ID}, {"$inc": inc}, upsert=True)
+
+
+async def record_skipped_transfer(event_id: str, nbytes: int):
+    """Count an upload whose bytes were never sent because the event already had them."""
+    inc = {"uploads_skipped": 1, "transfer_bytes_saved": nbytes}
+    await db.events.update_one({"_id": ObjectId(event_id)}, {"$inc": inc})
+    await db.counters.update_one({"_id": TOTALS_ID}, {"$inc": inc}, upsert=True)
+
+
+async def release_event_usage(event: dict):
+    """Subtract a deleted event's counters from the platform totals."""
+    await db.counters.update_one({"_id": TOTALS_ID}, {"$inc": {
+        "media_count": -event.get("media_count", 0),
+        "storage_bytes": -event.get("storage_bytes", 0),
+    }}, upsert=True)
+
+
+async def reconcile_usage():
+    """Recount media and stored bytes per event in batches, then rebuild the totals."""
+    repaired = 0
+    last_id = None
+    while True:
+        query = {"_id": {"$gt": last_id}} if last_id else {}
+        batch = await db.events.find(
+            query, {"media_count": 1, "storage_bytes": 1, "usage_hold_until": 1}
+        ).sort("_id", 1).limit(RECONCILE_BATCH_SIZE).to_list(RECONCILE_BATCH_SIZE)
+        if not batch:
+            break
+        last_id = batch[-1]["_id"]
+        ids = [str(e["_id"]) for e in batch]
+        counts = {
+            row["_id"]: row["n"]
+            async for row in db.media.aggregate([
+                {"$match": {"event_id": {"$in": ids}}},
+                {"$group": {"_id": "$event_id", "n": {"$sum": 1}}},
+            ])
+        }
+        for e in batch:
+            event_id = str(e["_id"])
+            hold = e.get("usage_hold_until")
+            if hold and hold.replace(tzinfo=timezone.utc) > datetime.now(timezone.utc):
+                continue  # a writer may have changed media or files without bumping yet
+            actual_count = counts.get(event_id, 0)
+            actual_bytes = await storage.usage(event_id)
+            if e.get("media_count") == actual_count and e.get("storage_bytes") == actual_bytes:
+                continue
+            # Only overwrite if no writer touched the counters, or took a hold, since we read them
+            result = await db.events.update_one(
+                {"_id": e["_id"], "media_count": e.get("media_count"), "storage_bytes": e.get("storage_bytes"),
+                 "usage_hold_until": hold},
+                {"$set": {"media_count": actual_count, "storage_bytes": actual_bytes}}
+            )
+            repaired += result.modified_count
+
+    totals = await db.events.aggregate([
+        {"$group": {"_id": None, "media_count": {"$sum": "$media_count"}, "storage_bytes": {"$sum": "$storage_bytes"}}},
+    ]).to_list(1)
+    summary = totals[0] if totals else {"media_count": 0, "storage_bytes": 0}
+    await db.counters.update_one({"_id": TOTALS_ID}, {"$set": {
+        "media_count": summary["media_count"],
+        "storage_bytes": summary["storage_bytes"],
+        "reconciled_at": datetime.now(timezone.utc).isoformat(),
+    }}, upsert=True)
+    if repaired:
+        logger.info(f"Usage reconciler repaired counters on {repaired} events")
+
+
+async def reconcile_loop():
+    while True:
+        try:
+            await reconcile_usage()
+        except Exception as e:
+            logger.error(f"Usage reconciliation failed: {e}")
+        await asyncio.sleep(RECONCILE_INTERVAL)
+
+
+def parse_byte_ranges(header: Optional[str], size: int) -> Optional[list]:
+    """
+    Parse a Range header into inclusive (start, end) pairs.
+    Returns None when there is no usable header (serve the full body) and
+    raises 416 when the ranges are well-formed but none can be satisfied.
+    """
+    if not header or not header.startswith("bytes="):
+        return None
+    ranges = []
+    for spec in header[len("bytes="):].split(","):
+        start_s, sep, end_s = spec.strip().partition("-")
+        if not sep:
+            return None
+        try:
+            if start_s:
+                start = int(start_s)
+                end = int(end_s) if end_s else size - 1
+                if start > end and end_s:
+                    return None
+            else:
+                suffix = int(end_s)
+                if suffix == 0:
+                    continue
+                start, end = max(0, size - suffix), size - 1
+        except ValueError:
+            return None
+        if start < size:
+            ranges.append((start, min(end, size - 1)))
+    if not ranges:
+        raise HTTPException(416, "Range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+    return ranges
+
+
+def coalesce_ranges(ranges: list) -> list:
+    """Sort ranges and merge any that overlap or touch, so no byte is sent twice."""
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def if_range_matches(if_range: Optional[str], etag: Optional[str], last_modified: str) -> bool:
+    """If-Range holds a strong ETag or an HTTP date; ranges are served only if it still matches."""
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return bool(etag) and if_range == etag
+    return if_range == last_modified
 
 
-def fmt_event(event: dict, media_count: int = 0) -> dict:
+def fmt_event(event: dict, media_count: Optional[int] = None) -> dict:
     return {
         "id": str(event["_id"]),
         "title": event["title"],
@@ -149,7 +473,7 @@ def fmt_event(event: dict, media_count: int = 0) -> dict:
         "event_date": event.get("event_date", ""),
         "slug": event["slug"],
         "organizer_id": event["organizer_id"],
-        "media_count": media_count,
+        "media_count": event.get("media_count", 0) if media_count is None else media_count,
         "is_paid": event.get("is_paid", False),
         "payment_status": event.get("payment_status", "unpaid"),
         "qr_template": event.get("qr_template", ""),
@@ -168,7 +492,16 @@ def fmt_media(m: dict) -> dict:
         "file_size": m["file_size"],
         "uploader_name": m["uploader_name"],
         "created_at": m["created_at"],
-        "url": f"/api/files/{m['event_id']}/{m['filename']}"
+        "taken_at": m.get("taken_at", m["created_at"]),
+        "metadata": m.get("metadata", {}),
+        "processing_status": m.get("processing_status", "ready"),
+        "url": f"/api/files/{m['event_id']}/{m['filename']}",
+        # Downscaled WebP/JPEG copies for grids, smallest first (empty until the worker has made them)
+        "renditions": [
+            {"width": r["width"], "height": r["height"], "format": r["format"],
+             "url": f"/api/files/{m['event_id']}/{r['filename']}"}
+            for r in m.get("renditions", [])
+        ],
     }
 
 
@@ -181,184 +514,188 @@ def fmt_user_response(user: dict) -> dict:
     }
 
 
-# --- QR Card Templates (mirrors frontend PrintableQRCards.jsx) ---
-QR_CARD_TEMPLATES = {
-    "wedding": {
-        "golden_elegance": {"bgColor": "#FDF8F3", "borderColor": "#D4AF37", "textColor": "#2C1810", "accentColor": "#B8960C", "bgImage": "golden_elegance.png"},
-        "botanical_garden": {"bgColor": "#FFFFFF", "borderColor": "#7BA883", "textColor": "#2D3B2E", "accentColor": "#6B8E6B", "bgImage": "botanical_garden.png"},
-        "midnight_romance": {"bgColor": "#0F1B33", "borderColor": "#C5A55A", "textColor": "#FFFFFF", "accentColor": "#C5A55A", "bgImage": "midnight_romance.png"},
-        "modern_minimal": {"bgColor": "#FFFFFF", "borderColor": "#1A1A1A", "textColor": "#1A1A1A", "accentColor": "#666666"},
-    },
-    "birthday": {
-        "confetti_party": {"bgColor": "#FFF9E6", "borderColor": "#FF6B9D", "textColor": "#333333", "accentColor": "#FF6B9D"},
-        "balloon_fun": {"bgColor": "#E8F4FD", "borderColor": "#4ECDC4", "textColor": "#2C3E50", "accentColor": "#FF6B6B"},
-        "elegant_gold": {"bgColor": "#1A1A2E", "borderColor": "#FFD700", "textColor": "#FFFFFF", "accentColor": "#FFD700"},
-        "rainbow_bright": {"bgColor": "#FFFFFF", "borderColor": "#FF6B6B", "textColor": "#333333", "accentColor": "#4ECDC4"},
-    },
-    "corporate": {
-        "professional_navy": {"bgColor": "#0F2744", "borderColor": "#3B82F6", "textColor": "#FFFFFF", "accentColor": "#60A5FA"},
-        "clean_white": {"bgColor": "#FFFFFF", "borderColor": "#E5E7EB", "textColor": "#111827", "accentColor": "#6B7280"},
-        "tech_modern": {"bgColor": "#111827", "borderColor": "#10B981", "textColor": "#FFFFFF", "accentColor": "#10B981"},
-        "executive_grey": {"bgColor": "#F3F4F6", "borderColor": "#374151", "textColor": "#1F2937", "accentColor": "#4B5563"},
-    },
-}
-
-QR_CARD_SIZES = {
-    "10x8": (960, 768),
-    "8x6": (768, 576),
+# --- Indexes ---
+# Declarative index set, applied idempotently by ensure_indexes() at startup.
+# Every query shape in QUERY_SHAPES must be served by one of these (see manage.py explain).
+INDEXES = {
+    "users": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)], name="created_at_id"),
+        IndexModel([("name", ASCENDING), ("_id", ASCENDING)], name="name_id"),
+        IndexModel([("email", ASCENDING), ("_id", ASCENDING)], name="email_id"),
+    ],
+    "events": [
+        IndexModel([("slug", ASCENDING)], name="slug_unique", unique=True),
+        IndexModel([("organizer_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+                   name="organizer_created_at_id"),
+        IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)], name="created_at_id"),
+        IndexModel([("title", ASCENDING), ("_id", ASCENDING)], name="title_id"),
+        IndexModel([("event_date", ASCENDING), ("_id", ASCENDING)], name="event_date_id"),
+        IndexModel([("media_count", ASCENDING), ("_id", ASCENDING)], name="media_count_id"),
+        IndexModel([("storage_bytes", ASCENDING), ("_id", ASCENDING)], name="storage_bytes_id"),
+    ],
+    "media": [
+        IndexModel([("event_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+                   name="event_created_at_id"),
+        IndexModel([("event_id", ASCENDING), ("filename", ASCENDING)], name="event_filename"),
+        IndexModel([("event_id", ASCENDING), ("renditions.filename", ASCENDING)], name="event_rendition_filename"),
+        IndexModel([("blob_id", ASCENDING)], name="blob_id"),
+        IndexModel([("event_id", ASCENDING), ("taken_at", ASCENDING), ("_id", ASCENDING)], name="event_taken_at_id"),
+    ],
+    "blobs": [
+        IndexModel([("event_id", ASCENDING), ("sha256", ASCENDING)], name="event_sha256_unique", unique=True),
+    ],
+    "settings": [
+        IndexModel([("type", ASCENDING)], name="type_unique", unique=True),
+    ],
+    "jobs": [
+        IndexModel([("status", ASCENDING), ("run_at", ASCENDING)], name="status_run_at"),
+    ],
+    "mail_outbox": [
+        IndexModel([("status", ASCENDING), ("run_at", ASCENDING)], name="status_run_at"),
+    ],
+    "upload_sessions": [
+        IndexModel([("expires_at", ASCENDING)], name="expires_at"),
+        IndexModel([("event_id", ASCENDING)], name="event_id"),
+    ],
 }
 
 
-def hex_to_rgb(hex_color: str) -> tuple:
-    hex_color = hex_color.lstrip('#')
-    return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
-
-
-# Mapping old template keys to new ones for backward compatibility
-TEMPLATE_KEY_MIGRATION = {
-    "elegant_frame": "golden_elegance",
-    "romantic_floral": "botanical_garden",
-    "rustic_kraft": "midnight_romance",
-}
-
-
-def generate_qr_card_image(event_type: str, template_key: str, size_key: str,
-                           event_title: str, event_subtitle: str, guest_url: str) -> bytes:
-    """Generate a printable QR card image with the QR code centered."""
-    templates = QR_CARD_TEMPLATES.get(event_type, QR_CARD_TEMPLATES["wedding"])
-    # Migrate old template keys to new ones
-    resolved_key = TEMPLATE_KEY_MIGRATION.get(template_key, template_key)
-    tmpl = templates.get(resolved_key)
-    if not tmpl:
-        tmpl = list(templates.values())[0]
-
-    width, height = QR_CARD_SIZES.get(size_key, (960, 768))
-
-    bg_rgb = hex_to_rgb(tmpl["bgColor"])
-    border_rgb = hex_to_rgb(tmpl["borderColor"])
-    text_rgb = hex_to_rgb(tmpl["textColor"])
-    accent_rgb = hex_to_rgb(tmpl["accentColor"])
-
-    # Use background image if available
-    bg_image_name = tmpl.get("bgImage")
-    if bg_image_name:
-        bg_path = ROOT_DIR / "templates" / bg_image_name
-        if bg_path.exists():
-            img = Image.open(bg_path).convert("RGB").resize((width, height), Image.LANCZOS)
-        else:
-            img = Image.new("RGB", (width, height), bg_rgb)
-    else:
-        img = Image.new("RGB", (width, height), bg_rgb)
-        draw_border = ImageDraw.Draw(img)
-        bw = 6
-        draw_border.rectangle([bw // 2, bw // 2, width - bw // 2, height - bw // 2], outline=border_rgb, width=bw)
-
-    has_bg_image = bg_image_name and (ROOT_DIR / "templates" / bg_image_name).exists()
-
-    # For background-image templates, add a semi-transparent centre panel for readability
-    if has_bg_image:
-        overlay = Image.new("RGBA", (width, height), (0, 0, 0, 0))
-        overlay_draw = ImageDraw.Draw(overlay)
-        # Determine panel colour based on background brightness
-        is_dark_bg = tmpl["bgColor"].lower() in ("#0f1b33", "#1a1a2e", "#111827", "#0f2744")
-        panel_color = (0, 0, 0, 100) if is_dark_bg else (255, 255, 255, 180)
-        margin_x = int(width * 0.12)
-        margin_y = int(height * 0.04)
-        overlay_draw.rounded_rectangle(
-            [margin_x, margin_y, width - margin_x, height - margin_y],
-            radius=20, fill=panel_color
+async def ensure_indexes():
+    for collection, models in INDEXES.items():
+        try:
+            await db[collection].create_indexes(models)
+        except PyMongoError as e:
+            # Typically existing duplicates blocking a unique index; the app still works without it
+            logger.error(f"Could not create indexes on {collection}: {e}")
+
+
+def _sample_oid() -> ObjectId:
+    return ObjectId("000000000000000000000000")
+
+
+def query_shapes() -> list:
+    """(name, collection, explain command body) for every query shape the routes issue."""
+    oid = str(_sample_oid())
+    cursor = encode_cursor("2026-01-01T00:00:00+00:00", oid)
+    shapes = [
+        ("users by email", "users", {"find": "users", "filter": {"email": "a@b.c"}}),
+        ("users by id", "users", {"find": "users", "filter": {"_id": _sample_oid()}}),
+        ("events by slug", "events", {"find": "events", "filter": {"slug": "abcd1234"}}),
+        ("events by id and organizer", "events", {"find": "events", "filter": {"_id": _sample_oid(), "organizer_id": oid}}),
+        ("events by organizer", "events", {"find": "events", "filter": {"organizer_id": oid}}),
+        ("organizer event listing", "events", {"aggregate": "events", "cursor": {}, "pipeline":
+            event_listing_pipeline({"organizer_id": oid, **keyset_after(cursor)}, DEFAULT_PAGE_SIZE)}),
+        ("media listing", "media", {"find": "media", "filter": {"event_id": oid, **keyset_after(cursor)},
+                                    "sort": keyset_sort(), "limit": DEFAULT_PAGE_SIZE + 1}),
+        ("media timeline", "media", {"find": "media", "filter": {
+            "event_id": oid, "taken_at": {"$gte": "2026-01-01T00:00:00+00:00", "$lt": "2026-01-02T00:00:00+00:00"},
+            **keyset_after(cursor, "taken_at", False)},
+            "sort": keyset_sort("taken_at", False), "limit": DEFAULT_PAGE_SIZE + 1}),
+        ("media download", "media", {"find": "media", "filter": {"event_id": oid}, "sort": {"created_at": 1}}),
+        ("media counts by event batch", "media", {"aggregate": "media", "cursor": {}, "pipeline": [
+            {"$match": {"event_id": {"$in": [oid]}}},
+            {"$group": {"_id": "$event_id", "n": {"$sum": 1}}},
+        ]}),
+        ("file metadata", "media", {"find": "media", "filter": stored_file_query(oid, "a.jpg"), "limit": 1}),
+        ("smtp settings", "settings", {"find": "settings", "filter": {"type": "smtp"}}),
+        ("expired upload sessions", "upload_sessions", {"find": "upload_sessions",
+            "filter": {"expires_at": {"$lt": datetime(2026, 1, 1, tzinfo=timezone.utc)}}}),
+        ("upload sessions by event", "upload_sessions", {"find": "upload_sessions", "filter": {"event_id": oid}}),
+        ("blob by content", "blobs", {"find": "blobs", "filter": {"event_id": oid, "sha256": "0" * 64}}),
+        ("blobs by event", "blobs", {"find": "blobs", "filter": {"event_id": oid}}),
+        ("media by blob", "media", {"find": "media", "filter": {"blob_id": _sample_oid()}}),
+        ("dedupe report", "media", {"aggregate": "media", "cursor": {}, "pipeline": dedupe_pipeline(oid)}),
+    ]
+    # The job queues are polled constantly: by every worker lane and every API mail sender
+    now = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    for collection, kinds in (("jobs", ["transcode_video"]), ("jobs", ["thumbnails"]), ("mail_outbox", [mail.EMAIL])):
+        shapes.append((f"{collection} claim {'/'.join(kinds)}", collection, {
+            "findAndModify": collection, "query": claim_filter(kinds, now), "sort": dict(CLAIM_SORT),
+            "update": {"$set": {"status": RUNNING}, "$inc": {"attempts": 1}}}))
+    for collection in ("jobs", "mail_outbox"):
+        shapes.append((f"{collection} expired leases", collection,
+                       {"find": collection, "filter": expired_filter(now), "limit": 100}))
+    for sort in sorted(ADMIN_EVENT_SORTS):
+        for descending in (True, False):
+            shapes.append((f"admin events by {sort} {'desc' if descending else 'asc'}", "events", {"find": "events",
+                "filter": keyset_after(encode_cursor(0 if "count" in sort or "bytes" in sort else "x", oid), sort, descending),
+                "sort": keyset_sort(sort, descending), "limit": DEFAULT_PAGE_SIZE + 1}))
+    for sort in sorted(ADMIN_USER_SORTS):
+        for descending in (True, False):
+            shapes.append((f"admin users by {sort} {'desc' if descending else 'asc'}", "users", {"find": "users",
+                "filter": keyset_after(encode_cursor("x", oid), sort, descending),
+                "sort": keyset_sort(sort, descending), "limit": DEFAULT_PAGE_SIZE + 1}))
+    return shapes
+
+
+def plan_stages(node) -> set:
+    """All plan stage names anywhere in an explain() document."""
+    stages = set()
+    if isinstance(node, dict):
+        if isinstance(node.get("stage"), str):
+            stages.add(node["stage"])
+        for v in node.values():
+            stages |= plan_stages(v)
+    elif isinstance(node, list):
+        for v in node:
+            stages |= plan_stages(v)
+    return stages
+
+
+async def explain_query_shapes() -> list:
+    """Explain every query shape; returns the names of shapes that fall back to COLLSCAN."""
+    collscans = []
+    for name, _collection, command in query_shapes():
+        explain = await db.command({"explain": command, "verbosity": "queryPlanner"})
+        if "COLLSCAN" in plan_stages(explain):
+            collscans.append(name)
+    return collscans
+
+
+# --- QR Cards (see qrcards.py) ---
+card_cache = resizer.RenditionCache(QR_CARD_CACHE_DIR, QR_CARD_CACHE_MAX_BYTES)
+card_pool = None  # ProcessPoolExecutor, created on first render
+
+
+def get_card_pool() -> ProcessPoolExecutor:
+    global card_pool
+    if card_pool is None:
+        context = get_context("forkserver")
+        context.set_forkserver_preload(["qrcards"])
+        card_pool = ProcessPoolExecutor(max_workers=QR_CARD_WORKERS, mp_context=context,
+                                        initializer=qrcards.preload)
+    return card_pool
+
+
+async def qr_card_file(event_type: str, template_key: str, size_key: str,
+                       event_title: str, event_subtitle: str, guest_url: str) -> tuple:
+    """(path, cache key) of the rendered card PNG, rendering it in the card pool on a miss."""
+    key = qrcards.cache_key(event_type, template_key, size_key, event_title, event_subtitle, guest_url)
+
+    async def render(dest: Path) -> int:
+        return await asyncio.get_running_loop().run_in_executor(
+            get_card_pool(), qrcards.render_card_file,
+            event_type, template_key, size_key, event_title, event_subtitle, guest_url, dest
         )
-        img = img.convert("RGBA")
-        img = Image.alpha_composite(img, overlay).convert("RGB")
 
-    draw = ImageDraw.Draw(img)
+    return await card_cache.get_or_render(key, render), key
 
-    # Load fonts — larger sizes for readability
-    try:
-        title_size = int(width * 0.07) if has_bg_image else int(width * 0.052)
-        subtitle_size = int(width * 0.038) if has_bg_image else int(width * 0.028)
-        footer_size = int(width * 0.045) if has_bg_image else int(width * 0.035)
-        serif_bold = ImageFont.truetype("/usr/share/fonts/truetype/liberation/LiberationSerif-Bold.ttf", title_size)
-        sans_reg = ImageFont.truetype("/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf", subtitle_size)
-        sans_bold = ImageFont.truetype("/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf", footer_size)
-    except Exception:
-        serif_bold = ImageFont.load_default()
-        sans_reg = ImageFont.load_default()
-        sans_bold = ImageFont.load_default()
-
-    # Header subtitle text
-    header_map = {"wedding": "SHARE YOUR MEMORIES", "birthday": "CAPTURE THE FUN!", "corporate": "EVENT PHOTOS"}
-    header_text = header_map.get(event_type, "EVENT PHOTOS")
-    hbox = draw.textbbox((0, 0), header_text, font=sans_reg)
-    draw.text(((width - (hbox[2] - hbox[0])) // 2, int(height * 0.07)), header_text, fill=accent_rgb, font=sans_reg)
-
-    # Event title
-    tbox = draw.textbbox((0, 0), event_title, font=serif_bold)
-    title_w = tbox[2] - tbox[0]
-    display_title = event_title
-    if title_w > width * 0.80:
-        while title_w > width * 0.80 and len(display_title) > 10:
-            display_title = display_title[:-1]
-            tbox = draw.textbbox((0, 0), display_title + "...", font=serif_bold)
-            title_w = tbox[2] - tbox[0]
-        display_title += "..."
-        tbox = draw.textbbox((0, 0), display_title, font=serif_bold)
-        title_w = tbox[2] - tbox[0]
-    draw.text(((width - title_w) // 2, int(height * 0.13)), display_title, fill=text_rgb, font=serif_bold)
-
-    # Event subtitle
-    if event_subtitle:
-        sbox = draw.textbbox((0, 0), event_subtitle, font=sans_reg)
-        draw.text(((width - (sbox[2] - sbox[0])) // 2, int(height * 0.22)), event_subtitle, fill=accent_rgb, font=sans_reg)
-
-    # Generate QR code image
-    qr = qrcode.QRCode(version=1, error_correction=qrcode.constants.ERROR_CORRECT_H, box_size=10, border=2)
-    qr.add_data(guest_url)
-    qr.make(fit=True)
-    qr_img = qr.make_image(fill_color="black", back_color="white").convert("RGB")
-
-    qr_size = int(min(width, height) * 0.38)
-    qr_img = qr_img.resize((qr_size, qr_size), Image.LANCZOS)
-
-    # Center the QR code
-    qr_x = (width - qr_size) // 2
-    qr_y = (height - qr_size) // 2 + int(height * 0.02)
-
-    # QR white background + border
-    pad = 16
-    draw.rounded_rectangle(
-        [qr_x - pad, qr_y - pad, qr_x + qr_size + pad, qr_y + qr_size + pad],
-        radius=12, fill=(255, 255, 255), outline=border_rgb, width=4
-    )
-    img.paste(qr_img, (qr_x, qr_y))
-
-    # Footer
-    ft = "Scan to Upload"
-    fbox = draw.textbbox((0, 0), ft, font=sans_bold)
-    draw.text(((width - (fbox[2] - fbox[0])) // 2, int(height * 0.82)), ft, fill=text_rgb, font=sans_bold)
-
-    pt = "Photos & Videos"
-    pbox = draw.textbbox((0, 0), pt, font=sans_reg)
-    draw.text(((width - (pbox[2] - pbox[0])) // 2, int(height * 0.88)), pt, fill=accent_rgb, font=sans_reg)
-
-    bt = "SnapVault"
-    bbox = draw.textbbox((0, 0), bt, font=sans_reg)
-    draw.text(((width - (bbox[2] - bbox[0])) // 2, int(height * 0.93)), bt, fill=accent_rgb, font=sans_reg)
 
-    buf = io.BytesIO()
-    img.save(buf, format="PNG")
-    buf.seek(0)
-    return buf.getvalue()
+async def generate_qr_card_image(event_type: str, template_key: str, size_key: str,
+                                 event_title: str, event_subtitle: str, guest_url: str) -> bytes:
+    """Generate a printable QR card image with the QR code centered, as PNG."""
+    path, _key = await qr_card_file(event_type, template_key, size_key, event_title, event_subtitle, guest_url)
+    return await asyncio.to_thread(path.read_bytes)
 
 
 async def send_qr_email(to_email: str, organizer_name: str, event_title: str,
                         event_date: str, qr_template_name: str, qr_size: str,
-                        qr_image_bytes: bytes) -> bool:
-    """Send the QR card image via email using saved SMTP settings."""
-    settings = await db.settings.find_one({"type": "smtp"})
-    if not settings or not settings.get("smtp_password"):
+                        qr_image_bytes: bytes) -> Optional[ObjectId]:
+    """Queue the QR card image for emailing with the saved SMTP settings; its outbox id, or None if SMTP isn't set up."""
+    if not mail.is_configured(await smtp_settings.get()):
         logger.warning("SMTP not configured or password missing — skipping email")
-        return False
+        return None
 
     size_label = '10" x 8"' if qr_size == "10x8" else '8" x 6"'
 
@@ -372,74 +709,14 @@ async def send_qr_email(to_email: str, organizer_name: str, event_title: str,
         except Exception:
             deadline_text = ""
 
-    try:
-        msg = MIMEMultipart()
-        msg["From"] = settings["smtp_user"]
-        msg["To"] = to_email
-        msg["Subject"] = f"Your SnapVault QR Card is Ready — {event_title}"
-
-        html = f"""<html><body style="font-family:Georgia,serif;max-width:600px;margin:0 auto;padding:30px;color:#2C1810;background:#FDFAF6;">
-
-<h2 style="color:#1a1a2e;margin-bottom:5px;">Thank You, {organizer_name}!</h2>
-
-<p style="font-size:16px;line-height:1.6;">
-We really appreciate you choosing <strong>SnapVault</strong> for your event. It means the world to us that you've trusted us to be part of <strong>{event_title}</strong> — we hope it's a truly wonderful occasion.
-</p>
-
-<p style="font-size:16px;line-height:1.6;">
-Your payment has been confirmed and your personalised QR card is attached to this email, ready for you to print and display at your venue. Once your guests scan the code, they'll be able to upload their photos and videos straight to your private gallery.
-</p>
-
-<div style="background:#F5F0E8;border-radius:12px;padding:18px 22px;margin:20px 0;border-left:4px solid #C5A55A;">
-  <p style="margin:0 0 6px 0;font-size:14px;color:#666;">Your Order Summary</p>
-  <p style="margin:0;font-size:15px;"><strong>Event:</strong> {event_title}</p>
-  <p style="margin:4px 0 0 0;font-size:15px;"><strong>Template:</strong> {qr_template_name}</p>
-  <p style="margin:4px 0 0 0;font-size:15px;"><strong>Card Size:</strong> {size_label}</p>
-</div>
-
-<p style="font-size:16px;line-height:1.6;">
-Your guest gallery will be available for <strong>three months from your event date</strong>{f" (until {deadline_text})" if deadline_text else ""} — that's plenty of time for you and your guests to browse, relive the memories and download everything at your leisure. No rush at all!
-</p>
-
-<p style="font-size:16px;line-height:1.6;">
-If you have any questions or need anything at all, don't hesitate to get in touch. We're here to help make your event as special as possible.
-</p>
-
-<p style="font-size:16px;line-height:1.6;margin-top:25px;">
-Warm regards,<br/>
-<strong>Mark</strong><br/>
-<em>Weddings By Mark</em>
-</p>
-
-<hr style="border:none;border-top:1px solid #E5DDD0;margin:25px 0 15px 0;"/>
-<p style="font-size:12px;color:#999;text-align:center;">
-SnapVault — Designed and hosted by Weddings By Mark
-</p>
-
-</body></html>"""
-        msg.attach(MIMEText(html, "html"))
-
-        safe_name = "".join(c if c.isalnum() or c in " _-" else "_" for c in event_title)
-        image_part = MIMEImage(qr_image_bytes, name=f"{safe_name}_QR_Card.png")
-        image_part.add_header("Content-Disposition", "attachment", filename=f"{safe_name}_QR_Card.png")
-        msg.attach(image_part)
-
-        port = int(settings["smtp_port"])
-        if port == 465:
-            with smtplib.SMTP_SSL(settings["smtp_host"], port, timeout=30) as server:
-                server.login(settings["smtp_user"], settings["smtp_password"])
-                server.sendmail(settings["smtp_user"], to_email, msg.as_string())
-        else:
-            with smtplib.SMTP(settings["smtp_host"], port, timeout=30) as server:
-                server.starttls()
-                server.login(settings["smtp_user"], settings["smtp_password"])
-                server.sendmail(settings["smtp_user"], to_email, msg.as_string())
-
-        logger.info(f"QR card email sent to {to_email} for event '{event_title}'")
-        return True
-    except Exception as e:
-        logger.error(f"Email sending failed: {e}")
-        return False
+    html = mail.render("qr_card", organizer_name=organizer_name, event_title=event_title,
+                       qr_template_name=qr_template_name, size_label=size_label, deadline=deadline_text)
+    safe_name = "".join(c if c.isalnum() or c in " _-" else "_" for c in event_title)
+    message_id = await outbox.enqueue(to_email, f"Your SnapVault QR Card is Ready — {event_title}", html, [
+        {"filename": f"{safe_name}_QR_Card.png", "subtype": "png", "content": qr_image_bytes},
+    ])
+    logger.info(f"QR card email queued for {to_email} for event '{event_title}'")
+    return message_id
 
 
 # --- Auth Routes ---
@@ -450,10 +727,13 @@ async def register(user_data: UserCreate):
     doc = {
         "email": user_data.email.lower(),
         "name": user_data.name,
-        "hashed_password": pwd_context.hash(user_data.password),
+        "hashed_password": await passwords.hash(user_data.password),
         "created_at": datetime.now(timezone.utc).isoformat()
     }
-    result = await db.users.insert_one(doc)
+    try:
+        result = await db.users.insert_one(doc)
+    except DuplicateKeyError:
+        raise HTTPException(400, "Email already registered")
     doc["_id"] = result.inserted_id
     token = create_token(str(result.inserted_id))
     return {"token": token, "user": fmt_user_response(doc)}
@@ -462,9 +742,16 @@ async def register(user_data: UserCreate):
 @api_router.post("/auth/login")
 async def login(creds: UserLogin):
     user = await db.users.find_one({"email": creds.email.lower()})
-    if not user or not pwd_context.verify(creds.password, user["hashed_password"]):
+    if not user:
         raise HTTPException(401, "Invalid email or password")
-    token = create_token(str(user["_id"]))
+    valid, new_hash = await passwords.verify_and_update(creds.password, user["hashed_password"])
+    if not valid:
+        raise HTTPException(401, "Invalid email or password")
+    if new_hash:
+        # Hashed under a lower cost than today's; only the exact old hash is replaced
+        await db.users.update_one({"_id": user["_id"], "hashed_password": user["hashed_password"]},
+                                  {"$set": {"hashed_password": new_hash}})
+    token = create_token(str(user["_id"]), user.get("token_version", 0))
     return {"token": token, "user": fmt_user_response(user)}
 
 
@@ -480,8 +767,9 @@ class ChangePassword(BaseModel):
 
 @api_router.post("/auth/change-password")
 async def change_password(data: ChangePassword, current_user=Depends(get_current_user)):
-    # Verify current password
-    if not pwd_context.verify(data.current_password, current_user["hashed_password"]):
+    # Verify current password (the cached user carries no hash)
+    user = await db.users.find_one({"_id": current_user["_id"]}, {"hashed_password": 1})
+    if not user or not await passwords.verify(data.current_password, user["hashed_password"]):
         raise HTTPException(400, "Current password is incorrect")
     
     # Validate new password
@@ -489,13 +777,15 @@ async def change_password(data: ChangePassword, current_user=Depends(get_current
         raise HTTPException(400, "New password must be at least 6 characters")
     
     # Update password
-    new_hash = pwd_context.hash(data.new_password)
+    new_hash = await passwords.hash(data.new_password)
     await db.users.update_one(
         {"_id": current_user["_id"]},
         {"$set": {"hashed_password": new_hash}}
     )
-    
-    return {"message": "Password changed successfully"}
+
+    # Sign out every other session; this one carries on with a fresh token
+    version = await revoke_tokens(current_user["_id"])
+    return {"message": "Password changed successfully", "token": create_token(str(current_user["_id"]), version)}
 
 
 class ForgotPasswordRequest(BaseModel):
@@ -525,54 +815,15 @@ async def forgot_password(data: ForgotPasswordRequest):
     )
 
     # Send reset email
-    settings = await db.settings.find_one({"type": "smtp"})
-    if not settings or not settings.get("smtp_password"):
+    if not mail.is_configured(await smtp_settings.get()):
         logger.warning("SMTP not configured — cannot send reset email")
         raise HTTPException(503, "Email service is not configured. Please contact the administrator.")
 
-    try:
-        site_url = data.site_url or os.environ.get("SITE_URL", "")
-        reset_url = f"{site_url}/reset-password?token={reset_token}"
-
-        msg_obj = MIMEMultipart()
-        msg_obj["From"] = settings["smtp_user"]
-        msg_obj["To"] = email
-        msg_obj["Subject"] = "SnapVault — Password Reset"
-
-        html = f"""<html><body style="font-family:Georgia,serif;max-width:600px;margin:0 auto;padding:30px;color:#2C1810;background:#FDFAF6;">
-<h2 style="color:#1a1a2e;">Password Reset</h2>
-<p style="font-size:16px;line-height:1.6;">
-Hi {user.get('name', '')},
-</p>
-<p style="font-size:16px;line-height:1.6;">
-We received a request to reset your password. Click the link below to set a new one:
-</p>
-<p style="margin:25px 0;">
-<a href="{reset_url}" style="display:inline-block;background:#4F46E5;color:#FFFFFF;text-decoration:none;padding:14px 28px;border-radius:12px;font-weight:bold;font-size:15px;">Reset My Password</a>
-</p>
-<p style="font-size:14px;color:#888;line-height:1.5;">
-This link expires in 1 hour. If you didn't request a password reset, you can safely ignore this email.
-</p>
-<hr style="border:none;border-top:1px solid #E5DDD0;margin:25px 0 15px 0;"/>
-<p style="font-size:12px;color:#999;text-align:center;">SnapVault — Designed and hosted by Weddings By Mark</p>
-</body></html>"""
-        msg_obj.attach(MIMEText(html, "html"))
-
-        port = int(settings["smtp_port"])
-        if port == 465:
-            with smtplib.SMTP_SSL(settings["smtp_host"], port, timeout=30) as server:
-                server.login(settings["smtp_user"], settings["smtp_password"])
-                server.sendmail(settings["smtp_user"], email, msg_obj.as_string())
-        else:
-            with smtplib.SMTP(settings["smtp_host"], port, timeout=30) as server:
-                server.starttls()
-                server.login(settings["smtp_user"], settings["smtp_password"])
-                server.sendmail(settings["smtp_user"], email, msg_obj.as_string())
-
-        logger.info(f"Password reset email sent to {email}")
-    except Exception as e:
-        logger.error(f"Failed to send reset email: {e}")
-        raise HTTPException(503, "Failed to send reset email. Please try again later.")
+    site_url = data.site_url or os.environ.get("SITE_URL", "")
+    reset_url = f"{site_url}/reset-password?token={reset_token}"
+    html = mail.render("password_reset", name=user.get("name", ""), reset_url=reset_url)
+    await outbox.enqueue(email, "SnapVault — Password Reset", html)
+    logger.info(f"Password reset email queued for {email}")
 
     return {"message": "If an account exists, a reset link has been sent"}
 
@@ -591,29 +842,32 @@ async def reset_password(data: ResetPasswordRequest):
     if len(data.new_password) < 6:
         raise HTTPException(400, "Password must be at least 6 characters")
 
-    user = await db.users.find_one({"_id": ObjectId(user_id)})
+    user = await db.users.find_one({"_id": ObjectId(user_id)}, {"_id": 1})
     if not user:
         raise HTTPException(400, "Invalid reset token")
 
     await db.users.update_one(
         {"_id": ObjectId(user_id)},
-        {"$set": {"hashed_password": pwd_context.hash(data.new_password)}}
+        {"$set": {"hashed_password": await passwords.hash(data.new_password)}}
     )
+    await revoke_tokens(user_id)  # whoever had the old password is signed out
 
     return {"message": "Password reset successfully"}
 
 
 # --- Event Routes ---
 @api_router.get("/events")
-async def get_events(current_user=Depends(get_current_user)):
-    events = await db.events.find(
-        {"organizer_id": str(current_user["_id"])}
-    ).sort("created_at", -1).to_list(100)
-    result = []
-    for e in events:
-        count = await db.media.count_documents({"event_id": str(e["_id"])})
-        result.append(fmt_event(e, count))
-    return result
+async def get_events(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user=Depends(get_current_user)
+):
+    """List the organizer's events newest first; follow X-Next-Cursor for further pages."""
+    match = {"organizer_id": str(current_user["_id"]), **keyset_after(cursor)}
+    events = await db.events.aggregate(event_listing_pipeline(match, limit)).to_list(limit + 1)
+    events = paginate(events, limit, response)
+    return [fmt_event(e) for e in events]
 
 
 @api_router.post("/events")
@@ -630,11 +884,21 @@ async def create_event(event_data: EventCreate, current_user=Depends(get_current
         "organizer_id": str(current_user["_id"]),
         "is_paid": False,
         "payment_status": "unpaid",
+        "media_count": 0,
+        "storage_bytes": 0,
         "created_at": datetime.now(timezone.utc).isoformat()
     }
-    result = await db.events.insert_one(doc)
-    (UPLOAD_DIR / str(result.inserted_id)).mkdir(exist_ok=True)
-    return fmt_event({**doc, "_id": result.inserted_id}, 0)
+    for _ in range(5):
+        try:
+            result = await db.events.insert_one(doc)
+            break
+        except DuplicateKeyError:
+            # 8-char slug collided with an existing event; insert_one already set _id on doc
+            doc.pop("_id", None)
+            doc["slug"] = str(uuid.uuid4())[:8]
+    else:
+        raise HTTPException(500, "Could not allocate a unique event link")
+    return fmt_event({**doc, "_id": result.inserted_id})
 
 
 @api_router.get("/events/{event_id}")
@@ -645,8 +909,7 @@ async def get_event(event_id: str, current_user=Depends(get_current_user)):
     event = await db.events.find_one(query)
     if not event:
         raise HTTPException(404, "Event not found")
-    count = await db.media.count_documents({"event_id": event_id})
-    return fmt_event(event, count)
+    return fmt_event(event)
 
 
 @api_router.put("/events/{event_id}")
@@ -661,8 +924,7 @@ async def update_event(event_id: str, event_data: EventUpdate, current_user=Depe
     if updates:
         await db.events.update_one({"_id": ObjectId(event_id)}, {"$set": updates})
     updated = await db.events.find_one({"_id": ObjectId(event_id)})
-    count = await db.media.count_documents({"event_id": event_id})
-    return fmt_event(updated, count)
+    return fmt_event(updated)
 
 
 @api_router.delete("/events/{event_id}")
@@ -673,17 +935,113 @@ async def delete_event(event_id: str, current_user=Depends(get_current_user)):
     event = await db.events.find_one(query)
     if not event:
         raise HTTPException(404, "Event not found")
-    event_dir = UPLOAD_DIR / event_id
-    if event_dir.exists():
-        shutil.rmtree(event_dir)
+    await storage.delete_event(event_id)
     await db.media.delete_many({"event_id": event_id})
-    await db.events.delete_one({"_id": ObjectId(event_id)})
+    await db.upload_sessions.delete_many({"event_id": event_id})
+    await db.blobs.delete_many({"event_id": event_id})
+    deleted = await db.events.find_one_and_delete({"_id": ObjectId(event_id)})
+    if deleted:
+        await release_event_usage(deleted)
     return {"message": "Event deleted"}
 
 
 # --- Bulk Download (ZIP) ---
+async def stream_event_zip(event_id: str):
+    """Yield the event's media as a ZIP archive, one chunk at a time, with no cap on entries."""
+    zs = ZipStream()
+    seen_names: dict = {}
+    seen_files = set()
+    cursor = db.media.find({"event_id": event_id}).sort([("created_at", 1), ("_id", 1)])
+    async for m in cursor.batch_size(MEDIA_STREAM_BATCH):
+        if m["filename"] in seen_files:
+            continue  # a deduplicated upload: its bytes are already in the archive
+        seen_files.add(m["filename"])
+        try:
+            async with storage.fetch(media_key(event_id, m["filename"])) as file_path:
+                arcname = unique_arcname(m["original_name"], seen_names)
+                async for chunk in zs.add_file(arcname, file_path):
+                    yield chunk
+        except FileNotFoundError:
+            continue
+    yield zs.finish()
+
+
+async def stored_zip_files(event_id: str) -> Optional[list]:
+    """
+    StoredFile entries from the CRCs and sizes captured at upload time, or None
+    if any media predates CRC capture (manage.py backfill-crc) or changed on disk.
+    """
+    media = await db.media.find(
+        {"event_id": event_id},
+        {"filename": 1, "original_name": 1, "file_size": 1, "crc32": 1, "created_at": 1}
+    ).sort([("created_at", 1), ("_id", 1)]).to_list(None)
+    if any("crc32" not in m for m in media):
+        return None
+
+    sizes = await storage.list_sizes(event_id)
+    seen_names: dict = {}
+    stored = set()
+    files = []
+    for m in media:
+        if m["filename"] not in sizes or m["filename"] in stored:
+            continue  # missing, or a deduplicated upload already in the archive
+        if sizes[m["filename"]] != m["file_size"]:
+            return None
+        files.append(StoredFile(
+            arcname=unique_arcname(m["original_name"], seen_names),
+            path=media_key(event_id, m["filename"]),
+            size=m["file_size"],
+            crc=m["crc32"],
+            mtime=datetime.fromisoformat(m["created_at"]).timestamp(),
+        ))
+        stored.add(m["filename"])
+    return files
+
+
+async def build_zip_layout(event_id: str) -> Optional[ZipLayout]:
+    """Exact stored-ZIP layout, when every file's CRC is known (see stored_zip_files)."""
+    files = await stored_zip_files(event_id)
+    return ZipLayout(files, reader=storage.read_range) if files is not None else None
+
+
+def mod_zip_manifest(files: list) -> str:
+    """nginx mod_zip file list: nginx fetches each entry from the internal media location itself."""
+    return "".join(
+        f"{f.crc:08x} {f.size} {accel_uri(storage.local_path(f.path))} {' '.join(f.arcname.splitlines())}\n"
+        for f in files
+    )
+
+
+async def backfill_crc32() -> int:
+    """Compute and store CRC-32 for media uploaded before it was captured at upload time."""
+    updated = 0
+    async for m in db.media.find({"crc32": {"$exists": False}}, {"event_id": 1, "filename": 1}):
+        try:
+            async with storage.fetch(media_key(m["event_id"], m["filename"])) as path:
+                crc = await asyncio.to_thread(crc32_file, path)
+                size = await asyncio.to_thread(lambda: path.stat().st_size)
+        except FileNotFoundError:
+            continue
+        await db.media.update_one({"_id": m["_id"]}, {"$set": {"crc32": crc, "file_size": size}})
+        updated += 1
+    return updated
+
+
+def zip_layout_etag(layout: ZipLayout) -> str:
+    digest = hashlib.sha1()
+    for _start, length, payload in layout.segments:
+        digest.update(payload if isinstance(payload, bytes) else str(length).encode())
+    return f'"{digest.hexdigest()}"'
+
+
 @api_router.get("/events/{event_id}/download")
-async def download_event_media(event_id: str, current_user=Depends(get_current_user)):
+async def download_event_media(event_id: str, request: Request, current_user=Depends(get_current_user)):
+    """
+    Download the whole gallery as a ZIP. When every file has an upload-time CRC the
+    archive is stored (uncompressed) with an exact Content-Length and Range support,
+    so interrupted downloads can resume; otherwise it is streamed without a length.
+    With ACCEL_ZIP=mod_zip the same stored archive is assembled by nginx instead.
+    """
     query = {"_id": ObjectId(event_id)}
     if not is_admin(current_user):
         query["organizer_id"] = str(current_user["_id"])
@@ -691,36 +1049,192 @@ async def download_event_media(event_id: str, current_user=Depends(get_current_u
     if not event:
         raise HTTPException(404, "Event not found")
 
-    media_list = await db.media.find({"event_id": event_id}).to_list(1000)
-    if not media_list:
+    if not await db.media.find_one({"event_id": event_id}, {"_id": 1}):
         raise HTTPException(404, "No media files to download")
 
-    zip_buffer = io.BytesIO()
-    seen_names: dict = {}
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        for m in media_list:
-            file_path = UPLOAD_DIR / event_id / m["filename"]
-            if not file_path.exists():
-                continue
-            orig = m["original_name"]
-            if orig in seen_names:
-                seen_names[orig] += 1
-                name, ext = os.path.splitext(orig)
-                orig = f"{name}_{seen_names[orig]}{ext}"
-            else:
-                seen_names[orig] = 0
-            zipf.write(str(file_path), orig)
-
-    zip_buffer.seek(0)
     safe_title = event["title"].replace(' ', '_')[:50]
     safe_title = ''.join(c for c in safe_title if c.isalnum() or c in '_-')
     filename = f"{safe_title}_SnapVault.zip"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+
+    if ACCEL_ZIP and ACCEL_REDIRECT_PREFIX and storage.local:
+        files = await stored_zip_files(event_id)
+        if files is not None:
+            return Response(mod_zip_manifest(files), media_type="text/plain",
+                            headers={**headers, "X-Archive-Files": "zip"})
+
+    layout = await build_zip_layout(event_id)
+    if layout is None:
+        return StreamingResponse(stream_event_zip(event_id), media_type="application/zip", headers=headers)
+
+    etag = zip_layout_etag(layout)
+    headers.update({"Accept-Ranges": "bytes", "ETag": etag})
+    ranges = parse_byte_ranges(request.headers.get("range"), layout.size)
+    if_range = request.headers.get("if-range")
+    if ranges and len(ranges) == 1 and (not if_range or if_range == etag):
+        start, end = ranges[0]
+        headers.update({
+            "Content-Range": f"bytes {start}-{end}/{layout.size}",
+            "Content-Length": str(end - start + 1),
+        })
+        return StreamingResponse(layout.stream(start, end), status_code=206,
+                                 media_type="application/zip", headers=headers)
+
+    headers["Content-Length"] = str(layout.size)
+    return StreamingResponse(layout.stream(), media_type="application/zip", headers=headers)
+
+
+# --- Deduplication ---
+def dedupe_pipeline(event_id: str, top: int = 10) -> list:
+    """Group an event's media by stored blob (media from before blobs count as their own)."""
+    return [
+        {"$match": {"event_id": event_id}},
+        {"$group": {
+            "_id": {"$ifNull": ["$blob_id", "$_id"]},
+            "uploads": {"$sum": 1},
+            "size": {"$first": "$file_size"},
+            "names": {"$addToSet": "$original_name"},
+        }},
+        {"$facet": {
+            "totals": [{"$group": {
+                "_id": None,
+                "uploads": {"$sum": "$uploads"},
+                "unique": {"$sum": 1},
+                "stored_bytes": {"$sum": "$size"},
+                "bytes_saved": {"$sum": {"$multiply": [{"$subtract": ["$uploads", 1]}, "$size"]}},
+            }}],
+            "duplicates": [
+                {"$match": {"uploads": {"$gt": 1}}},
+                {"$sort": {"uploads": -1, "size": -1}},
+                {"$limit": top},
+            ],
+        }},
+    ]
+
+
+@api_router.get("/events/{event_id}/dedupe")
+async def get_event_dedupe_report(event_id: str, current_user=Depends(get_current_user)):
+    """
+    How many of the event's uploads were byte-identical copies and the storage that
+    saved, plus how many were recorded from their hash alone and the transfer that saved.
+    """
+    query = {"_id": ObjectId(event_id)}
+    if not is_admin(current_user):
+        query["organizer_id"] = str(current_user["_id"])
+    event = await db.events.find_one(query, {"uploads_skipped": 1, "transfer_bytes_saved": 1})
+    if not event:
+        raise HTTPException(404, "Event not found")
+    result = (await db.media.aggregate(dedupe_pipeline(event_id)).to_list(1))[0]
+    totals = result["totals"][0] if result["totals"] else {"uploads": 0, "unique": 0, "stored_bytes": 0, "bytes_saved": 0}
+    return {
+        "uploads": totals["uploads"],
+        "unique": totals["unique"],
+        "duplicate_uploads": totals["uploads"] - totals["unique"],
+        "stored_bytes": totals["stored_bytes"],
+        "bytes_saved": totals["bytes_saved"],
+        "uploads_skipped": event.get("uploads_skipped", 0),
+        "transfer_bytes_saved": event.get("transfer_bytes_saved", 0),
+        "top_duplicates": [
+            {"uploads": d["uploads"], "size": d["size"], "original_names": sorted(d["names"])}
+            for d in result["duplicates"]
+        ],
+    }
 
-    return StreamingResponse(
-        zip_buffer,
-        media_type="application/zip",
-        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
-    )
+
+async def backfill_blobs() -> tuple:
+    """
+    Put media uploaded before deduplication onto blobs. Each stored file is hashed
+    (for a transcoded video that is the output, not what was uploaded); identical
+    files within an event collapse into one and the extra copies are deleted.
+    Returns (media linked, bytes freed).
+    """
+    linked = freed = 0
+    async for m in db.media.find({"blob_id": {"$exists": False}}):
+        if m.get("processing_status") in ("queued", "processing"):
+            continue  # the worker may still replace the file; pick it up next run
+        try:
+            async with storage.fetch(media_key(m["event_id"], m["filename"])) as path:
+                crc, sha256 = await asyncio.to_thread(file_digests, path)
+        except FileNotFoundError:
+            continue
+        blob, created = await blob_store.acquire(m["event_id"], sha256, m["filename"], m["file_size"], crc)
+        if created:
+            await blob_store.update_stored(blob["_id"], {"renditions": m.get("renditions", [])})
+            await db.media.update_one({"_id": m["_id"]}, {"$set": {"blob_id": blob["_id"]}})
+        else:
+            shared = {"filename": blob["filename"], "file_size": blob["size"], "crc32": blob["crc32"],
+                      "renditions": blob["renditions"]}
+            sibling = await db.media.find_one({"blob_id": blob["_id"]}, {f: 1 for f in SHARED_MEDIA_FIELDS})
+            if sibling:
+                shared.update({f: sibling[f] for f in SHARED_MEDIA_FIELDS if f in sibling})
+            await db.media.update_one({"_id": m["_id"]}, {"$set": {"blob_id": blob["_id"], **shared}})
+            filenames = [m["filename"]] + [r["filename"] for r in m.get("renditions", [])]
+            await hold_usage(m["event_id"])
+            await storage.delete([media_key(m["event_id"], f) for f in filenames])
+            forget_stored_etags(m["event_id"], filenames)
+            nbytes = m["file_size"] + sum(r["size"] for r in m.get("renditions", []))
+            await bump_usage(m["event_id"], 0, -nbytes)
+            freed += nbytes
+        linked += 1
+    return linked, freed
+
+
+# --- Thumbnails ---
+async def enqueue_thumbnails(media_id: ObjectId, blob_id: Optional[ObjectId] = None) -> ObjectId:
+    """Queue rendition generation for an image (run by worker.py in its process pool)."""
+    job_id = ObjectId()
+    await db.media.update_one({"_id": media_id}, {"$set": {"thumbnail_job_id": job_id}})
+    payload = {"media_id": str(media_id)}
+    if blob_id:
+        payload["blob_id"] = str(blob_id)
+    return await job_queue.enqueue("thumbnails", payload, job_id=job_id)
+
+
+async def backfill_thumbnails() -> int:
+    """Queue renditions for images that have none and no thumbnail job still pending."""
+    queued = 0
+    blobs = set()
+    async for m in db.media.find({"file_type": "image", "renditions": {"$exists": False}},
+                                 {"thumbnail_job_id": 1, "blob_id": 1}):
+        if m.get("blob_id") in blobs:
+            continue  # one job renders for every media sharing the blob
+        if m.get("thumbnail_job_id"):
+            job = await job_queue.get(m["thumbnail_job_id"])
+            if job and job["status"] in ("queued", "running"):
+                continue
+        await enqueue_thumbnails(m["_id"], m.get("blob_id"))
+        if m.get("blob_id"):
+            blobs.add(m["blob_id"])
+        queued += 1
+    return queued
+
+
+# --- Timeline ---
+async def backfill_metadata() -> int:
+    """
+    Give media uploaded before metadata extraction its metadata and taken_at. Photos
+    have EXIF read from their first bytes (a ranged read, so S3 objects are not
+    downloaded whole); videos and audio keep their upload time as taken_at.
+    """
+    updated = 0
+    async for m in db.media.find({"taken_at": {"$exists": False}},
+                                 {"event_id": 1, "filename": 1, "file_type": 1, "file_size": 1, "created_at": 1}):
+        metadata = {}
+        if m["file_type"] == "image":
+            key = media_key(m["event_id"], m["filename"])
+            try:
+                length = min(METADATA_HEAD_BYTES, m["file_size"])
+                head = b"".join([c async for c in storage.read_range(key, 0, length)])
+            except Exception as e:
+                logger.warning(f"No metadata for {m['filename']}: {e}")
+                head = b""
+            metadata = await asyncio.to_thread(image_metadata, head, CAPTURE_TIMEZONE)
+        await db.media.update_one({"_id": m["_id"]}, {"$set": {
+            "metadata": metadata,
+            "taken_at": metadata.get("captured_at") or m["created_at"],
+        }})
+        updated += 1
+    return updated
 
 
 # --- Public Guest Routes ---
@@ -740,88 +1254,593 @@ async def get_event_by_slug(slug: str):
     }
 
 
+DEFAULT_SUFFIX = {"video": ".mp4", "audio": ".mp3", "image": ".jpg"}
+
+
+def media_file_type(content_type: Optional[str]) -> Optional[str]:
+    """"video", "image" or "audio" for a supported upload content type, else None."""
+    kind = (content_type or "").split("/", 1)[0]
+    return kind if kind in DEFAULT_SUFFIX else None
+
+
+def parse_sha256(value: Optional[str]) -> Optional[str]:
+    """A client-supplied SHA-256 as lowercase hex, or None if not given."""
+    if not value:
+        return None
+    value = value.strip().lower()
+    if not re.fullmatch(r"[0-9a-f]{64}", value):
+        raise HTTPException(400, "sha256 must be 64 hex digits")
+    return value
+
+
+def stored_filename(original_name: str, file_type: str) -> str:
+    return f"{uuid.uuid4()}{Path(original_name or 'upload').suffix or DEFAULT_SUFFIX[file_type]}"
+
+
+# What a duplicate upload shares with the media already pointing at its blob
+SHARED_MEDIA_FIELDS = ("filename", "file_size", "crc32", "processing_status", "renditions", "probe",
+                       "transcode", "processing_job_id", "thumbnail_job_id", "metadata", "taken_at")
+
+
+async def register_media(event_id: str, blob: dict, created: bool, original_name: str, file_type: str,
+                         uploader_name: str, metadata: Optional[dict] = None) -> dict:
+    """Insert the media doc for one fully written upload (see register_media_batch)."""
+    upload = (blob, created, original_name, file_type, metadata or {})
+    return (await register_media_batch(event_id, [upload], uploader_name))[0]
+
+
+async def register_media_batch(event_id: str, uploads: list, uploader_name: str) -> list:
+    """
+    Insert the media docs for fully written uploads, given as (blob, created,
+    original_name, file_type, metadata), with one insert_many; count them and queue
+    their processing. Returns each upload's result, in order. taken_at, the timeline
+    key, is the capture time from the metadata, or the upload time without one.
+
+    A duplicate of content the event already has shares the file, renditions and
+    processing of the media before it: the worker updates every media doc of a
+    blob, so nothing is queued and no bytes are counted.
+    """
+    now = datetime.now(timezone.utc).isoformat()
+    docs = [{
+        "event_id": event_id,
+        "blob_id": blob["_id"],
+        "filename": blob["filename"],
+        "original_name": original_name or "upload",
+        "file_type": file_type,
+        "file_size": blob["size"],
+        "crc32": blob["crc32"],
+        "uploader_name": uploader_name or "Guest",
+        "processing_status": "ready",
+        "metadata": metadata,
+        "taken_at": metadata.get("captured_at") or now,
+        "created_at": now,
+    } for blob, _created, original_name, file_type, metadata in uploads]
+
+    # Videos are probed by the background worker (worker.py), which remuxes or
+    # re-encodes them only when needed; the upload returns now
+    jobs = []
+    in_batch = {}
+    for doc, (blob, created, _name, file_type, _metadata) in zip(docs, uploads):
+        if not created:
+            continue
+        doc["_id"] = ObjectId()
+        payload = {"media_id": str(doc["_id"]), "blob_id": str(blob["_id"])}
+        if file_type == "video":
+            doc["processing_status"] = "queued"
+            doc["processing_job_id"] = ObjectId()
+            jobs.append(("transcode_video", payload, doc["processing_job_id"]))
+        if file_type == "image":
+            doc["thumbnail_job_id"] = ObjectId()
+            jobs.append(("thumbnails", payload, doc["thumbnail_job_id"]))
+        in_batch[blob["_id"]] = doc
+
+    # Duplicates copy from a new upload in the same batch, else from the stored media
+    duplicates = [doc for doc, (_blob, created, *_rest) in zip(docs, uploads) if not created]
+    stored = {}
+    outside = list({doc["blob_id"] for doc in duplicates} - in_batch.keys())
+    if outside:
+        projection = {"blob_id": 1, **{f: 1 for f in SHARED_MEDIA_FIELDS}}
+        async for m in db.media.find({"blob_id": {"$in": outside}}, projection):
+            stored.setdefault(m["blob_id"], m)
+    for doc in duplicates:
+        sibling = in_batch.get(doc["blob_id"]) or stored.get(doc["blob_id"])
+        if sibling:
+            doc.update({f: sibling[f] for f in SHARED_MEDIA_FIELDS if f in sibling})
+
+    await hold_usage(event_id)
+    result = await db.media.insert_many(docs)
+    await bump_usage(event_id, len(docs), sum(blob["size"] for blob, created, *_rest in uploads if created))
+    await job_queue.enqueue_many(jobs)
+    for doc in duplicates:
+        if doc["blob_id"] not in in_batch:
+            await resync_duplicate(doc["_id"], doc["blob_id"], doc)
+    return [{
+        "id": str(media_id),
+        "message": "Upload successful",
+        "file_type": doc["file_type"],
+        "processing_status": doc["processing_status"],
+        "deduplicated": not created,
+    } for media_id, doc, (_blob, created, *_rest) in zip(result.inserted_ids, docs, uploads)]
+
+
+async def resync_duplicate(media_id: ObjectId, blob_id: ObjectId, doc: dict):
+    """Pick up a job result for the blob that landed between copying the sibling and inserting."""
+    sibling = await db.media.find_one({"blob_id": blob_id, "_id": {"$ne": media_id}},
+                                      {f: 1 for f in SHARED_MEDIA_FIELDS})
+    if not sibling or all(sibling.get(f) == doc.get(f) for f in SHARED_MEDIA_FIELDS):
+        return
+    # Only if no job has updated this doc itself since
+    unchanged = {f: doc.get(f) for f in ("filename", "processing_status", "renditions")}
+    await db.media.update_one({"_id": media_id, **unchanged},
+                              {"$set": {f: sibling[f] for f in SHARED_MEDIA_FIELDS if f in sibling}})
+
+
+class UploadCheck(BaseModel):
+    sha256: str
+    size: int
+    filename: str
+    content_type: str
+    uploader_name: str = "Guest"
+
+
+@api_router.post("/guest/event/{slug}/upload/check")
+async def check_upload(slug: str, data: UploadCheck):
+    """
+    Hash-first upload: before sending a file the client posts its SHA-256 and size.
+    If the event already has exactly that content, the upload is recorded as a new
+    media item right away and the bytes are never sent ({"exists": true, ...media}).
+    Otherwise the client uploads as usual, passing the hash so the server can check it.
+    """
+    sha256 = parse_sha256(data.sha256)
+    event = await db.events.find_one({"slug": slug}, {"_id": 1})
+    if not event:
+        raise HTTPException(404, "Event not found")
+    file_type = media_file_type(data.content_type)
+    if not file_type:
+        raise HTTPException(400, "Only images, videos and audio files are supported")
+    if data.size > MAX_FILE_SIZE:
+        raise HTTPException(400, "File exceeds 200MB limit")
+    event_id = str(event["_id"])
+    blob = await blob_store.add_ref(event_id, sha256, data.size)
+    if not blob:
+        return {"exists": False}
+    result = await register_media(event_id, blob, False, data.filename, file_type, data.uploader_name)
+    await record_skipped_transfer(event_id, data.size)
+    return {"exists": True, **result}
+
+
+async def store_upload(event_id: str, file: UploadFile, expected_sha256: Optional[str] = None) -> tuple:
+    """
+    Stream an upload into storage, hashing it on the way, and reference its blob.
+    Returns (blob, created, original_name, file_type, metadata) for register_media_batch.
+    """
+    file_type = media_file_type(file.content_type)
+    if not file_type:
+        raise HTTPException(400, "Only images, videos and audio files are supported")
+
+    unique_name = stored_filename(file.filename, file_type)
+    writer = storage.open_writer(media_key(event_id, unique_name))
+    file_size = 0
+    crc = 0
+    sha = hashlib.sha256()
+    head = bytearray()  # kept for metadata extraction, so the file is never re-read
+
+    try:
+        while True:
+            chunk = await file.read(1024 * 1024)
+            if not chunk:
+                break
+            file_size += len(chunk)
+            if file_size > MAX_FILE_SIZE:
+                raise HTTPException(400, "File exceeds 200MB limit")
+            crc = zlib.crc32(chunk, crc)
+            sha.update(chunk)
+            if len(head) < METADATA_HEAD_BYTES:
+                head += chunk[:METADATA_HEAD_BYTES - len(head)]
+            await writer.write(chunk)
+        await hold_usage(event_id)
+        await writer.commit()
+    except HTTPException:
+        await writer.abort()
+        raise
+    except Exception as e:
+        await writer.abort()
+        raise HTTPException(500, f"Upload failed: {str(e)}")
+
+    if expected_sha256 and sha.hexdigest() != expected_sha256:
+        await storage.delete([media_key(event_id, unique_name)])
+        raise HTTPException(400, "Upload is corrupt: content does not match its SHA-256")
+    blob, created = await blob_store.acquire(event_id, sha.hexdigest(), unique_name, file_size, crc)
+    if not created:
+        # The event already has these bytes; keep the one copy
+        await storage.delete([media_key(event_id, unique_name)])
+    metadata = await asyncio.to_thread(image_metadata, bytes(head), CAPTURE_TIMEZONE) if file_type == "image" else {}
+    return blob, created, file.filename, file_type, metadata
+
+
 @api_router.post("/guest/event/{slug}/upload")
 async def upload_media(
     slug: str,
     file: UploadFile = File(...),
-    uploader_name: str = Form(default="Guest")
+    uploader_name: str = Form(default="Guest"),
+    sha256: Optional[str] = Form(default=None)
 ):
-    event = await db.events.find_one({"slug": slug})
+    expected_sha256 = parse_sha256(sha256)
+    event = await db.events.find_one({"slug": slug}, {"_id": 1})
+    if not event:
+        raise HTTPException(404, "Event not found")
+    event_id = str(event["_id"])
+    blob, created, original_name, file_type, metadata = await store_upload(event_id, file, expected_sha256)
+    return await register_media(event_id, blob, created, original_name, file_type, uploader_name, metadata)
+
+
+@api_router.post("/guest/event/{slug}/upload/batch")
+async def upload_media_batch(slug: str, request: Request):
+    """
+    Many files in one multipart request: "files" parts, an optional "uploader_name"
+    and optionally one "sha256" field per file, in order, empty where unknown.
+    The body must declare a Content-Length of at most BATCH_UPLOAD_MAX_BYTES, and
+    parsing stops at the first file past BATCH_UPLOAD_MAX_FILES, so neither limit
+    waits for the whole request to be spooled to temp files. The files are then
+    written to storage BATCH_UPLOAD_CONCURRENCY at a time and recorded with a single
+    insert. Each file succeeds or fails on its own:
+    {"uploaded": n, "failed": n, "results": [{"filename", "ok", ...}]} in request order.
+    """
+    length = request.headers.get("content-length", "")
+    if not length.isdigit():
+        raise HTTPException(411, "Content-Length required")
+    if int(length) > BATCH_UPLOAD_MAX_BYTES:
+        raise HTTPException(413, f"A batch may be at most {BATCH_UPLOAD_MAX_BYTES // (1024 * 1024)}MB; "
+                                 "send large files with a resumable upload")
+    async with request.form(max_files=BATCH_UPLOAD_MAX_FILES, max_fields=BATCH_UPLOAD_MAX_FILES + 1) as form:
+        files = form.getlist("files")
+        if not files or not all(isinstance(f, StarletteUploadFile) for f in files):
+            raise HTTPException(400, "Send at least one file part named 'files'")
+        uploader_name, sha256 = form.get("uploader_name", "Guest"), form.getlist("sha256")
+        if not all(isinstance(v, str) for v in [uploader_name, *sha256]):
+            raise HTTPException(400, "uploader_name and sha256 must be text fields")
+        return await store_batch(slug, files, uploader_name, sha256)
+
+
+async def store_batch(slug: str, files: list, uploader_name: str, sha256: list) -> dict:
+    """Store and record the parsed parts of a batch upload; the response of upload_media_batch."""
+    if sha256 and len(sha256) != len(files):
+        raise HTTPException(400, "Send one sha256 per file, or none")
+    hashes = [parse_sha256(h) for h in sha256] or [None] * len(files)
+    event = await db.events.find_one({"slug": slug}, {"_id": 1})
     if not event:
         raise HTTPException(404, "Event not found")
-
     event_id = str(event["_id"])
-    content_type = file.content_type or ""
-    is_video = content_type.startswith("video/")
-    is_image = content_type.startswith("image/")
-    is_audio = content_type.startswith("audio/")
 
-    if not (is_video or is_image or is_audio):
-        raise HTTPException(400, "Only images, videos and audio files are supported")
+    limit = asyncio.Semaphore(BATCH_UPLOAD_CONCURRENCY)
+
+    async def store(file: UploadFile, expected_sha256: Optional[str]):
+        async with limit:
+            return await store_upload(event_id, file, expected_sha256)
+
+    outcomes = await asyncio.gather(*(store(f, h) for f, h in zip(files, hashes)), return_exceptions=True)
+    stored = [o for o in outcomes if not isinstance(o, BaseException)]
+    registered = iter(await register_media_batch(event_id, stored, uploader_name) if stored else [])
+
+    results = []
+    for file, outcome in zip(files, outcomes):
+        if isinstance(outcome, HTTPException):
+            results.append({"filename": file.filename, "ok": False, "error": outcome.detail})
+        elif isinstance(outcome, BaseException):
+            logger.error(f"Batch upload of {file.filename} failed: {outcome}")
+            results.append({"filename": file.filename, "ok": False, "error": "Upload failed"})
+        else:
+            results.append({"filename": file.filename, "ok": True, **next(registered)})
+    return {
+        "uploaded": len(stored),
+        "failed": len(files) - len(stored),
+        "results": results,
+    }
+
 
-    event_dir = UPLOAD_DIR / event_id
-    event_dir.mkdir(exist_ok=True)
+# --- Resumable Guest Uploads ---
+# tus-style: create a session with the total length, PATCH chunks at any offset
+# (in parallel if the client likes), HEAD/GET for what has arrived, then finalize.
+# Chunks are written straight into a hidden part file in the event directory.
+class ResumableUploadCreate(BaseModel):
+    filename: str
+    content_type: str
+    size: int
+    uploader_name: str = "Guest"
+    sha256: Optional[str] = None
 
-    suffix = Path(file.filename or "upload").suffix or (
-        '.mp4' if is_video else '.mp3' if is_audio else '.jpg'
+
+def upload_status_headers(session: dict) -> dict:
+    return {
+        "Upload-Offset": str(contiguous_offset(session["received"])),
+        "Upload-Length": str(session["length"]),
+        "Upload-Expires": formatdate(session["expires_at"].replace(tzinfo=timezone.utc).timestamp(), usegmt=True),
+        "Cache-Control": "no-store",
+    }
+
+
+async def get_upload_session(upload_id: str) -> dict:
+    session = await upload_sessions.get(upload_id)
+    if not session:
+        raise HTTPException(404, "Upload not found or expired")
+    return session
+
+
+@api_router.post("/guest/event/{slug}/uploads", status_code=201)
+async def create_resumable_upload(slug: str, data: ResumableUploadCreate, response: Response):
+    event = await db.events.find_one({"slug": slug})
+    if not event:
+        raise HTTPException(404, "Event not found")
+    file_type = media_file_type(data.content_type)
+    if not file_type:
+        raise HTTPException(400, "Only images, videos and audio files are supported")
+    if data.size <= 0:
+        raise HTTPException(400, "Upload size must be positive")
+    if data.size > MAX_FILE_SIZE:
+        raise HTTPException(400, "File exceeds 200MB limit")
+    session = await upload_sessions.create(
+        str(event["_id"]), data.size,
+        original_name=data.filename or "upload", file_type=file_type, uploader_name=data.uploader_name or "Guest",
+        sha256=parse_sha256(data.sha256),
     )
-    unique_name = f"{uuid.uuid4()}{suffix}"
-    file_path = event_dir / unique_name
-    file_size = 0
+    response.headers.update(upload_status_headers(session))
+    response.headers["Location"] = f"/api/guest/uploads/{session['_id']}"
+    return {
+        "id": session["_id"],
+        "size": data.size,
+        "chunk_size": UPLOAD_CHUNK_SIZE,
+        "expires_at": session["expires_at"].isoformat(),
+    }
 
+
+@api_router.head("/guest/uploads/{upload_id}")
+async def head_resumable_upload(upload_id: str):
+    session = await get_upload_session(upload_id)
+    return Response(headers=upload_status_headers(session))
+
+
+@api_router.get("/guest/uploads/{upload_id}")
+async def get_resumable_upload(upload_id: str, response: Response):
+    """Upload status, including the byte spans still missing for clients that send chunks in parallel."""
+    session = await get_upload_session(upload_id)
+    response.headers.update(upload_status_headers(session))
+    return {
+        "id": session["_id"],
+        "size": session["length"],
+        "offset": contiguous_offset(session["received"]),
+        "missing": missing_spans(session["received"], session["length"]),
+        "chunk_size": UPLOAD_CHUNK_SIZE,
+        "status": session["status"],
+        "expires_at": session["expires_at"].replace(tzinfo=timezone.utc).isoformat(),
+        "result": session.get("result"),
+    }
+
+
+@api_router.patch("/guest/uploads/{upload_id}", status_code=204)
+async def upload_chunk(upload_id: str, request: Request):
+    """
+    Write the request body at Upload-Offset. Offsets need not follow on from
+    each other, so a client can send several chunks at once. If the connection
+    drops, the bytes that did arrive are kept.
+    """
+    session = await get_upload_session(upload_id)
+    if session["status"] != OPEN:
+        raise HTTPException(409, "Upload is already being finalized")
+    if request.headers.get("content-type") != "application/offset+octet-stream":
+        raise HTTPException(415, "Chunks must be sent as application/offset+octet-stream")
     try:
-        with open(file_path, "wb") as f:
-            while True:
-                chunk = await file.read(1024 * 1024)
-                if not chunk:
-                    break
-                file_size += len(chunk)
-                if file_size > MAX_FILE_SIZE:
-                    f.close()
-                    file_path.unlink(missing_ok=True)
-                    raise HTTPException(400, "File exceeds 200MB limit")
-                f.write(chunk)
-    except HTTPException:
-        raise
+        offset = int(request.headers["upload-offset"])
+    except (KeyError, ValueError):
+        raise HTTPException(400, "Missing or invalid Upload-Offset header")
+    length = session["length"]
+    declared = request.headers.get("content-length", "")
+    if not 0 <= offset <= length or (declared.isdigit() and offset + int(declared) > length):
+        raise HTTPException(400, "Chunk runs past the end of the upload")
+
+    path = upload_sessions.part_path(session)
+    pos = offset
+    buf = bytearray()
+    try:
+        async for data in request.stream():
+            if pos + len(buf) + len(data) > length:
+                raise HTTPException(400, "Chunk runs past the end of the upload")
+            buf += data
+            if len(buf) >= 1024 * 1024:
+                await asyncio.to_thread(write_at, path, pos, bytes(buf))
+                pos += len(buf)
+                buf.clear()
+        if buf:
+            await asyncio.to_thread(write_at, path, pos, bytes(buf))
+            pos += len(buf)
+    except ClientDisconnect:
+        # Keep what arrived so the client only has to resend the rest
+        if buf:
+            await asyncio.to_thread(write_at, path, pos, bytes(buf))
+            pos += len(buf)
+    except FileNotFoundError:
+        raise HTTPException(404, "Upload not found or expired")
+    finally:
+        session = await upload_sessions.record(session, offset, pos)
+    return Response(status_code=204, headers=upload_status_headers(session))
+
+
+@api_router.post("/guest/uploads/{upload_id}/finalize")
+async def finalize_resumable_upload(upload_id: str):
+    session = await get_upload_session(upload_id)
+    if session["status"] == COMPLETE:
+        return session["result"]
+    claimed = await upload_sessions.claim(session)
+    if not claimed:
+        raise HTTPException(409, "Upload is already being finalized")
+    missing = missing_spans(claimed["received"], claimed["length"])
+    if missing:
+        await upload_sessions.reopen(claimed)
+        raise HTTPException(409, f"Upload is incomplete: {sum(end - start for start, end in missing)} bytes missing")
+
+    part = upload_sessions.part_path(claimed)
+    event_id = claimed["event_id"]
+    try:
+        # Chunks can arrive in any order, so the digests are taken over the finished file
+        crc, sha256 = await asyncio.to_thread(file_digests, part)
+        metadata = {}
+        if claimed["file_type"] == "image":
+            metadata = await asyncio.to_thread(image_file_metadata, part, CAPTURE_TIMEZONE)
+    except FileNotFoundError:
+        # The part file is gone, so there is nothing left to resume
+        await upload_sessions.reopen(claimed)
+        await upload_sessions.abort(claimed)
+        raise HTTPException(404, "Upload not found or expired")
+    if claimed.get("sha256") and sha256 != claimed["sha256"]:
+        await upload_sessions.reopen(claimed)
+        await upload_sessions.abort(claimed)
+        raise HTTPException(400, "Upload is corrupt: content does not match its SHA-256; start a new upload")
+
+    filename = stored_filename(claimed["original_name"], claimed["file_type"])
+    blob = None
+    try:
+        blob = await blob_store.add_ref(event_id, sha256, claimed["length"])
+        created = False
+        if blob:
+            part.unlink(missing_ok=True)
+        else:
+            # The blob is only created once its file is stored, so a hash-first check never sees it early
+            await hold_usage(event_id)
+            await storage.put_file(media_key(event_id, filename), part)
+            blob, created = await blob_store.acquire(event_id, sha256, filename, claimed["length"], crc)
+            if not created:
+                await storage.delete([media_key(event_id, filename)])
+        result = await register_media(event_id, blob, created, claimed["original_name"],
+                                      claimed["file_type"], claimed["uploader_name"], metadata)
     except Exception as e:
-        file_path.unlink(missing_ok=True)
+        # Undo this upload's reference, and its stored file if nothing else uses it
+        stored = await blob_store.release(blob["_id"]) if blob else {"filename": filename}
+        if stored:
+            filenames = [stored["filename"]] + [r["filename"] for r in stored.get("renditions", [])]
+            await storage.delete([media_key(event_id, f) for f in filenames])
+        await upload_sessions.reopen(claimed)
+        if not part.exists():
+            # The part file was consumed, so a retry has nothing to store
+            await upload_sessions.abort(claimed)
         raise HTTPException(500, f"Upload failed: {str(e)}")
+    await upload_sessions.complete(claimed, result)
+    return result
+
+
+@api_router.delete("/guest/uploads/{upload_id}", status_code=204)
+async def abort_resumable_upload(upload_id: str):
+    session = await get_upload_session(upload_id)
+    if not await upload_sessions.abort(session):
+        raise HTTPException(409, "Upload is already being finalized")
+    return Response(status_code=204)
+
+
+async def expire_uploads_loop():
+    while True:
+        try:
+            expired = await upload_sessions.expire()
+            if expired:
+                logger.info(f"Expired {expired} abandoned upload sessions")
+        except Exception as e:
+            logger.error(f"Upload session expiry failed: {e}")
+        await asyncio.sleep(UPLOAD_SWEEP_INTERVAL)
+
+
+async def deliver_mail_loop(worker_id: str):
+    """Send queued email; failed sends go back in the outbox with backoff until MAIL_MAX_ATTEMPTS."""
+    while True:
+        try:
+            job = await outbox.next_message(worker_id, MAIL_POLL_INTERVAL)
+            if not job:
+                continue
+            try:
+                await outbox.deliver(job)
+            except Exception as e:
+                to = job["payload"]["to"]
+                if await outbox.queue.fail(job, str(e) or type(e).__name__):
+                    logger.error(f"Giving up on email to {to} after {job['attempts']} attempts: {e}")
+                else:
+                    logger.warning(f"Email to {to} failed (attempt {job['attempts']}), will retry: {e}")
+                continue
+            await outbox.queue.complete(job)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Mail delivery failed: {e}")
+            await asyncio.sleep(MAIL_POLL_INTERVAL)
 
-    final_name = unique_name
-    if is_video and file_size > VIDEO_COMPRESS_THRESHOLD:
-        compressed_name = f"c_{unique_name}"
-        compressed_path = event_dir / compressed_name
-        logger.info(f"Compressing video {unique_name} ({file_size / 1024 / 1024:.1f}MB)")
-        if compress_video(file_path, compressed_path):
-            file_path.unlink(missing_ok=True)
-            final_name = compressed_name
-            file_size = compressed_path.stat().st_size
-            logger.info(f"Compressed to {file_size / 1024 / 1024:.1f}MB")
-
-    file_type = "video" if is_video else "audio" if is_audio else "image"
-    doc = {
-        "event_id": event_id,
-        "filename": final_name,
-        "original_name": file.filename or "upload",
-        "file_type": file_type,
-        "file_size": file_size,
-        "uploader_name": uploader_name or "Guest",
-        "created_at": datetime.now(timezone.utc).isoformat()
-    }
-    result = await db.media.insert_one(doc)
-    return {"id": str(result.inserted_id), "message": "Upload successful", "file_type": file_type}
+
+async def expire_mail_loop():
+    while True:
+        try:
+            failed = await outbox.fail_expired()
+            if failed:
+                logger.warning(f"Failed {failed} emails whose sender died on their last attempt")
+        except Exception as e:
+            logger.error(f"Outbox expiry failed: {e}")
+        await asyncio.sleep(MAIL_SWEEP_INTERVAL)
 
 
 # --- Organizer Media Routes ---
+async def stream_ndjson(cursor):
+    async for m in cursor:
+        yield json.dumps(fmt_media(m)) + "\n"
+
+
+def parse_taken_bound(value: Optional[str]) -> Optional[str]:
+    """An ISO date or datetime from the query string, as the UTC ISO form taken_at is stored in."""
+    if not value:
+        return None
+    try:
+        dt = datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(400, "Dates must be ISO 8601, e.g. 2026-06-20 or 2026-06-20T18:00:00Z")
+    if not dt.tzinfo:
+        dt = dt.replace(tzinfo=CAPTURE_TIMEZONE)
+    return dt.astimezone(timezone.utc).isoformat()
+
+
 @api_router.get("/events/{event_id}/media")
-async def get_event_media(event_id: str, current_user=Depends(get_current_user)):
+async def get_event_media(
+    event_id: str,
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    sort: str = Query("created_at", pattern="^(created_at|taken_at)$"),
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    taken_from: Optional[str] = None,
+    taken_to: Optional[str] = None,
+    current_user=Depends(get_current_user)
+):
+    """Event media newest first, one page per request (X-Next-Cursor), or the whole
+    listing as NDJSON straight off the cursor when the client accepts application/x-ndjson.
+    sort=taken_at&order=asc is the "as it happened" timeline (capture time, else upload
+    time); taken_from (inclusive) and taken_to (exclusive) limit it to a date range."""
     query = {"_id": ObjectId(event_id)}
     if not is_admin(current_user):
         query["organizer_id"] = str(current_user["_id"])
     event = await db.events.find_one(query)
     if not event:
         raise HTTPException(404, "Event not found")
-    media_list = await db.media.find({"event_id": event_id}).sort("created_at", -1).to_list(1000)
+    descending = order == "desc"
+    match = {"event_id": event_id, **keyset_after(cursor, sort, descending)}
+    taken = {op: bound for op, bound in (("$gte", parse_taken_bound(taken_from)),
+                                         ("$lt", parse_taken_bound(taken_to))) if bound}
+    if taken:
+        match["taken_at"] = taken
+    media_query = db.media.find(match).sort(list(keyset_sort(sort, descending).items()))
+
+    if "application/x-ndjson" in request.headers.get("accept", ""):
+        if limit:
+            media_query = media_query.limit(limit)
+        return StreamingResponse(
+            stream_ndjson(media_query.batch_size(MEDIA_STREAM_BATCH)),
+            media_type="application/x-ndjson"
+        )
+
+    limit = limit or DEFAULT_PAGE_SIZE
+    media_list = await media_query.limit(limit + 1).to_list(limit + 1)
+    media_list = paginate(media_list, limit, response, sort)
     return [fmt_media(m) for m in media_list]
 
 
@@ -837,45 +1856,323 @@ async def delete_media(media_id: str, current_user=Depends(get_current_user)):
         })
         if not event:
             raise HTTPException(403, "Not authorized")
-    (UPLOAD_DIR / m["event_id"] / m["filename"]).unlink(missing_ok=True)
-    await db.media.delete_one({"_id": ObjectId(media_id)})
+    await hold_usage(m["event_id"])
+    result = await db.media.delete_one({"_id": ObjectId(media_id)})
+    if not result.deleted_count:
+        return {"message": "Deleted"}
+    stored = m
+    if m.get("blob_id"):
+        # Other media may still share the blob; its files go with the last reference
+        stored = await blob_store.release(m["blob_id"])
+        if not stored:
+            await bump_usage(m["event_id"], -1, 0)
+            return {"message": "Deleted"}
+        stored = {"filename": stored["filename"], "file_size": stored["size"], "renditions": stored["renditions"]}
+    filenames = [stored["filename"]] + [r["filename"] for r in stored.get("renditions", [])]
+    await storage.delete([media_key(m["event_id"], f) for f in filenames])
+    forget_stored_etags(m["event_id"], filenames)
+    await bump_usage(m["event_id"], -1, -stored["file_size"] - sum(r["size"] for r in stored.get("renditions", [])))
     return {"message": "Deleted"}
 
 
+@api_router.get("/media/{media_id}/processing")
+async def get_media_processing(media_id: str, current_user=Depends(get_current_user)):
+    """Background processing state of one media item, with transcode progress (0-1)."""
+    m = await db.media.find_one({"_id": ObjectId(media_id)})
+    if not m:
+        raise HTTPException(404, "Media not found")
+    if not is_admin(current_user):
+        event = await db.events.find_one({
+            "_id": ObjectId(m["event_id"]),
+            "organizer_id": str(current_user["_id"])
+        })
+        if not event:
+            raise HTTPException(403, "Not authorized")
+    status = {
+        "id": media_id,
+        "processing_status": m.get("processing_status", "ready"),
+        "progress": 1.0 if m.get("processing_status", "ready") == "ready" else 0.0,
+        "attempts": 0,
+        "error": None,
+    }
+    if m.get("processing_job_id"):
+        job = await job_queue.get(m["processing_job_id"])
+        if job:
+            status.update({
+                "progress": job.get("progress", 0.0),
+                "attempts": job.get("attempts", 0),
+                "error": job.get("error"),
+            })
+    return status
+
+
 # --- File Serving (public - UUID filenames are unguessable) ---
+def accel_uri(path: Optional[Path]) -> Optional[str]:
+    """Internal nginx URI for a file under UPLOAD_DIR; None when offload is off or the file lives elsewhere."""
+    if not ACCEL_REDIRECT_PREFIX or path is None:
+        return None
+    rel = os.path.relpath(os.path.normpath(path), os.path.normpath(UPLOAD_DIR))
+    if rel == ".." or rel.startswith("../"):
+        return None
+    return f"{ACCEL_REDIRECT_PREFIX}/{quote(rel)}"
+
+
+def accel_response(uri: str, headers: dict, media_type: Optional[str] = None) -> Response:
+    """Empty response telling nginx to send `uri` itself (sendfile, ranges and conditionals included)."""
+    return Response(headers={**headers, "X-Accel-Redirect": uri}, media_type=media_type)
+
+
+async def send_file(request: Request, path: Path, headers: dict, media_type: Optional[str] = None,
+                    st: Optional[os.stat_result] = None) -> Response:
+    """
+    Whole file via FileResponse, or 206 Partial Content for Range requests: one range
+    as-is, several as multipart/byteranges. Ranges are read off the event loop in
+    FILE_CHUNK_SIZE pieces; an If-Range that no longer matches gets the full file.
+    """
+    if st is None:
+        st = await asyncio.to_thread(os.stat, path)
+    size = st.st_size
+    media_type = media_type or mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+    headers = {**headers, "Accept-Ranges": "bytes"}
+    last_modified = formatdate(st.st_mtime, usegmt=True)
+
+    ranges = parse_byte_ranges(request.headers.get("range"), size)
+    if ranges and if_range_matches(request.headers.get("if-range"), headers.get("ETag"), last_modified):
+        ranges = coalesce_ranges(ranges)
+        if len(ranges) > MAX_RANGES:
+            ranges = None  # pathological request; cheaper to send the file once
+    else:
+        ranges = None
+    if not ranges:
+        return FileResponse(str(path), headers=headers, media_type=media_type, stat_result=st)
+
+    headers["Last-Modified"] = last_modified
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        headers.update({"Content-Range": f"bytes {start}-{end}/{size}", "Content-Length": str(end - start + 1)})
+        return StreamingResponse(read_file_range(path, start, end - start + 1, FILE_CHUNK_SIZE),
+                                 status_code=206, media_type=media_type, headers=headers)
+
+    boundary = uuid.uuid4().hex
+    parts = [
+        (f"--{boundary}\r\nContent-Type: {media_type}\r\nContent-Range: bytes {start}-{end}/{size}\r\n\r\n".encode(),
+         start, end)
+        for start, end in ranges
+    ]
+    closing = f"\r\n--{boundary}--\r\n".encode()
+
+    async def body():
+        for i, (part_header, start, end) in enumerate(parts):
+            yield (b"\r\n" if i else b"") + part_header
+            async for chunk in read_file_range(path, start, end - start + 1, FILE_CHUNK_SIZE):
+                yield chunk
+        yield closing
+
+    headers["Content-Length"] = str(
+        sum(len(h) + end - start + 1 for h, start, end in parts) + 2 * (len(parts) - 1) + len(closing)
+    )
+    return StreamingResponse(body(), status_code=206, headers=headers,
+                             media_type=f"multipart/byteranges; boundary={boundary}")
+
+
+# Media files are written once under a fresh UUID name (transcodes get new names too,
+# and renditions carry the CRC-32 of their bytes), so browsers may keep them forever,
+# revalidation is rarely needed and a name's ETag never changes
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+UUID_FILENAME = re.compile(
+    r"^(c_)?[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}(_\d+(_[0-9a-f]{8})?)?\.\w+$"
+)
+FILE_META_CACHE_SIZE = 10000
+file_meta_cache: OrderedDict = OrderedDict()  # "event_id/filename" -> strong ETag
+
+
+def stored_file_query(event_id: str, filename: str) -> dict:
+    return {"$or": [
+        {"event_id": event_id, "filename": filename},
+        {"event_id": event_id, "renditions.filename": filename},
+    ]}
+
+
+async def stored_etag(event_id: str, filename: str) -> Optional[str]:
+    """Strong ETag from the CRC-32 and size recorded at upload/render time, without touching the file."""
+    key = f"{event_id}/{filename}"
+    if key in file_meta_cache:
+        file_meta_cache.move_to_end(key)
+        return file_meta_cache[key]
+    m = await db.media.find_one(stored_file_query(event_id, filename),
+                                {"filename": 1, "file_size": 1, "crc32": 1, "renditions": 1})
+    if not m:
+        return None
+    if m["filename"] == filename:
+        crc, size = m.get("crc32"), m["file_size"]
+    else:
+        r = next(r for r in m.get("renditions", []) if r["filename"] == filename)
+        crc, size = r.get("crc32"), r["size"]
+    if crc is None:
+        return None
+    etag = f'"{crc:08x}-{size:x}"'
+    file_meta_cache[key] = etag
+    if len(file_meta_cache) > FILE_META_CACHE_SIZE:
+        file_meta_cache.popitem(last=False)
+    return etag
+
+
+def forget_stored_etags(event_id: str, filenames: list):
+    for filename in filenames:
+        file_meta_cache.pop(f"{event_id}/{filename}", None)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match uses weak comparison, so W/ prefixes are ignored."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+
+
+def not_modified(headers: dict) -> Response:
+    return Response(status_code=304, headers=headers)
+
+
+rendition_cache = resizer.RenditionCache(RESIZE_CACHE_DIR, RESIZE_CACHE_MAX_BYTES)
+resize_pool = None  # ProcessPoolExecutor, created on first resize
+
+
+def get_resize_pool() -> ProcessPoolExecutor:
+    global resize_pool
+    if resize_pool is None:
+        # forkserver: children start clean instead of inheriting the Mongo client's threads
+        context = get_context("forkserver")
+        context.set_forkserver_preload(["thumbnails"])
+        resize_pool = ProcessPoolExecutor(max_workers=RESIZE_WORKERS, mp_context=context)
+    return resize_pool
+
+
+async def serve_resized(event_id: str, filename: str, request: Request, w: int, fmt: str, cache_control: str):
+    save_data = request.headers.get("save-data", "").lower() == "on"
+    dpr = resizer.parse_dpr(request.headers.get("sec-ch-dpr") or request.headers.get("dpr"))
+    width = resizer.target_width(w, dpr, save_data)
+    out_fmt = resizer.negotiate_format(fmt, request.headers.get("accept", ""))
+    quality = (resizer.SAVE_DATA_QUALITY if save_data else resizer.QUALITY)[out_fmt]
+    key = resizer.cache_key(event_id, filename, width, out_fmt, quality)
+    vary = ["DPR", "Sec-CH-DPR", "Save-Data"] + (["Accept"] if fmt == "auto" else [])
+    headers = {"ETag": f'"{Path(key).stem}"', "Vary": ", ".join(vary), "Cache-Control": cache_control}
+    # The key covers source, width, format and quality, so a match needs no render
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return not_modified(headers)
+
+    async def render(dest: Path) -> int:
+        async with storage.fetch(media_key(event_id, filename)) as src:
+            return await asyncio.get_running_loop().run_in_executor(
+                get_resize_pool(), render_resized, src, dest, width, out_fmt, quality
+            )
+
+    try:
+        path = await rendition_cache.get_or_render(key, render)
+    except FileNotFoundError:
+        raise HTTPException(404, "File not found")
+    except (UnidentifiedImageError, Image.DecompressionBombError):
+        raise HTTPException(415, "This image can't be resized")
+    uri = accel_uri(path)
+    if uri:
+        return accel_response(uri, headers, media_type=f"image/{out_fmt}")
+    return await send_file(request, path, headers, media_type=f"image/{out_fmt}")
+
+
 @api_router.get("/files/{event_id}/{filename}")
-async def serve_file(event_id: str, filename: str):
-    file_path = UPLOAD_DIR / event_id / filename
-    if not file_path.exists():
+async def serve_file(
+    event_id: str,
+    filename: str,
+    request: Request,
+    w: Optional[int] = Query(None, ge=1, le=resizer.MAX_WIDTH),
+    fmt: str = Query("auto", pattern="^(auto|avif|webp|jpeg)$"),
+):
+    """Serve an uploaded file, or with ?w= a resized image rendition (cached on disk).
+    fmt=auto picks AVIF/WebP/JPEG from Accept; DPR and Save-Data client hints are honoured.
+    UUID-named media is immutable; revisits get 304s answered from stored CRCs without a stat.
+    Range / If-Range requests (video seeking) get 206 responses. With ACCEL_REDIRECT_PREFIX
+    set, nginx sends the bytes instead (X-Accel-Redirect); with S3 storage, clients are
+    redirected to a presigned bucket URL."""
+    if event_id.startswith(".") or filename.startswith("."):
+        # Also covers in-progress resumable uploads and the resize cache
         raise HTTPException(404, "File not found")
-    return FileResponse(str(file_path))
+    key = media_key(event_id, filename)
+    cache_control = IMMUTABLE_CACHE_CONTROL if UUID_FILENAME.match(filename) else "no-cache"
+    if w is not None:
+        if not resizer.is_resizable(filename):
+            raise HTTPException(400, "Only images can be resized")
+        # Known media needs no storage round trip; cached renditions of deleted files aren't served
+        known = UUID_FILENAME.match(filename) and await stored_etag(event_id, filename)
+        if not known and await storage.stat(key) is None:
+            raise HTTPException(404, "File not found")
+        return await serve_resized(event_id, filename, request, w, fmt, cache_control)
+
+    headers = {"Cache-Control": cache_control}
+    file_path = storage.local_path(key)
+    if file_path is None:
+        # The bucket serves the bytes (ranges and validators included); the redirect
+        # itself may be cached briefly, as the presigned URL is reused for a while
+        url = await storage.presigned_url(key, cache_control)
+        return RedirectResponse(url, headers={"Cache-Control": f"private, max-age={PRESIGNED_REDIRECT_MAX_AGE}"})
+    uri = accel_uri(file_path)
+    if uri:
+        # nginx validates, ranges and 404s with its own ETag; nothing to look up here
+        return accel_response(uri, headers)
+    if_none_match = request.headers.get("if-none-match")
+    etag = await stored_etag(event_id, filename) if UUID_FILENAME.match(filename) else None
+    if etag:
+        headers["ETag"] = etag
+        if etag_matches(if_none_match, etag):
+            return not_modified(headers)
+    try:
+        st = await asyncio.to_thread(os.stat, file_path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise HTTPException(404, "File not found")
+    if not etag:
+        headers["ETag"] = f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+        if etag_matches(if_none_match, headers["ETag"]):
+            return not_modified(headers)
+    return await send_file(request, file_path, headers, st=st)
 
 
 # --- Admin Routes ---
 @api_router.get("/admin/stats")
 async def admin_stats(current_user=Depends(get_admin_user)):
-    total_users = await db.users.count_documents({})
-    total_events = await db.events.count_documents({})
-    total_media = await db.media.count_documents({})
-    storage_bytes = sum(
-        f.stat().st_size for f in UPLOAD_DIR.rglob("*") if f.is_file()
-    ) if UPLOAD_DIR.exists() else 0
+    total_users = await db.users.estimated_document_count()
+    total_events = await db.events.estimated_document_count()
+    totals = await db.counters.find_one({"_id": TOTALS_ID}) or {}
     return {
         "total_users": total_users,
         "total_events": total_events,
-        "total_media": total_media,
-        "storage_used_mb": round(storage_bytes / 1024 / 1024, 1)
+        "total_media": totals.get("media_count", 0),
+        "storage_used_mb": round(totals.get("storage_bytes", 0) / 1024 / 1024, 1),
+        "uploads_skipped": totals.get("uploads_skipped", 0),
+        "transfer_saved_mb": round(totals.get("transfer_bytes_saved", 0) / 1024 / 1024, 1)
     }
 
 
 @api_router.get("/admin/events")
-async def admin_get_events(current_user=Depends(get_admin_user)):
-    events = await db.events.find({}).sort("created_at", -1).to_list(1000)
+async def admin_get_events(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    sort: str = "created_at",
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    current_user=Depends(get_admin_user)
+):
+    """All events with organizer details in one pipeline; follow X-Next-Cursor for further pages."""
+    if sort not in ADMIN_EVENT_SORTS:
+        raise HTTPException(400, f"Unsupported sort key: {sort}")
+    descending = order == "desc"
+    pipeline = event_listing_pipeline(keyset_after(cursor, sort, descending), limit, sort, descending)
+    pipeline.append(ORGANIZER_LOOKUP)
+    events = await db.events.aggregate(pipeline).to_list(limit + 1)
+    events = paginate(events, limit, response, sort)
     result = []
     for e in events:
-        count = await db.media.count_documents({"event_id": str(e["_id"])})
-        organizer = await db.users.find_one({"_id": ObjectId(e["organizer_id"])})
-        event_data = fmt_event(e, count)
+        organizer = e["organizer"][0] if e["organizer"] else None
+        event_data = fmt_event(e)
         event_data["organizer_name"] = organizer["name"] if organizer else "Unknown"
         event_data["organizer_email"] = organizer["email"] if organizer else "Unknown"
         result.append(event_data)
@@ -883,17 +2180,35 @@ async def admin_get_events(current_user=Depends(get_admin_user)):
 
 
 @api_router.get("/admin/users")
-async def admin_get_users(current_user=Depends(get_admin_user)):
-    users = await db.users.find({}).sort("created_at", -1).to_list(1000)
+async def admin_get_users(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    sort: str = "created_at",
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    current_user=Depends(get_admin_user)
+):
+    """All users with their event counts in one pipeline; follow X-Next-Cursor for further pages."""
+    if sort not in ADMIN_USER_SORTS:
+        raise HTTPException(400, f"Unsupported sort key: {sort}")
+    descending = order == "desc"
+    users = await db.users.aggregate([
+        {"$match": keyset_after(cursor, sort, descending)},
+        {"$sort": keyset_sort(sort, descending)},
+        {"$limit": limit + 1},
+        EVENTS_COUNT_LOOKUP,
+        {"$project": {"hashed_password": 0}},
+    ]).to_list(limit + 1)
+    users = paginate(users, limit, response, sort)
     result = []
     for u in users:
-        count = await db.events.count_documents({"organizer_id": str(u["_id"])})
+        counts = u["events_counts"]
         result.append({
             "id": str(u["_id"]),
             "name": u["name"],
             "email": u["email"],
             "role": "admin" if u.get('email', '').lower() == ADMIN_EMAIL else "organizer",
-            "events_count": count,
+            "events_count": counts[0]["n"] if counts else 0,
             "created_at": u.get("created_at", "")
         })
     return result
@@ -904,16 +2219,19 @@ async def admin_delete_user(user_id: str, current_user=Depends(get_admin_user)):
     user = await db.users.find_one({"_id": ObjectId(user_id)})
     if not user:
         raise HTTPException(404, "User not found")
+    await revoke_tokens(user_id)  # sign them out before their data starts disappearing
     # Delete all their events and media
-    events = await db.events.find({"organizer_id": user_id}).to_list(1000)
-    for e in events:
+    async for e in db.events.find({"organizer_id": user_id}, {"_id": 1}):
         event_id = str(e["_id"])
-        event_dir = UPLOAD_DIR / event_id
-        if event_dir.exists():
-            shutil.rmtree(event_dir)
+        await storage.delete_event(event_id)
         await db.media.delete_many({"event_id": event_id})
-    await db.events.delete_many({"organizer_id": user_id})
+        await db.upload_sessions.delete_many({"event_id": event_id})
+        await db.blobs.delete_many({"event_id": event_id})
+        deleted = await db.events.find_one_and_delete({"_id": e["_id"]})
+        if deleted:
+            await release_event_usage(deleted)
     await db.users.delete_one({"_id": ObjectId(user_id)})
+    forget_user(user_id)
     return {"message": "User and all their data deleted"}
 
 
@@ -961,35 +2279,23 @@ async def save_smtp_settings(data: SMTPSettingsInput, current_user=Depends(get_a
         doc["smtp_password"] = ""
 
     await db.settings.update_one({"type": "smtp"}, {"$set": doc}, upsert=True)
+    smtp_settings.invalidate()
     return {"message": "SMTP settings saved successfully"}
 
 
 @api_router.post("/admin/settings/smtp/test")
 async def test_smtp_settings(current_user=Depends(get_admin_user)):
     """Send a test email to the admin to verify SMTP configuration."""
-    settings = await db.settings.find_one({"type": "smtp"})
-    if not settings or not settings.get("smtp_password"):
+    if not mail.is_configured(await smtp_settings.get()):
         raise HTTPException(400, "SMTP password not configured. Please save your password first.")
     try:
-        msg = MIMEMultipart()
-        msg["From"] = settings["smtp_user"]
-        msg["To"] = current_user["email"]
-        msg["Subject"] = "SnapVault SMTP Test"
-        msg.attach(MIMEText("<p>This is a test email from SnapVault. Your SMTP settings are working correctly!</p>", "html"))
-
-        port = int(settings["smtp_port"])
-        if port == 465:
-            with smtplib.SMTP_SSL(settings["smtp_host"], port, timeout=15) as server:
-                server.login(settings["smtp_user"], settings["smtp_password"])
-                server.sendmail(settings["smtp_user"], current_user["email"], msg.as_string())
-        else:
-            with smtplib.SMTP(settings["smtp_host"], port, timeout=15) as server:
-                server.starttls()
-                server.login(settings["smtp_user"], settings["smtp_password"])
-                server.sendmail(settings["smtp_user"], current_user["email"], msg.as_string())
+        # Sent straight away rather than through the outbox, so the admin sees any error
+        await asyncio.wait_for(
+            outbox.send_now(current_user["email"], "SnapVault SMTP Test", mail.render("smtp_test")), 15
+        )
         return {"message": f"Test email sent to {current_user['email']}"}
     except Exception as e:
-        raise HTTPException(400, f"SMTP test failed: {str(e)}")
+        raise HTTPException(400, f"SMTP test failed: {str(e) or type(e).__name__}")
 
 
 # --- Payment Routes ---
@@ -1029,6 +2335,47 @@ async def submit_payment(event_id: str, data: PaymentSubmit, current_user=Depend
     }
 
 
+@api_router.get("/events/{event_id}/qr-card")
+async def qr_card_preview(
+    event_id: str,
+    request: Request,
+    template: Optional[str] = None,
+    size: Optional[str] = Query(None, pattern="^(10x8|8x6)$"),
+    guest_url: Optional[str] = Query(None, max_length=MAX_GUEST_URL_LENGTH),
+    current_user=Depends(get_current_user),
+):
+    """
+    The printable QR card as PNG, exactly as it will be emailed on approval.
+    Template, size and guest URL default to those submitted with the payment.
+    """
+    query = {"_id": ObjectId(event_id)}
+    if not is_admin(current_user):
+        query["organizer_id"] = str(current_user["_id"])
+    event = await db.events.find_one(query)
+    if not event:
+        raise HTTPException(404, "Event not found")
+    template = template or event.get("qr_template")
+    guest_url = guest_url or event.get("guest_url")
+    if not template or not guest_url:
+        raise HTTPException(400, "Choose a template and guest URL for the card")
+    size = size or event.get("qr_size") or "10x8"
+    subtitle = event.get("subtitle", "")
+
+    # The key hashes everything drawn on the card, so it is also the ETag
+    key = qrcards.cache_key(event["event_type"], template, size, event["title"], subtitle, guest_url)
+    headers = {"ETag": f'"{Path(key).stem}"', "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return not_modified(headers)
+    try:
+        path, _key = await qr_card_file(event["event_type"], template, size, event["title"], subtitle, guest_url)
+    except qrcode.exceptions.DataOverflowError:
+        raise HTTPException(400, "Guest URL is too long for a QR code")
+    uri = accel_uri(path)
+    if uri:
+        return accel_response(uri, headers, media_type="image/png")
+    return await send_file(request, path, headers, media_type="image/png")
+
+
 @api_router.post("/admin/events/{event_id}/approve-payment")
 async def approve_payment(event_id: str, current_user=Depends(get_admin_user)):
     """Admin approves payment. Generates QR card and emails it to the organiser."""
@@ -1054,8 +2401,8 @@ async def approve_payment(event_id: str, current_user=Depends(get_admin_user)):
         }}
     )
 
-    # Generate QR card and send email
-    email_sent = False
+    # Generate QR card and queue the email; the outbox sends it (see /admin/events/{id}/qr-email)
+    email_id = None
     guest_url = event.get("guest_url", "")
     qr_template = event.get("qr_template", "")
     qr_size = event.get("qr_size", "10x8")
@@ -1065,7 +2412,7 @@ async def approve_payment(event_id: str, current_user=Depends(get_admin_user)):
 
     if guest_url and qr_template:
         try:
-            qr_image = generate_qr_card_image(
+            qr_image = await generate_qr_card_image(
                 event_type=event["event_type"],
                 template_key=qr_template,
                 size_key=qr_size,
@@ -1073,7 +2420,7 @@ async def approve_payment(event_id: str, current_user=Depends(get_admin_user)):
                 event_subtitle=event.get("subtitle", ""),
                 guest_url=guest_url
             )
-            email_sent = await send_qr_email(
+            email_id = await send_qr_email(
                 to_email=organizer["email"],
                 organizer_name=organizer.get("name", ""),
                 event_title=event["title"],
@@ -1084,11 +2431,33 @@ async def approve_payment(event_id: str, current_user=Depends(get_admin_user)):
             )
         except Exception as e:
             logger.error(f"QR card generation/email failed for event {event_id}: {e}")
+    if email_id:
+        await db.events.update_one({"_id": ObjectId(event_id)}, {"$set": {"qr_email_id": email_id}})
 
     return {
-        "message": "Payment approved — QR card sent to organiser" if email_sent else "Payment approved — email could not be sent (check SMTP settings)",
+        "message": "Payment approved — QR card email queued for the organiser" if email_id else "Payment approved — email could not be queued (check SMTP settings)",
         "is_paid": True,
-        "email_sent": email_sent
+        "email_queued": bool(email_id),
+        "email_id": str(email_id) if email_id else None
+    }
+
+
+@api_router.get("/admin/events/{event_id}/qr-email")
+async def get_qr_email_status(event_id: str, current_user=Depends(get_admin_user)):
+    """Delivery state of the event's QR card email: queued, running, done or failed, with the last error."""
+    event = await db.events.find_one({"_id": ObjectId(event_id)}, {"qr_email_id": 1})
+    if not event:
+        raise HTTPException(404, "Event not found")
+    message = await outbox.queue.get(event["qr_email_id"]) if event.get("qr_email_id") else None
+    if not message:
+        raise HTTPException(404, "No QR card email was queued for this event")
+    return {
+        "id": str(message["_id"]),
+        "to": message["payload"]["to"],
+        "status": message["status"],
+        "attempts": message["attempts"],
+        "max_attempts": message["max_attempts"],
+        "error": message.get("error"),
     }
 
 
@@ -1105,6 +2474,32 @@ async def health_check():
 app.include_router(api_router)
 
 
+@app.on_event("startup")
+async def startup():
+    await ensure_indexes()
+    rounds = BCRYPT_ROUNDS or await asyncio.to_thread(calibrate_rounds, BCRYPT_TARGET_MS / 1000)
+    passwords.set_rounds(rounds)
+    logger.info(f"bcrypt cost {rounds}{'' if BCRYPT_ROUNDS else ' (calibrated)'}")
+    if RECONCILE_INTERVAL > 0:
+        app.state.reconciler = asyncio.create_task(reconcile_loop())
+    app.state.upload_sweeper = asyncio.create_task(expire_uploads_loop())
+    app.state.mail_sweeper = asyncio.create_task(expire_mail_loop())
+    worker_id = f"{socket.gethostname()}-{os.getpid()}"
+    app.state.mail_senders = [asyncio.create_task(deliver_mail_loop(worker_id)) for _ in range(MAIL_CONCURRENCY)]
+
+
 @app.on_event("shutdown")
 async def shutdown():
+    for name in ("reconciler", "upload_sweeper", "mail_sweeper"):
+        task = getattr(app.state, name, None)
+        if task:
+            task.cancel()
+    for task in getattr(app.state, "mail_senders", []):
+        task.cancel()
+    await outbox.pool.close()
+    if resize_pool:
+        resize_pool.shutdown(cancel_futures=True)
+    if card_pool:
+        card_pool.shutdown(cancel_futures=True)
+    passwords.shutdown()
     client.close()
@@ -0,0 +1,387 @@
+"""
+Where uploaded media lives.
+
+Media is addressed by key, "<event_id>/<filename>". LocalStorage keeps it
+under UPLOAD_DIR, as SnapVault always has. S3Storage keeps it in an
+S3-compatible bucket (AWS, MinIO, Backblaze, ...), so several API nodes can
+share one store, and clients can fetch bytes straight from the bucket through
+presigned URLs instead of through the app.
+
+Files are produced locally (uploads, ffmpeg output, thumbnails): write them to
+staging_path(key), then put_file() them. For the local driver the staging path
+is the final path, so nothing is copied. Code that needs a file on disk
+(ffprobe, Pillow) wraps the key in fetch(); the S3 driver downloads it to a
+temporary file for the duration.
+
+boto3 is synchronous, so S3 calls run in worker threads.
+"""
+import asyncio
+import mimetypes
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator, Optional
+
+from zipstream import read_file_range
+
+CHUNK_SIZE = 1024 * 1024
+S3_MIN_PART_SIZE = 5 * 1024 * 1024
+PRESIGN_CACHE_SIZE = 10000
+
+
+def media_key(event_id: str, filename: str) -> str:
+    return f"{event_id}/{filename}"
+
+
+def split_key(key: str) -> tuple:
+    event_id, filename = key.split("/", 1)
+    return event_id, filename
+
+
+class Storage(ABC):
+    """Interface shared by the drivers. `local` is True when files can be served from disk."""
+    local = False
+
+    @abstractmethod
+    def staging_dir(self, event_id: str) -> Path:
+        ...
+
+    def staging_path(self, key: str) -> Path:
+        """Where to write a file that will be stored under `key` with put_file()."""
+        event_id, filename = split_key(key)
+        return self.staging_dir(event_id) / filename
+
+    def local_path(self, key: str) -> Optional[Path]:
+        """The file on local disk, if this driver keeps one."""
+        return None
+
+    @abstractmethod
+    def open_writer(self, key: str):
+        """A writer streaming a new file to `key`: await write(data), then commit() or abort()."""
+
+    @abstractmethod
+    async def put_file(self, key: str, path: Path):
+        """Store the local file at `path` under `key`. The local file is consumed."""
+
+    @abstractmethod
+    def fetch(self, key: str):
+        """Async context manager yielding a local Path with the file's bytes; FileNotFoundError if missing."""
+
+    @abstractmethod
+    async def stat(self, key: str) -> Optional[tuple]:
+        """(size, mtime) or None if there is no such file."""
+
+    @abstractmethod
+    async def list_sizes(self, event_id: str) -> dict:
+        """filename -> size for every stored file of an event."""
+
+    async def usage(self, event_id: str) -> int:
+        return sum((await self.list_sizes(event_id)).values())
+
+    @abstractmethod
+    def read_range(self, key: str, offset: int, length: int, chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+        ...
+
+    @abstractmethod
+    async def delete(self, keys: list):
+        ...
+
+    @abstractmethod
+    async def delete_event(self, event_id: str):
+        ...
+
+    async def presigned_url(self, key: str, cache_control: Optional[str] = None) -> Optional[str]:
+        """A URL clients can GET the file from directly, or None if it must be served by the API."""
+        return None
+
+
+# --- Local filesystem ---
+class LocalWriter:
+    def __init__(self, path: Path):
+        self.path = path
+        self.file = None
+
+    async def write(self, data: bytes):
+        if self.file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.file = await asyncio.to_thread(open, self.path, "wb")
+        await asyncio.to_thread(self.file.write, data)
+
+    async def commit(self):
+        if self.file is None:
+            await self.write(b"")
+        await asyncio.to_thread(self.file.close)
+
+    async def abort(self):
+        if self.file is not None:
+            await asyncio.to_thread(self.file.close)
+        self.path.unlink(missing_ok=True)
+
+
+class LocalStorage(Storage):
+    local = True
+
+    def __init__(self, root: Path):
+        self.root = root
+
+    def path(self, key: str) -> Path:
+        event_id, filename = split_key(key)
+        return self.root / event_id / filename
+
+    def staging_dir(self, event_id: str) -> Path:
+        path = self.root / event_id
+        path.mkdir(parents=True, exist_ok=True)
+        return path
+
+    def local_path(self, key: str) -> Optional[Path]:
+        return self.path(key)
+
+    def open_writer(self, key: str) -> LocalWriter:
+        return LocalWriter(self.path(key))
+
+    async def put_file(self, key: str, path: Path):
+        dest = self.path(key)
+        if Path(path) != dest:
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            await asyncio.to_thread(shutil.move, path, dest)
+
+    @asynccontextmanager
+    async def fetch(self, key: str):
+        path = self.path(key)
+        if not await asyncio.to_thread(path.is_file):
+            raise FileNotFoundError(key)
+        yield path
+
+    async def stat(self, key: str) -> Optional[tuple]:
+        try:
+            st = await asyncio.to_thread(os.stat, self.path(key))
+        except FileNotFoundError:
+            return None
+        return st.st_size, st.st_mtime
+
+    async def list_sizes(self, event_id: str) -> dict:
+        def scan():
+            path = self.root / event_id
+            if not path.is_dir():
+                return {}
+            # Hidden files are in-progress resumable uploads, counted once they are finalized
+            return {e.name: e.stat().st_size for e in os.scandir(path)
+                    if e.is_file() and not e.name.startswith(".")}
+        return await asyncio.to_thread(scan)
+
+    async def read_range(self, key: str, offset: int, length: int,
+                         chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+        async for chunk in read_file_range(self.path(key), offset, length, chunk_size):
+            yield chunk
+
+    async def delete(self, keys: list):
+        def unlink():
+            for key in keys:
+                self.path(key).unlink(missing_ok=True)
+        await asyncio.to_thread(unlink)
+
+    async def delete_event(self, event_id: str):
+        await asyncio.to_thread(shutil.rmtree, self.root / event_id, True)
+
+
+# --- S3-compatible object storage ---
+class S3Writer:
+    """Buffers up to one part; small files become a single PUT, larger ones a multipart upload."""
+
+    def __init__(self, storage: "S3Storage", key: str):
+        self.storage = storage
+        self.key = key
+        self.buffer = bytearray()
+        self.upload_id = None
+        self.parts: list = []
+
+    async def write(self, data: bytes):
+        self.buffer += data
+        if len(self.buffer) >= self.storage.part_size:
+            await self._flush_part()
+
+    async def _flush_part(self):
+        s = self.storage
+        if self.upload_id is None:
+            created = await asyncio.to_thread(s.client.create_multipart_upload, Bucket=s.bucket,
+                                              Key=self.key, ContentType=content_type(self.key))
+            self.upload_id = created["UploadId"]
+        number = len(self.parts) + 1
+        body, self.buffer = bytes(self.buffer), bytearray()
+        part = await asyncio.to_thread(s.client.upload_part, Bucket=s.bucket, Key=self.key,
+                                       UploadId=self.upload_id, PartNumber=number, Body=body)
+        self.parts.append({"PartNumber": number, "ETag": part["ETag"]})
+
+    async def commit(self):
+        s = self.storage
+        if self.upload_id is None:
+            await asyncio.to_thread(s.client.put_object, Bucket=s.bucket, Key=self.key,
+                                    Body=bytes(self.buffer), ContentType=content_type(self.key))
+            return
+        if self.buffer:
+            await self._flush_part()
+        await asyncio.to_thread(s.client.complete_multipart_upload, Bucket=s.bucket, Key=self.key,
+                                UploadId=self.upload_id, MultipartUpload={"Parts": self.parts})
+
+    async def abort(self):
+        if self.upload_id is not None:
+            s = self.storage
+            await asyncio.to_thread(s.client.abort_multipart_upload, Bucket=s.bucket,
+                                    Key=self.key, UploadId=self.upload_id)
+
+
+def content_type(key: str) -> str:
+    return mimetypes.guess_type(key)[0] or "application/octet-stream"
+
+
+class S3Storage(Storage):
+    def __init__(self, bucket: str, endpoint_url: Optional[str] = None, public_endpoint_url: Optional[str] = None,
+                 region: Optional[str] = None, access_key: Optional[str] = None, secret_key: Optional[str] = None,
+                 staging_root: Optional[Path] = None, part_size: int = 8 * 1024 * 1024,
+                 presign_expires: int = 3600):
+        import boto3
+        from boto3.s3.transfer import TransferConfig
+        from botocore.config import Config
+
+        # Path-style addressing works with MinIO and other stand-ins as well as AWS
+        config = Config(signature_version="s3v4", s3={"addressing_style": "path"},
+                        max_pool_connections=32, retries={"max_attempts": 5, "mode": "standard"})
+        session = boto3.session.Session(aws_access_key_id=access_key, aws_secret_access_key=secret_key,
+                                        region_name=region)
+        self.client = session.client("s3", endpoint_url=endpoint_url, config=config)
+        # Presigned URLs carry the host they were signed for, so sign with the address clients use
+        self.presign_client = (session.client("s3", endpoint_url=public_endpoint_url, config=config)
+                               if public_endpoint_url else self.client)
+        self.bucket = bucket
+        self.part_size = max(part_size, S3_MIN_PART_SIZE)
+        self.transfer_config = TransferConfig(multipart_threshold=self.part_size, multipart_chunksize=self.part_size)
+        self.staging_root = staging_root or Path(tempfile.gettempdir()) / "snapvault-staging"
+        self.presign_expires = presign_expires
+        # Reusing a URL for half its lifetime keeps it stable, so browsers can cache what it points at
+        self.presigned: OrderedDict = OrderedDict()  # (key, cache_control) -> (url, reuse_until)
+
+    def staging_dir(self, event_id: str) -> Path:
+        path = self.staging_root / event_id
+        path.mkdir(parents=True, exist_ok=True)
+        return path
+
+    def open_writer(self, key: str) -> S3Writer:
+        return S3Writer(self, key)
+
+    async def put_file(self, key: str, path: Path):
+        await asyncio.to_thread(self.client.upload_file, str(path), self.bucket, key,
+                                ExtraArgs={"ContentType": content_type(key)}, Config=self.transfer_config)
+        Path(path).unlink(missing_ok=True)
+
+    def _missing(self, e) -> bool:
+        return e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound")
+
+    @asynccontextmanager
+    async def fetch(self, key: str):
+        from botocore.exceptions import ClientError
+        tmp = self.staging_dir(".fetch") / f"{uuid.uuid4().hex}-{split_key(key)[1]}"
+        try:
+            await asyncio.to_thread(self.client.download_file, self.bucket, key, str(tmp),
+                                    Config=self.transfer_config)
+        except ClientError as e:
+            tmp.unlink(missing_ok=True)
+            if self._missing(e):
+                raise FileNotFoundError(key) from e
+            raise
+        try:
+            yield tmp
+        finally:
+            tmp.unlink(missing_ok=True)
+
+    async def stat(self, key: str) -> Optional[tuple]:
+        from botocore.exceptions import ClientError
+        try:
+            head = await asyncio.to_thread(self.client.head_object, Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if self._missing(e):
+                return None
+            raise
+        return head["ContentLength"], head["LastModified"].timestamp()
+
+    def _list(self, prefix: str) -> list:
+        objects = []
+        for page in self.client.get_paginator("list_objects_v2").paginate(Bucket=self.bucket, Prefix=prefix):
+            objects.extend(page.get("Contents", []))
+        return objects
+
+    async def list_sizes(self, event_id: str) -> dict:
+        prefix = f"{event_id}/"
+        objects = await asyncio.to_thread(self._list, prefix)
+        return {o["Key"][len(prefix):]: o["Size"] for o in objects}
+
+    async def read_range(self, key: str, offset: int, length: int,
+                         chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+        if length <= 0:
+            return
+        obj = await asyncio.to_thread(self.client.get_object, Bucket=self.bucket, Key=key,
+                                      Range=f"bytes={offset}-{offset + length - 1}")
+        body = obj["Body"]
+        try:
+            remaining = length
+            while remaining > 0:
+                data = await asyncio.to_thread(body.read, min(chunk_size, remaining))
+                if not data:
+                    raise IOError(f"{key} is shorter than expected")
+                remaining -= len(data)
+                yield data
+        finally:
+            body.close()
+
+    async def delete(self, keys: list):
+        for i in range(0, len(keys), 1000):
+            batch = [{"Key": k} for k in keys[i:i + 1000]]
+            await asyncio.to_thread(self.client.delete_objects, Bucket=self.bucket,
+                                    Delete={"Objects": batch, "Quiet": True})
+
+    async def delete_event(self, event_id: str):
+        objects = await asyncio.to_thread(self._list, f"{event_id}/")
+        await self.delete([o["Key"] for o in objects])
+        await asyncio.to_thread(shutil.rmtree, self.staging_root / event_id, True)
+
+    async def presigned_url(self, key: str, cache_control: Optional[str] = None) -> Optional[str]:
+        now = time.time()
+        cached = self.presigned.get((key, cache_control))
+        if cached and cached[1] > now:
+            self.presigned.move_to_end((key, cache_control))
+            return cached[0]
+        params = {"Bucket": self.bucket, "Key": key}
+        if cache_control:
+            params["ResponseCacheControl"] = cache_control
+        url = self.presign_client.generate_presigned_url("get_object", Params=params,
+                                                         ExpiresIn=self.presign_expires)
+        self.presigned[(key, cache_control)] = (url, now + self.presign_expires / 2)
+        self.presigned.move_to_end((key, cache_control))
+        while len(self.presigned) > PRESIGN_CACHE_SIZE:
+            self.presigned.popitem(last=False)
+        return url
+
+
+def storage_from_env(upload_dir: Path) -> Storage:
+    """The driver selected by STORAGE_BACKEND (local by default)."""
+    backend = os.environ.get("STORAGE_BACKEND", "local").lower()
+    if backend == "local":
+        return LocalStorage(upload_dir)
+    if backend == "s3":
+        return S3Storage(
+            bucket=os.environ["S3_BUCKET"],
+            endpoint_url=os.environ.get("S3_ENDPOINT_URL") or None,
+            public_endpoint_url=os.environ.get("S3_PUBLIC_ENDPOINT_URL") or None,
+            region=os.environ.get("S3_REGION") or None,
+            access_key=os.environ.get("S3_ACCESS_KEY_ID") or None,
+            secret_key=os.environ.get("S3_SECRET_ACCESS_KEY") or None,
+            staging_root=upload_dir,
+            part_size=int(os.environ.get("S3_PART_SIZE_MB", 8)) * 1024 * 1024,
+            presign_expires=int(os.environ.get("S3_PRESIGN_EXPIRES_SECONDS", 3600)),
+        )
+    raise ValueError(f"Unknown STORAGE_BACKEND {backend!r} (expected local or s3)")
@@ -0,0 +1,63 @@
+import io
+import os
+import sys
+from pathlib import Path
+
+import pytest
+import requests
+from PIL import Image
+
+# Lets tests import backend modules (zipstream, ...) directly
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+ADMIN_EMAIL = "test@snapvault.uk"
+ADMIN_PASS = "test1234"
+
+JPEG_BYTES = (
+    b'\xff\xd8\xff\xe0\x00\x10JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00'
+    b'\xff\xdb\x00C\x00\x08\x06\x06\x07\x06\x05\x08\x07\x07\x07\t\t'
+    b'\x08\n\x0c\x14\r\x0c\x0b\x0b\x0c\x19\x12\x13\x0f\x14\x1d\x1a'
+    b'\x1f\x1e\x1d\x1a\x1c\x1c $.\' ",#\x1c\x1c(7),01444\x1f\'9=82<.342\x1e'
+    b'=\x19\x19 2 ())))#$,3 <=0<3) >\x02\x11\x03\x11\x01\x00?\x00\xf5'
+    b'\xff\xd9'
+)
+
+
+def make_jpeg(size=(2400, 1600)) -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", size, (30, 90, 160)).save(buf, "JPEG", quality=90)
+    return buf.getvalue()
+
+
+def post_upload(slug, name, data, content_type="image/jpeg", **fields) -> requests.Response:
+    """Send one file to the guest upload endpoint as TestGuest; extra form fields (sha256, ...) as keywords."""
+    return requests.post(f"{BASE_URL}/api/guest/event/{slug}/upload", files={"file": (name, data, content_type)},
+                         data={"uploader_name": "TestGuest", **fields})
+
+
+def upload(slug, name, data, content_type="image/jpeg", **fields) -> dict:
+    """post_upload that must succeed; returns the upload result."""
+    resp = post_upload(slug, name, data, content_type, **fields)
+    assert resp.status_code == 200, resp.text
+    return resp.json()
+
+
+@pytest.fixture(scope="module")
+def admin_headers():
+    resp = requests.post(f"{BASE_URL}/api/auth/login", json={"email": ADMIN_EMAIL, "password": ADMIN_PASS})
+    assert resp.status_code == 200, f"Admin login failed: {resp.text}"
+    return {"Authorization": f"Bearer {resp.json()['token']}"}
+
+
+@pytest.fixture(scope="module")
+def event(request, admin_headers):
+    """A wedding event for the module, deleted afterwards; a module-level EVENT dict sets its title and other fields."""
+    fields = {"title": f"TEST_{request.module.__name__}", "event_type": "wedding", "template": "golden_elegance",
+              **getattr(request.module, "EVENT", {})}
+    resp = requests.post(f"{BASE_URL}/api/events", headers=admin_headers, json=fields)
+    assert resp.status_code == 200
+    data = resp.json()
+    yield data
+    requests.delete(f"{BASE_URL}/api/events/{data['id']}", headers=admin_headers)
@@ -175,3 +175,42 @@ class TestBulkDownload:
         )
         # Should be 403 or 404 (not owner)
         assert resp.status_code in [403, 404]
+
+
+class TestAdminPagination:
+    """Keyset pagination and sort keys on the admin listings"""
+
+    def test_admin_events_page_and_cursor(self, admin_token):
+        headers = {"Authorization": f"Bearer {admin_token}"}
+        resp = requests.get(f"{BASE_URL}/api/admin/events", headers=headers, params={"limit": 1})
+        assert resp.status_code == 200
+        assert len(resp.json()) <= 1
+        cursor = resp.headers.get("X-Next-Cursor")
+        if cursor:
+            nxt = requests.get(f"{BASE_URL}/api/admin/events", headers=headers, params={"limit": 1, "cursor": cursor})
+            assert nxt.status_code == 200
+            assert nxt.json()[0]["id"] != resp.json()[0]["id"]
+
+    def test_admin_events_sort_by_title_ascending(self, admin_token):
+        headers = {"Authorization": f"Bearer {admin_token}"}
+        resp = requests.get(f"{BASE_URL}/api/admin/events", headers=headers, params={"sort": "title", "order": "asc"})
+        assert resp.status_code == 200
+        titles = [e["title"] for e in resp.json()]
+        assert titles == sorted(titles)
+
+    def test_admin_events_rejects_unknown_sort(self, admin_token):
+        resp = requests.get(f"{BASE_URL}/api/admin/events", headers={"Authorization": f"Bearer {admin_token}"},
+                            params={"sort": "hashed_password"})
+        assert resp.status_code == 400
+
+    def test_admin_users_include_events_count(self, admin_token):
+        resp = requests.get(f"{BASE_URL}/api/admin/users", headers={"Authorization": f"Bearer {admin_token}"},
+                            params={"limit": 5, "sort": "email", "order": "asc"})
+        assert resp.status_code == 200
+        users = resp.json()
+        assert len(users) <= 5
+        for u in users:
+            assert u["events_count"] >= 0
+            assert "hashed_password" not in u
+        emails = [u["email"] for u in users]
+        assert emails == sorted(emails)
@@ -0,0 +1,102 @@
+"""
+Test batch guest uploads: many files per request, recorded together, with per-file results
+"""
+import hashlib
+import http.client
+import os
+from urllib.parse import urlsplit
+
+import requests
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+EVENT = {"title": "TEST_Batch Upload Event", "event_type": "corporate"}
+
+
+def batch(slug, files, hashes=None):
+    form = [("uploader_name", "TestGuest")] + [("sha256", h) for h in hashes or []]
+    return requests.post(f"{BASE_URL}/api/guest/event/{slug}/upload/batch",
+                         files=[("files", f) for f in files], data=form)
+
+
+def event_media(admin_headers, event_id):
+    resp = requests.get(f"{BASE_URL}/api/events/{event_id}/media", headers=admin_headers, params={"limit": 100})
+    assert resp.status_code == 200
+    return resp.json()
+
+
+class TestBatchUpload:
+    """Every file gets its own result, in request order, and one bad file does not sink the rest"""
+
+    def test_many_files(self, admin_headers, event):
+        blobs = [os.urandom(4096 + i) for i in range(12)]
+        resp = batch(event["slug"], [(f"voice{i}.mp3", b, "audio/mpeg") for i, b in enumerate(blobs)])
+        assert resp.status_code == 200, resp.text
+        data = resp.json()
+        assert data["uploaded"] == 12 and data["failed"] == 0
+        assert [r["filename"] for r in data["results"]] == [f"voice{i}.mp3" for i in range(12)]
+        assert all(r["ok"] and r["id"] for r in data["results"])
+
+        by_id = {m["id"]: m for m in event_media(admin_headers, event["id"])}
+        for r, b in zip(data["results"], blobs):
+            m = by_id[r["id"]]
+            assert m["file_size"] == len(b)
+            assert requests.get(f"{BASE_URL}{m['url']}").content == b
+
+    def test_mixed_results(self, event):
+        resp = batch(event["slug"], [
+            ("ok.mp3", os.urandom(1024), "audio/mpeg"),
+            ("notes.txt", b"not media", "text/plain"),
+            ("ok2.mp3", os.urandom(1024), "audio/mpeg"),
+        ])
+        assert resp.status_code == 200
+        data = resp.json()
+        assert [r["ok"] for r in data["results"]] == [True, False, True]
+        assert "supported" in data["results"][1]["error"]
+        assert data["uploaded"] == 2 and data["failed"] == 1
+
+    def test_duplicates_in_one_batch(self, event):
+        same = os.urandom(2048)
+        resp = batch(event["slug"], [("a.mp3", same, "audio/mpeg"), ("b.mp3", same, "audio/mpeg")])
+        results = resp.json()["results"]
+        assert sorted(r["deduplicated"] for r in results) == [False, True]
+
+    def test_hashes_are_verified(self, event):
+        good, bad = os.urandom(1024), os.urandom(1024)
+        resp = batch(event["slug"], [("good.mp3", good, "audio/mpeg"), ("bad.mp3", bad, "audio/mpeg")],
+                     hashes=[hashlib.sha256(good).hexdigest(), hashlib.sha256(b"other").hexdigest()])
+        assert [r["ok"] for r in resp.json()["results"]] == [True, False]
+
+    def test_hash_count_must_match(self, event):
+        resp = batch(event["slug"], [("a.mp3", os.urandom(16), "audio/mpeg")], hashes=["", ""])
+        assert resp.status_code == 400
+
+    def test_counters(self, admin_headers, event):
+        resp = requests.get(f"{BASE_URL}/api/events/{event['id']}", headers=admin_headers)
+        assert resp.json()["media_count"] == len(event_media(admin_headers, event["id"]))
+
+    def test_unknown_event(self):
+        resp = batch("no-such-event-slug", [("a.mp3", b"x", "audio/mpeg")])
+        assert resp.status_code == 404
+
+
+class TestBatchLimits:
+    """Oversized batches are refused before their parts are spooled"""
+
+    def test_too_many_files(self, event):
+        resp = batch(event["slug"], [(f"{i}.mp3", b"x", "audio/mpeg") for i in range(51)])
+        assert resp.status_code == 400
+
+    def test_declared_length_over_limit(self, event):
+        url = urlsplit(BASE_URL)
+        conn = (http.client.HTTPSConnection if url.scheme == "https" else http.client.HTTPConnection)(url.netloc)
+        conn.putrequest("POST", f"{url.path}/api/guest/event/{event['slug']}/upload/batch")
+        conn.putheader("Content-Type", "multipart/form-data; boundary=x")
+        conn.putheader("Content-Length", str(300 * 1024 * 1024))
+        conn.endheaders()
+        assert conn.getresponse().status == 413
+        conn.close()
+
+    def test_file_fields_only(self, event):
+        resp = requests.post(f"{BASE_URL}/api/guest/event/{event['slug']}/upload/batch",
+                             files={"uploader_name": ("x.txt", b"x")}, data={"files": "not a file"})
+        assert resp.status_code == 400
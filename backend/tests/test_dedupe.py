@@ -0,0 +1,111 @@
+"""
+Test content-addressed deduplication: identical uploads share one stored file and one ZIP entry
+"""
+import io
+import os
+import zipfile
+
+import pytest
+import requests
+
+from conftest import upload
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+EVENT = {"title": "TEST_Dedupe Event"}
+
+VOICE_BYTES = os.urandom(64 * 1024)
+OTHER_BYTES = os.urandom(32 * 1024)
+
+
+def media_by_id(admin_headers, event_id):
+    resp = requests.get(f"{BASE_URL}/api/events/{event_id}/media", headers=admin_headers)
+    assert resp.status_code == 200
+    return {m["id"]: m for m in resp.json()}
+
+
+def stats(admin_headers, event_id):
+    resp = requests.get(f"{BASE_URL}/api/events/{event_id}", headers=admin_headers)
+    assert resp.status_code == 200
+    return resp.json()
+
+
+@pytest.fixture(scope="module")
+def uploads(event):
+    first = upload(event["slug"], "voice.mp3", VOICE_BYTES, "audio/mpeg")
+    second = upload(event["slug"], "voice-again.mp3", VOICE_BYTES, "audio/mpeg")
+    other = upload(event["slug"], "other.mp3", OTHER_BYTES, "audio/mpeg")
+    return first, second, other
+
+
+class TestDuplicateUploads:
+    """A second upload of the same bytes references the stored file instead of copying it"""
+
+    def test_flags(self, uploads):
+        first, second, other = uploads
+        assert first["deduplicated"] is False
+        assert second["deduplicated"] is True
+        assert other["deduplicated"] is False
+
+    def test_shared_file(self, admin_headers, event, uploads):
+        first, second, other = uploads
+        media = media_by_id(admin_headers, event["id"])
+        assert media[first["id"]]["url"] == media[second["id"]]["url"]
+        assert media[first["id"]]["url"] != media[other["id"]]["url"]
+        assert media[second["id"]]["original_name"] == "voice-again.mp3"
+        resp = requests.get(f"{BASE_URL}{media[second['id']]['url']}")
+        assert resp.content == VOICE_BYTES
+
+    def test_counted_once(self, admin_headers, event, uploads):
+        data = stats(admin_headers, event["id"])
+        assert data["media_count"] == 3
+        assert data["storage_bytes"] == len(VOICE_BYTES) + len(OTHER_BYTES)
+
+    def test_one_zip_entry(self, admin_headers, event, uploads):
+        resp = requests.get(f"{BASE_URL}/api/events/{event['id']}/download", headers=admin_headers)
+        assert resp.status_code == 200
+        zf = zipfile.ZipFile(io.BytesIO(resp.content))
+        assert sorted(zf.namelist()) == ["other.mp3", "voice.mp3"]
+
+
+class TestDedupeReport:
+    """The per-event report counts duplicate uploads and the bytes they did not cost"""
+
+    def test_report(self, admin_headers, event, uploads):
+        resp = requests.get(f"{BASE_URL}/api/events/{event['id']}/dedupe", headers=admin_headers)
+        assert resp.status_code == 200
+        data = resp.json()
+        assert data["uploads"] == 3
+        assert data["unique"] == 2
+        assert data["duplicate_uploads"] == 1
+        assert data["stored_bytes"] == len(VOICE_BYTES) + len(OTHER_BYTES)
+        assert data["bytes_saved"] == len(VOICE_BYTES)
+        assert data["top_duplicates"] == [{"uploads": 2, "size": len(VOICE_BYTES),
+                                           "original_names": ["voice-again.mp3", "voice.mp3"]}]
+
+    def test_requires_auth(self, event):
+        resp = requests.get(f"{BASE_URL}/api/events/{event['id']}/dedupe")
+        assert resp.status_code in (401, 403)
+
+
+class TestDeleteRefcounting:
+    """Deleting one copy keeps the shared file; deleting the last removes it"""
+
+    def test_delete_copies(self, admin_headers, event, uploads):
+        first, second, _other = uploads
+        url = media_by_id(admin_headers, event["id"])[first["id"]]["url"]
+
+        requests.delete(f"{BASE_URL}/api/media/{first['id']}", headers=admin_headers)
+        assert requests.get(f"{BASE_URL}{url}").content == VOICE_BYTES
+        assert stats(admin_headers, event["id"])["storage_bytes"] == len(VOICE_BYTES) + len(OTHER_BYTES)
+
+        requests.delete(f"{BASE_URL}/api/media/{second['id']}", headers=admin_headers)
+        assert requests.get(f"{BASE_URL}{url}").status_code == 404
+        data = stats(admin_headers, event["id"])
+        assert data["media_count"] == 1
+        assert data["storage_bytes"] == len(OTHER_BYTES)
+
+    def test_reupload_after_delete_stores_again(self, admin_headers, event, uploads):
+        again = upload(event["slug"], "voice.mp3", VOICE_BYTES, "audio/mpeg")
+        assert again["deduplicated"] is False
+        url = media_by_id(admin_headers, event["id"])[again["id"]]["url"]
+        assert requests.get(f"{BASE_URL}{url}").content == VOICE_BYTES
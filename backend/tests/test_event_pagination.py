@@ -0,0 +1,68 @@
+"""
+Test cursor pagination of the organizer event listing (GET /api/events)
+"""
+import pytest
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+
+@pytest.fixture(scope="module")
+def two_events(admin_headers):
+    ids = []
+    for i in range(2):
+        resp = requests.post(f"{BASE_URL}/api/events", headers=admin_headers, json={
+            "title": f"TEST_Pagination Event {i}",
+            "event_type": "birthday",
+            "template": "confetti_party",
+        })
+        assert resp.status_code == 200
+        ids.append(resp.json()["id"])
+    yield ids
+    for event_id in ids:
+        requests.delete(f"{BASE_URL}/api/events/{event_id}", headers=admin_headers)
+
+
+class TestEventPagination:
+    """Keyset pagination keeps the fmt_event response shape"""
+
+    def test_limit_returns_one_page_with_cursor(self, admin_headers, two_events):
+        resp = requests.get(f"{BASE_URL}/api/events", headers=admin_headers, params={"limit": 1})
+        assert resp.status_code == 200
+        data = resp.json()
+        assert isinstance(data, list)
+        assert len(data) == 1
+        assert resp.headers.get("X-Next-Cursor")
+        for field in ("id", "title", "slug", "media_count", "is_paid", "created_at"):
+            assert field in data[0]
+
+    def test_walking_cursor_visits_every_event_once(self, admin_headers, two_events):
+        seen = []
+        cursor = None
+        while True:
+            params = {"limit": 1}
+            if cursor:
+                params["cursor"] = cursor
+            resp = requests.get(f"{BASE_URL}/api/events", headers=admin_headers, params=params)
+            assert resp.status_code == 200
+            seen.extend(e["id"] for e in resp.json())
+            cursor = resp.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+        assert len(seen) == len(set(seen))
+        for event_id in two_events:
+            assert event_id in seen
+
+    def test_pages_are_newest_first(self, admin_headers, two_events):
+        resp = requests.get(f"{BASE_URL}/api/events", headers=admin_headers)
+        created = [e["created_at"] for e in resp.json()]
+        assert created == sorted(created, reverse=True)
+
+    def test_invalid_cursor_rejected(self, admin_headers):
+        resp = requests.get(f"{BASE_URL}/api/events", headers=admin_headers, params={"cursor": "not-a-cursor"})
+        assert resp.status_code == 400
+
+    def test_limit_above_maximum_rejected(self, admin_headers):
+        resp = requests.get(f"{BASE_URL}/api/events", headers=admin_headers, params={"limit": 100000})
+        assert resp.status_code == 422
@@ -0,0 +1,90 @@
+"""
+Test immutable caching and conditional GETs on served media files
+"""
+import io
+import pytest
+import requests
+import os
+
+from conftest import make_jpeg
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+EVENT = {"title": "TEST_Caching Event"}
+
+PHOTOS = 5
+
+
+@pytest.fixture(scope="module")
+def photo_urls(admin_headers, event):
+    for i in range(PHOTOS):
+        files = {"file": (f"cache{i}.jpg", io.BytesIO(make_jpeg((1200 + i, 800))), "image/jpeg")}
+        resp = requests.post(f"{BASE_URL}/api/guest/event/{event['slug']}/upload", files=files, data={"uploader_name": "TestGuest"})
+        assert resp.status_code == 200
+    listing = requests.get(f"{BASE_URL}/api/events/{event['id']}/media", headers=admin_headers).json()
+    return [f"{BASE_URL}{m['url']}" for m in listing]
+
+
+def visit(urls, etags=None):
+    """GET every URL (conditionally if etags are given); returns (body bytes, responses)."""
+    responses = [
+        requests.get(url, headers={"If-None-Match": etags[url]} if etags else {})
+        for url in urls
+    ]
+    return sum(len(r.content) for r in responses), responses
+
+
+class TestMediaCaching:
+    """UUID media is immutable and revalidates with strong ETags"""
+
+    def test_immutable_headers(self, photo_urls):
+        resp = requests.get(photo_urls[0])
+        assert resp.status_code == 200
+        assert resp.headers["cache-control"] == "public, max-age=31536000, immutable"
+        assert resp.headers["etag"].startswith('"')  # strong, not W/
+
+    def test_etag_is_stable(self, photo_urls):
+        assert requests.get(photo_urls[0]).headers["etag"] == requests.get(photo_urls[0]).headers["etag"]
+
+    def test_warm_revisit_transfers_no_body_bytes(self, photo_urls):
+        cold_bytes, cold = visit(photo_urls)
+        assert all(r.status_code == 200 for r in cold)
+        etags = {url: r.headers["etag"] for url, r in zip(photo_urls, cold)}
+
+        warm_bytes, warm = visit(photo_urls, etags)
+        assert all(r.status_code == 304 for r in warm)
+        assert all(r.headers["etag"] == etags[url] for url, r in zip(photo_urls, warm))
+        print(f"cold visit: {cold_bytes} bytes, warm revisit: {warm_bytes} bytes")
+        assert cold_bytes > 0
+        assert warm_bytes == 0
+
+    def test_stale_etag_gets_full_body(self, photo_urls):
+        resp = requests.get(photo_urls[0], headers={"If-None-Match": '"deadbeef-1"'})
+        assert resp.status_code == 200
+        assert len(resp.content) > 0
+
+    def test_resized_rendition_revalidates(self, photo_urls):
+        url = f"{photo_urls[0]}?w=320&fmt=webp"
+        first = requests.get(url)
+        assert first.status_code == 200
+        assert "immutable" in first.headers["cache-control"]
+        again = requests.get(url, headers={"If-None-Match": first.headers["etag"]})
+        assert again.status_code == 304
+        assert again.content == b""
+
+    def test_deleted_media_is_not_revalidated(self, admin_headers, event):
+        files = {"file": ("gone.jpg", io.BytesIO(make_jpeg()), "image/jpeg")}
+        media_id = requests.post(f"{BASE_URL}/api/guest/event/{event['slug']}/upload", files=files,
+                                 data={"uploader_name": "TestGuest"}).json()["id"]
+        listing = requests.get(f"{BASE_URL}/api/events/{event['id']}/media", headers=admin_headers).json()
+        url = f"{BASE_URL}{next(m['url'] for m in listing if m['id'] == media_id)}"
+        etag = requests.get(url).headers["etag"]
+        requests.delete(f"{BASE_URL}/api/media/{media_id}", headers=admin_headers)
+        assert requests.get(url, headers={"If-None-Match": etag}).status_code == 404
+
+
+class TestFileServingPaths:
+    """Only files inside an event folder are served"""
+
+    def test_parent_directory_is_rejected(self):
+        resp = requests.get(f"{BASE_URL}/api/files/%2E%2E/server.py")
+        assert resp.status_code == 404
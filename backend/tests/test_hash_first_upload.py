@@ -0,0 +1,93 @@
+"""
+Test hash-first uploads: content the event already has is recorded from its SHA-256 alone,
+and uploads that carry a hash are verified against it
+"""
+import hashlib
+import os
+
+import requests
+
+from conftest import post_upload
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+EVENT = {"title": "TEST_Hash First Event", "event_type": "birthday"}
+
+VOICE_BYTES = os.urandom(48 * 1024)
+VOICE_SHA256 = hashlib.sha256(VOICE_BYTES).hexdigest()
+CHUNK_HEADERS = {"Content-Type": "application/offset+octet-stream"}
+
+
+def check(slug, sha256=VOICE_SHA256, size=len(VOICE_BYTES), name="voice.mp3"):
+    return requests.post(f"{BASE_URL}/api/guest/event/{slug}/upload/check", json={
+        "sha256": sha256, "size": size, "filename": name, "content_type": "audio/mpeg", "uploader_name": "TestGuest"
+    })
+
+
+class TestCheck:
+    """Unknown content is reported missing; known content becomes media without a transfer"""
+
+    def test_unknown_content(self, event):
+        resp = check(event["slug"])
+        assert resp.status_code == 200
+        assert resp.json() == {"exists": False}
+
+    def test_malformed_hash(self, event):
+        assert check(event["slug"], sha256="not-a-hash").status_code == 400
+
+    def test_unknown_event(self):
+        assert check("no-such-event-slug").status_code == 404
+
+    def test_known_content_skips_transfer(self, admin_headers, event):
+        first = post_upload(event["slug"], "voice.mp3", VOICE_BYTES, "audio/mpeg", sha256=VOICE_SHA256)
+        assert first.status_code == 200
+
+        resp = check(event["slug"], name="forwarded.mp3")
+        assert resp.status_code == 200
+        data = resp.json()
+        assert data["exists"] is True
+        assert data["deduplicated"] is True
+
+        media = requests.get(f"{BASE_URL}/api/events/{event['id']}/media", headers=admin_headers).json()
+        by_id = {m["id"]: m for m in media}
+        assert by_id[data["id"]]["original_name"] == "forwarded.mp3"
+        assert by_id[data["id"]]["url"] == by_id[first.json()["id"]]["url"]
+
+    def test_size_must_match(self, event):
+        assert check(event["slug"], size=len(VOICE_BYTES) + 1).json() == {"exists": False}
+
+    def test_metrics(self, admin_headers, event):
+        report = requests.get(f"{BASE_URL}/api/events/{event['id']}/dedupe", headers=admin_headers).json()
+        assert report["uploads_skipped"] == 1
+        assert report["transfer_bytes_saved"] == len(VOICE_BYTES)
+        stats = requests.get(f"{BASE_URL}/api/admin/stats", headers=admin_headers).json()
+        assert stats["uploads_skipped"] >= 1
+
+
+class TestVerification:
+    """Bytes that do not match the hash they were sent with are rejected"""
+
+    def test_plain_upload_mismatch(self, event):
+        resp = post_upload(event["slug"], "voice.mp3", os.urandom(1024), "audio/mpeg", sha256=VOICE_SHA256)
+        assert resp.status_code == 400
+
+    def test_resumable_upload_mismatch(self, event):
+        data = os.urandom(64 * 1024)
+        resp = requests.post(f"{BASE_URL}/api/guest/event/{event['slug']}/uploads", json={
+            "filename": "clip.mp4", "content_type": "video/mp4", "size": len(data),
+            "uploader_name": "TestGuest", "sha256": VOICE_SHA256,
+        })
+        assert resp.status_code == 201
+        upload_id = resp.json()["id"]
+        resp = requests.patch(f"{BASE_URL}/api/guest/uploads/{upload_id}", data=data,
+                              headers={**CHUNK_HEADERS, "Upload-Offset": "0"})
+        assert resp.status_code == 204
+        resp = requests.post(f"{BASE_URL}/api/guest/uploads/{upload_id}/finalize")
+        assert resp.status_code == 400
+        assert requests.head(f"{BASE_URL}/api/guest/uploads/{upload_id}").status_code == 404
+
+    def test_matching_hash_accepted(self, event):
+        data = os.urandom(2048)
+        sha256 = hashlib.sha256(data).hexdigest().upper()
+        resp = post_upload(event["slug"], "voice.mp3", data, "audio/mpeg", sha256=sha256)
+        assert resp.status_code == 200
+        assert resp.json()["deduplicated"] is False
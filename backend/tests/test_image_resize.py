@@ -0,0 +1,76 @@
+"""
+Test on-demand image resizing on the file endpoint (?w=&fmt=, Accept, DPR, Save-Data)
+"""
+import io
+import pytest
+import requests
+import os
+from PIL import Image
+
+from conftest import make_jpeg
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+EVENT = {"title": "TEST_Resize Event"}
+
+
+@pytest.fixture(scope="module")
+def photo_url(admin_headers, event):
+    files = {"file": ("resize.jpg", io.BytesIO(make_jpeg()), "image/jpeg")}
+    resp = requests.post(f"{BASE_URL}/api/guest/event/{event['slug']}/upload", files=files, data={"uploader_name": "TestGuest"})
+    assert resp.status_code == 200
+    media_id = resp.json()["id"]
+    listing = requests.get(f"{BASE_URL}/api/events/{event['id']}/media", headers=admin_headers).json()
+    return f"{BASE_URL}{next(m['url'] for m in listing if m['id'] == media_id)}"
+
+
+def image_size(content: bytes) -> tuple:
+    with Image.open(io.BytesIO(content)) as img:
+        return img.size
+
+
+class TestImageResize:
+    """?w= returns a resized rendition in the negotiated format"""
+
+    def test_original_without_params(self, photo_url):
+        resp = requests.get(photo_url)
+        assert resp.status_code == 200
+        assert image_size(resp.content) == (2400, 1600)
+
+    def test_width_and_webp(self, photo_url):
+        resp = requests.get(f"{photo_url}?w=640&fmt=auto", headers={"Accept": "image/webp,*/*"})
+        assert resp.status_code == 200
+        assert resp.headers["content-type"] == "image/webp"
+        assert image_size(resp.content) == (640, 427)
+        assert "Accept" in resp.headers["vary"]
+
+    def test_jpeg_without_accept(self, photo_url):
+        resp = requests.get(f"{photo_url}?w=640", headers={"Accept": "*/*"})
+        assert resp.headers["content-type"] == "image/jpeg"
+
+    def test_avif(self, photo_url):
+        resp = requests.get(f"{photo_url}?w=640", headers={"Accept": "image/avif,image/webp,*/*"})
+        assert resp.headers["content-type"] in ("image/avif", "image/webp")
+
+    def test_dpr_doubles_pixels(self, photo_url):
+        resp = requests.get(f"{photo_url}?w=320&fmt=jpeg", headers={"DPR": "2"})
+        assert image_size(resp.content)[0] == 640
+
+    def test_save_data_ignores_dpr(self, photo_url):
+        resp = requests.get(f"{photo_url}?w=320&fmt=jpeg", headers={"DPR": "2", "Save-Data": "on"})
+        assert image_size(resp.content)[0] == 320
+
+    def test_never_upscales(self, photo_url):
+        resp = requests.get(f"{photo_url}?w=4000&fmt=jpeg")
+        assert image_size(resp.content) == (2400, 1600)
+
+    def test_repeat_is_identical(self, photo_url):
+        first = requests.get(f"{photo_url}?w=800&fmt=webp")
+        second = requests.get(f"{photo_url}?w=800&fmt=webp")
+        assert first.content == second.content
+
+    def test_bad_format_rejected(self, photo_url):
+        assert requests.get(f"{photo_url}?w=640&fmt=gif").status_code == 422
+
+    def test_missing_file(self, event):
+        resp = requests.get(f"{BASE_URL}/api/files/{event['id']}/nope.jpg?w=640")
+        assert resp.status_code == 404
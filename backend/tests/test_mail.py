@@ -0,0 +1,306 @@
+"""
+Test email templates, SMTP connection reuse and outbox delivery against a local aiosmtpd server
+"""
+import asyncio
+import socket
+from datetime import datetime, timedelta, timezone
+from email import message_from_bytes
+
+import aiosmtplib
+import pytest
+from aiosmtpd.controller import Controller
+from aiosmtpd.smtp import AuthResult, LoginPassword
+
+import mail
+from mail import Outbox, SMTPPool, SettingsCache, build_message, render
+
+USER, PASSWORD = "mark@example.com", "secret"
+
+
+class Inbox:
+    def __init__(self):
+        self.messages = []
+        self.peers = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(message_from_bytes(envelope.content))
+        self.peers.append(session.peer)
+        return "250 OK"
+
+
+def authenticate(server, session, envelope, mechanism, auth_data):
+    ok = isinstance(auth_data, LoginPassword) and (auth_data.login, auth_data.password) == (USER.encode(), PASSWORD.encode())
+    # handled=False lets the server send the 535 reply for a failed login
+    return AuthResult(success=ok, handled=False)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server():
+    inbox = Inbox()
+    controller = Controller(inbox, hostname="127.0.0.1", port=free_port(),
+                            authenticator=authenticate, auth_require_tls=False)
+    controller.start()
+    yield controller, inbox
+    controller.stop()
+
+
+def smtp_settings(controller, **overrides):
+    return {"type": "smtp", "smtp_host": "127.0.0.1", "smtp_port": controller.port, "smtp_security": "none",
+            "smtp_user": USER, "smtp_password": PASSWORD, **overrides}
+
+
+def message(n=0):
+    return build_message(USER, "guest@example.com", f"Message {n}", f"<p>{n}</p>")
+
+
+class FakeSettings:
+    def __init__(self, doc):
+        self.doc = doc
+        self.reads = 0
+
+    async def find_one(self, query):
+        self.reads += 1
+        return self.doc
+
+
+class FakeQueue:
+    """The JobQueue calls the outbox makes, with the same lease rules, in memory"""
+
+    def __init__(self, max_attempts=6, visibility_timeout=120):
+        self.jobs = []
+        self.max_attempts = max_attempts
+        self.visibility_timeout = timedelta(seconds=visibility_timeout)
+
+    async def enqueue(self, kind, payload):
+        self.jobs.append({"_id": len(self.jobs), "kind": kind, "payload": payload, "status": "queued",
+                          "attempts": 0, "max_attempts": self.max_attempts, "lease_until": None})
+        return len(self.jobs)
+
+    async def claim(self, worker_id, kinds):
+        now = datetime.now(timezone.utc)
+        for job in self.jobs:
+            leased = job["status"] == "running" and job["lease_until"] >= now
+            if job["kind"] in kinds and job["status"] in ("queued", "running") and not leased \
+                    and job["attempts"] < job["max_attempts"]:
+                job.update(status="running", worker_id=worker_id, lease_until=now + self.visibility_timeout,
+                           attempts=job["attempts"] + 1)
+                return dict(job)
+        return None
+
+    async def expired(self, limit=100):
+        now = datetime.now(timezone.utc)
+        return [dict(job) for job in self.jobs if job["status"] == "running" and job["lease_until"] < now
+                and job["attempts"] >= job["max_attempts"]][:limit]
+
+    async def mark_failed(self, job, error):
+        stored = self.jobs[job["_id"]]
+        if stored["status"] == "running" and stored["lease_until"] == job["lease_until"]:
+            stored.update(status="failed", error=error, lease_until=None)
+
+
+class TestTemplates:
+    """Templates are compiled once and escape what they are given"""
+
+    def test_qr_card(self):
+        html = render("qr_card", organizer_name="Sam & Alex", event_title="<Our Day>", qr_template_name="Floral",
+                      size_label='10" x 8"', deadline="20 September 2026")
+        assert "Thank You, Sam &amp; Alex!" in html
+        assert "&lt;Our Day&gt;" in html and "<Our Day>" not in html
+        assert "(until 20 September 2026)" in html
+        assert "Weddings By Mark" in html
+
+    def test_qr_card_without_deadline(self):
+        html = render("qr_card", organizer_name="Sam", event_title="Party", qr_template_name="Floral",
+                      size_label='8" x 6"', deadline="")
+        assert "until" not in html
+
+    def test_password_reset(self):
+        html = render("password_reset", name="Sam", reset_url="https://snapvault.uk/reset-password?token=a.b.c")
+        assert 'href="https://snapvault.uk/reset-password?token=a.b.c"' in html
+
+    def test_compiled_at_import(self):
+        assert set(mail.TEMPLATES) == {"qr_card", "password_reset", "smtp_test"}
+
+
+class TestSettingsCache:
+    """Settings are read once per TTL and again straight after invalidate()"""
+
+    def test_cached_until_invalidated(self):
+        collection = FakeSettings({"type": "smtp", "smtp_password": "x"})
+        cache = SettingsCache(collection, ttl=60)
+
+        async def run():
+            for _ in range(3):
+                assert mail.is_configured(await cache.get())
+            cache.invalidate()
+            await cache.get()
+
+        asyncio.run(run())
+        assert collection.reads == 2
+
+    def test_not_configured(self):
+        assert not mail.is_configured(None)
+        assert not mail.is_configured({"type": "smtp", "smtp_password": ""})
+
+    def test_connection_options(self):
+        assert mail.connection_options({"smtp_host": "h", "smtp_port": 465})["use_tls"] is True
+        assert mail.connection_options({"smtp_host": "h", "smtp_port": "587"})["start_tls"] is True
+        opts = mail.connection_options({"smtp_host": "h", "smtp_port": 25, "smtp_security": "none"})
+        assert (opts["use_tls"], opts["start_tls"]) == (False, False)
+
+
+class TestPool:
+    """One authenticated connection carries many messages and is replaced when it can't"""
+
+    def test_connection_reused(self, smtp_server):
+        controller, inbox = smtp_server
+        pool = SMTPPool(size=1, timeout=5)
+
+        async def run():
+            for n in range(3):
+                await pool.send(smtp_settings(controller), message(n))
+            await pool.close()
+
+        asyncio.run(run())
+        assert [m["Subject"] for m in inbox.messages] == ["Message 0", "Message 1", "Message 2"]
+        assert pool.connections == 1
+        assert len(set(inbox.peers)) == 1
+
+    def test_concurrent_sends(self, smtp_server):
+        controller, inbox = smtp_server
+        pool = SMTPPool(size=2, timeout=5)
+
+        async def run():
+            await asyncio.gather(*(pool.send(smtp_settings(controller), message(n)) for n in range(6)))
+            await pool.close()
+
+        asyncio.run(run())
+        assert len(inbox.messages) == 6
+        assert pool.connections <= 2
+
+    def test_settings_change_drops_old_connection(self, smtp_server):
+        controller, inbox = smtp_server
+        pool = SMTPPool(size=1, timeout=5)
+        old = []
+
+        async def run():
+            await pool.send(smtp_settings(controller), message(0))
+            old.extend(client for client, _key, _last_used in pool.idle)
+            await pool.send(smtp_settings(controller, smtp_password="wrong"), message(1))
+
+        with pytest.raises(aiosmtplib.SMTPAuthenticationError):
+            asyncio.run(run())
+        [client] = old
+        assert not client.is_connected
+        assert pool.connections == 1 and pool.idle == []
+        assert len(inbox.messages) == 1
+
+    def test_server_restart(self):
+        inbox, port = Inbox(), free_port()
+        first = Controller(inbox, hostname="127.0.0.1", port=port, authenticator=authenticate, auth_require_tls=False)
+        second = Controller(inbox, hostname="127.0.0.1", port=port, authenticator=authenticate, auth_require_tls=False)
+        pool = SMTPPool(size=1, timeout=5)
+
+        async def run():
+            await pool.send(smtp_settings(first), message(0))
+            await asyncio.to_thread(first.stop)
+            await asyncio.to_thread(second.start)
+            await pool.send(smtp_settings(second), message(1))
+            await pool.close()
+
+        first.start()
+        try:
+            asyncio.run(run())
+        finally:
+            second.stop()
+        assert len(inbox.messages) == 2
+        assert pool.connections == 2
+
+    def test_idle_connection_replaced(self, smtp_server):
+        controller, inbox = smtp_server
+        pool = SMTPPool(size=1, timeout=5, idle_timeout=0)
+
+        async def run():
+            for n in range(2):
+                await pool.send(smtp_settings(controller), message(n))
+            await pool.close()
+
+        asyncio.run(run())
+        assert pool.connections == 2
+
+
+class TestOutbox:
+    """Queued messages are delivered with their attachments; enqueueing wakes the sender"""
+
+    def test_deliver(self, smtp_server):
+        controller, inbox = smtp_server
+        outbox = Outbox(FakeQueue(), SettingsCache(FakeSettings(smtp_settings(controller))), SMTPPool())
+
+        async def run():
+            await outbox.enqueue("organiser@example.com", "Your QR card", "<p>Attached</p>", [
+                {"filename": "Party_QR_Card.png", "subtype": "png", "content": b"\x89PNG fake"},
+            ])
+            job = await outbox.next_message("test", 0)
+            await outbox.deliver(job)
+            await outbox.pool.close()
+
+        asyncio.run(run())
+        [msg] = inbox.messages
+        assert (msg["From"], msg["To"], msg["Subject"]) == (USER, "organiser@example.com", "Your QR card")
+        html, attachment = msg.get_payload()
+        assert "Attached" in html.get_payload(decode=True).decode()
+        assert attachment.get_filename() == "Party_QR_Card.png"
+        assert attachment.get_payload(decode=True) == b"\x89PNG fake"
+
+    def test_not_configured(self):
+        outbox = Outbox(FakeQueue(), SettingsCache(FakeSettings(None)), SMTPPool())
+        with pytest.raises(RuntimeError):
+            asyncio.run(outbox.send_now("a@example.com", "Hi", "<p>Hi</p>"))
+
+    def test_enqueue_wakes_sender(self):
+        outbox = Outbox(FakeQueue(), SettingsCache(FakeSettings(None)), SMTPPool())
+
+        async def run():
+            waiting = asyncio.create_task(outbox.next_message("test", 30))
+            await asyncio.sleep(0.05)
+            await outbox.enqueue("a@example.com", "Hi", "<p>Hi</p>")
+            await asyncio.wait_for(waiting, 1)
+            return await outbox.next_message("test", 0)
+
+        job = asyncio.run(run())
+        assert job["payload"]["to"] == "a@example.com"
+
+    def test_expired_last_attempt_fails(self):
+        queue = FakeQueue(max_attempts=1, visibility_timeout=0)
+        outbox = Outbox(queue, SettingsCache(FakeSettings(None)), SMTPPool())
+
+        async def run():
+            await outbox.enqueue("a@example.com", "Hi", "<p>Hi</p>")
+            assert await outbox.next_message("dies-mid-send", 0)
+            await asyncio.sleep(0.01)
+            assert await outbox.next_message("other", 0) is None
+            return await outbox.fail_expired()
+
+        assert asyncio.run(run()) == 1
+        [job] = queue.jobs
+        assert (job["status"], job["error"]) == ("failed", "sender lease expired")
+        assert asyncio.run(outbox.fail_expired()) == 0
+
+    def test_expired_with_attempts_left_is_retried(self):
+        queue = FakeQueue(max_attempts=2, visibility_timeout=0)
+        outbox = Outbox(queue, SettingsCache(FakeSettings(None)), SMTPPool())
+
+        async def run():
+            await outbox.enqueue("a@example.com", "Hi", "<p>Hi</p>")
+            await outbox.next_message("dies-mid-send", 0)
+            await asyncio.sleep(0.01)
+            assert await outbox.fail_expired() == 0
+            return await outbox.next_message("other", 0)
+
+        assert asyncio.run(run())["attempts"] == 2
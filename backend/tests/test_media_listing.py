@@ -0,0 +1,72 @@
+"""
+Test keyset pagination and NDJSON streaming of GET /api/events/{id}/media
+"""
+import json
+import pytest
+import requests
+import os
+
+from conftest import JPEG_BYTES, upload
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+EVENT = {"title": "TEST_Media Listing"}
+
+UPLOADS = 3
+
+
+@pytest.fixture(scope="module")
+def event_id(event):
+    for i in range(UPLOADS):
+        upload(event["slug"], f"listing{i}.jpg", JPEG_BYTES)
+    return event["id"]
+
+
+class TestMediaPagination:
+    """Cursor pages cover the gallery exactly once"""
+
+    def test_pages_of_one(self, admin_headers, event_id):
+        seen = []
+        cursor = None
+        while True:
+            params = {"limit": 1, **({"cursor": cursor} if cursor else {})}
+            resp = requests.get(f"{BASE_URL}/api/events/{event_id}/media", headers=admin_headers, params=params)
+            assert resp.status_code == 200
+            page = resp.json()
+            assert len(page) <= 1
+            seen.extend(m["id"] for m in page)
+            cursor = resp.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+        assert len(seen) == UPLOADS
+        assert len(set(seen)) == UPLOADS
+
+    def test_default_page_is_plain_list(self, admin_headers, event_id):
+        resp = requests.get(f"{BASE_URL}/api/events/{event_id}/media", headers=admin_headers)
+        assert resp.status_code == 200
+        assert len(resp.json()) == UPLOADS
+        assert "X-Next-Cursor" not in resp.headers
+
+
+class TestMediaNDJSON:
+    """application/x-ndjson streams one fmt_media row per line"""
+
+    def test_ndjson_stream(self, admin_headers, event_id):
+        headers = {**admin_headers, "Accept": "application/x-ndjson"}
+        resp = requests.get(f"{BASE_URL}/api/events/{event_id}/media", headers=headers, stream=True)
+        assert resp.status_code == 200
+        assert resp.headers["content-type"].startswith("application/x-ndjson")
+        rows = [json.loads(line) for line in resp.iter_lines() if line]
+        assert len(rows) == UPLOADS
+        created = [r["created_at"] for r in rows]
+        assert created == sorted(created, reverse=True)
+        for r in rows:
+            assert r["url"] == f"/api/files/{event_id}/{r['filename']}"
+
+    def test_ndjson_respects_limit(self, admin_headers, event_id):
+        headers = {**admin_headers, "Accept": "application/x-ndjson"}
+        resp = requests.get(f"{BASE_URL}/api/events/{event_id}/media", headers=headers, params={"limit": 2})
+        assert len([line for line in resp.text.splitlines() if line]) == 2
+
+    def test_ndjson_requires_auth(self, event_id):
+        resp = requests.get(f"{BASE_URL}/api/events/{event_id}/media", headers={"Accept": "application/x-ndjson"})
+        assert resp.status_code in [401, 403]
@@ -0,0 +1,42 @@
+"""
+Test background media processing status (video compression runs in worker.py)
+"""
+import requests
+import os
+
+from conftest import JPEG_BYTES, upload
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+EVENT = {"title": "TEST_Processing Event"}
+
+
+class TestMediaProcessing:
+    """Uploads return at once; slow work is tracked through the processing endpoint"""
+
+    def test_image_upload_is_ready_immediately(self, event):
+        data = upload(event["slug"], "processing.jpg", JPEG_BYTES)
+        assert data["processing_status"] == "ready"
+
+    def test_processing_endpoint_reports_ready(self, admin_headers, event):
+        media_id = upload(event["slug"], "processing.jpg", JPEG_BYTES)["id"]
+        resp = requests.get(f"{BASE_URL}/api/media/{media_id}/processing", headers=admin_headers)
+        assert resp.status_code == 200
+        data = resp.json()
+        assert data["processing_status"] == "ready"
+        assert data["progress"] == 1.0
+        assert data["error"] is None
+
+    def test_listing_includes_processing_status(self, admin_headers, event):
+        upload(event["slug"], "processing.jpg", JPEG_BYTES)
+        resp = requests.get(f"{BASE_URL}/api/events/{event['id']}/media", headers=admin_headers)
+        assert resp.status_code == 200
+        assert all("processing_status" in m for m in resp.json())
+
+    def test_processing_requires_auth(self, event):
+        media_id = upload(event["slug"], "processing.jpg", JPEG_BYTES)["id"]
+        resp = requests.get(f"{BASE_URL}/api/media/{media_id}/processing")
+        assert resp.status_code in (401, 403)
+
+    def test_processing_unknown_media(self, admin_headers):
+        resp = requests.get(f"{BASE_URL}/api/media/000000000000000000000000/processing", headers=admin_headers)
+        assert resp.status_code == 404
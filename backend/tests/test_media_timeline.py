@@ -0,0 +1,99 @@
+"""
+Test capture-time metadata on uploads and the taken_at timeline listing
+"""
+import io
+import os
+
+import pytest
+import requests
+from PIL import Image
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+EVENT = {"title": "TEST_Timeline Event"}
+
+# Uploaded in this order; taken in a different one
+PHOTOS = [
+    ("cake.jpg", "2026:06:20 21:15:00"),
+    ("ceremony.jpg", "2026:06:20 14:00:00"),
+    ("first-dance.jpg", "2026:06:20 20:30:00"),
+    ("brunch.jpg", "2026:06:21 10:00:00"),
+]
+
+
+def photo(taken, seed):
+    exif = Image.Exif()
+    exif[271], exif[272] = "Canon", "Canon EOS R6"
+    exif.get_ifd(0x8769)[36867] = taken
+    buf = io.BytesIO()
+    Image.new("RGB", (64, 48), (seed * 40 % 256, 80, 120)).save(buf, "JPEG", exif=exif)
+    return buf.getvalue()
+
+
+@pytest.fixture(scope="module")
+def event(event):
+    for i, (name, taken) in enumerate(PHOTOS):
+        resp = requests.post(f"{BASE_URL}/api/guest/event/{event['slug']}/upload",
+                             files={"file": (name, photo(taken, i), "image/jpeg")}, data={"uploader_name": "TestGuest"})
+        assert resp.status_code == 200
+    requests.post(f"{BASE_URL}/api/guest/event/{event['slug']}/upload",
+                  files={"file": ("toast.mp3", os.urandom(1024), "audio/mpeg")}, data={"uploader_name": "TestGuest"})
+    return event
+
+
+def names(admin_headers, event_id, **params):
+    resp = requests.get(f"{BASE_URL}/api/events/{event_id}/media", headers=admin_headers, params=params)
+    assert resp.status_code == 200, resp.text
+    return [m["original_name"] for m in resp.json()]
+
+
+class TestMetadata:
+    """EXIF is read at upload and returned with the media"""
+
+    def test_photo_metadata(self, admin_headers, event):
+        resp = requests.get(f"{BASE_URL}/api/events/{event['id']}/media", headers=admin_headers)
+        m = next(m for m in resp.json() if m["original_name"] == "ceremony.jpg")
+        assert m["taken_at"] == "2026-06-20T14:00:00+00:00"
+        assert m["metadata"]["camera"] == "Canon EOS R6"
+        assert (m["metadata"]["width"], m["metadata"]["height"]) == (64, 48)
+
+    def test_no_metadata_falls_back_to_upload_time(self, admin_headers, event):
+        resp = requests.get(f"{BASE_URL}/api/events/{event['id']}/media", headers=admin_headers)
+        m = next(m for m in resp.json() if m["original_name"] == "toast.mp3")
+        assert m["taken_at"] == m["created_at"]
+
+
+class TestTimeline:
+    """sort=taken_at orders by capture time; taken_from/taken_to select a range"""
+
+    def test_as_it_happened(self, admin_headers, event):
+        assert names(admin_headers, event["id"], sort="taken_at", order="asc")[:4] == [
+            "ceremony.jpg", "first-dance.jpg", "cake.jpg", "brunch.jpg"
+        ]
+
+    def test_upload_order_unchanged(self, admin_headers, event):
+        assert names(admin_headers, event["id"])[1:] == ["brunch.jpg", "first-dance.jpg", "ceremony.jpg", "cake.jpg"]
+
+    def test_date_range(self, admin_headers, event):
+        assert names(admin_headers, event["id"], sort="taken_at", order="asc",
+                     taken_from="2026-06-20T20:00:00Z", taken_to="2026-06-21") == ["first-dance.jpg", "cake.jpg"]
+
+    def test_pages_follow_the_timeline(self, admin_headers, event):
+        seen, cursor = [], None
+        while True:
+            params = {"sort": "taken_at", "order": "asc", "limit": 2, **({"cursor": cursor} if cursor else {})}
+            resp = requests.get(f"{BASE_URL}/api/events/{event['id']}/media", headers=admin_headers, params=params)
+            seen += [m["original_name"] for m in resp.json()]
+            cursor = resp.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+        assert seen == names(admin_headers, event["id"], sort="taken_at", order="asc")
+
+    def test_bad_date(self, admin_headers, event):
+        resp = requests.get(f"{BASE_URL}/api/events/{event['id']}/media", headers=admin_headers,
+                            params={"sort": "taken_at", "taken_from": "last tuesday"})
+        assert resp.status_code == 400
+
+    def test_bad_sort(self, admin_headers, event):
+        resp = requests.get(f"{BASE_URL}/api/events/{event['id']}/media", headers=admin_headers,
+                            params={"sort": "original_name"})
+        assert resp.status_code == 422
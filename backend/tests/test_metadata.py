@@ -0,0 +1,100 @@
+"""
+Test capture-time metadata extraction from EXIF and ffprobe container tags
+"""
+import io
+from datetime import timedelta, timezone
+
+from PIL import Image
+
+from metadata import image_metadata, image_file_metadata, video_metadata, parse_exif_datetime, camera_name, EXIF_IFD
+
+
+def photo_bytes(size=(640, 480), taken=None, offset=None, make=None, model=None, orientation=None):
+    exif = Image.Exif()
+    if make:
+        exif[271] = make
+    if model:
+        exif[272] = model
+    if orientation:
+        exif[274] = orientation
+    ifd = exif.get_ifd(EXIF_IFD)
+    if taken:
+        ifd[36867] = taken
+    if offset:
+        ifd[36881] = offset
+    buf = io.BytesIO()
+    Image.new("RGB", size, (10, 20, 30)).save(buf, "JPEG", exif=exif)
+    return buf.getvalue()
+
+
+class TestImageMetadata:
+    """EXIF capture time, size, orientation and camera, from the head of the file"""
+
+    def test_full_exif(self):
+        data = photo_bytes(taken="2026:06:20 18:30:05", offset="+01:00", make="Canon",
+                           model="Canon EOS R6", orientation=6)
+        assert image_metadata(data) == {
+            "width": 640, "height": 480, "orientation": 6, "camera": "Canon EOS R6",
+            "captured_at": "2026-06-20T17:30:05+00:00",
+        }
+
+    def test_truncated_head_is_enough(self):
+        data = photo_bytes(size=(2000, 1500), taken="2026:06:20 18:30:05")
+        assert image_metadata(data[:1024])["captured_at"] == "2026-06-20T18:30:05+00:00"
+
+    def test_no_offset_uses_default_zone(self):
+        data = photo_bytes(taken="2026:06:20 18:30:05")
+        assert image_metadata(data, timezone(timedelta(hours=2)))["captured_at"] == "2026-06-20T16:30:05+00:00"
+
+    def test_no_exif(self):
+        assert image_metadata(photo_bytes()) == {"width": 640, "height": 480, "orientation": 1}
+
+    def test_not_an_image(self):
+        assert image_metadata(b"\x00" * 100) == {}
+
+    def test_from_file(self, tmp_path):
+        (tmp_path / "a.jpg").write_bytes(photo_bytes(taken="2026:01:02 03:04:05"))
+        assert image_file_metadata(tmp_path / "a.jpg")["captured_at"] == "2026-01-02T03:04:05+00:00"
+
+
+class TestParsing:
+    """Unset clocks and junk values are ignored"""
+
+    def test_unset_clock(self):
+        assert parse_exif_datetime("0000:00:00 00:00:00") is None
+        assert parse_exif_datetime("1970:01:01 00:00:00") is None
+
+    def test_junk(self):
+        assert parse_exif_datetime("yesterday") is None
+        assert parse_exif_datetime(None) is None
+        assert parse_exif_datetime("2026:06:20 18:30:05", offset="bogus!") == "2026-06-20T18:30:05+00:00"
+
+    def test_camera_name(self):
+        assert camera_name("Apple", "iPhone 15 Pro") == "Apple iPhone 15 Pro"
+        assert camera_name("Canon", "Canon EOS R6") == "Canon EOS R6"
+        assert camera_name(b"Sony\x00", None) == "Sony"
+        assert camera_name(None, None) is None
+
+
+class TestVideoMetadata:
+    """Container creation time (Apple's local-offset tag preferred), display size and camera"""
+
+    def test_iphone(self):
+        data = {"format": {"tags": {
+            "creation_time": "2026-06-20T17:30:05.000000Z",
+            "com.apple.quicktime.creationdate": "2026-06-20T18:30:05+0100",
+            "com.apple.quicktime.make": "Apple",
+            "com.apple.quicktime.model": "iPhone 15",
+        }}}
+        probe = {"width": 1920, "height": 1080, "rotation": 90, "duration": 12.5}
+        assert video_metadata(data, probe) == {
+            "width": 1080, "height": 1920, "duration": 12.5, "camera": "Apple iPhone 15",
+            "captured_at": "2026-06-20T17:30:05+00:00",
+        }
+
+    def test_untagged(self):
+        assert video_metadata({"format": {}}, {"duration": 3.0}) == {"duration": 3.0}
+
+    def test_epoch_creation_time(self):
+        data = {"format": {"tags": {"creation_time": "1904-01-01T00:00:00.000000Z"}}}
+        assert "captured_at" not in video_metadata(data, {})
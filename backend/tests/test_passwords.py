@@ -0,0 +1,71 @@
+"""
+Test off-loop password hashing: admission limit, rehash on cost change and cost calibration
+"""
+import asyncio
+
+import pytest
+
+from passwords import PasswordHasher, PasswordBusy, calibrate_rounds
+
+# bcrypt's minimum cost, so the tests stay fast
+ROUNDS = 4
+
+
+class TestHashing:
+    """Hashes verify on the pool; weaker stored hashes are upgraded"""
+
+    def test_round_trip(self):
+        hasher = PasswordHasher(workers=1, max_pending=1, rounds=ROUNDS)
+
+        async def run():
+            hashed = await hasher.hash("hunter22")
+            return hashed, await hasher.verify("hunter22", hashed), await hasher.verify("wrong", hashed)
+
+        hashed, good, bad = asyncio.run(run())
+        assert hashed.startswith("$2b$04$")
+        assert (good, bad) == (True, False)
+        assert asyncio.run(hasher.verify("hunter22", None)) is False
+        assert hasher.in_flight == 0
+
+    def test_rehash_when_cost_goes_up(self):
+        hasher = PasswordHasher(workers=1, max_pending=1, rounds=ROUNDS)
+        old = asyncio.run(hasher.hash("hunter22"))
+        assert asyncio.run(hasher.verify_and_update("hunter22", old)) == (True, None)
+
+        hasher.set_rounds(ROUNDS + 1)
+        valid, new_hash = asyncio.run(hasher.verify_and_update("hunter22", old))
+        assert valid and new_hash.startswith("$2b$05$")
+        assert asyncio.run(hasher.verify_and_update("wrong", old)) == (False, None)
+
+    def test_higher_cost_left_alone(self):
+        hasher = PasswordHasher(workers=1, max_pending=1, rounds=ROUNDS + 1)
+        stronger = asyncio.run(hasher.hash("hunter22"))
+        hasher.set_rounds(ROUNDS)
+        assert asyncio.run(hasher.verify_and_update("hunter22", stronger)) == (True, None)
+
+
+class TestAdmission:
+    """Calls past workers + max_pending are refused instead of queued"""
+
+    def test_saturated(self):
+        hasher = PasswordHasher(workers=1, max_pending=1, rounds=ROUNDS)
+
+        async def run():
+            return await asyncio.gather(*(hasher.hash(f"pw{i}") for i in range(3)), return_exceptions=True)
+
+        results = asyncio.run(run())
+        assert [isinstance(r, PasswordBusy) for r in results] == [False, False, True]
+        assert hasher.in_flight == 0
+        assert asyncio.run(hasher.hash("again")).startswith("$2b$")
+
+
+class TestCalibration:
+    """The chosen cost stays within bounds and grows with the time budget"""
+
+    def test_bounds(self):
+        assert calibrate_rounds(0, low=ROUNDS, high=8) == ROUNDS
+        assert calibrate_rounds(1000, low=ROUNDS, high=6) == 6
+
+    @pytest.mark.parametrize("target", [0.01, 0.1, 0.5])
+    def test_within_range(self, target):
+        assert ROUNDS <= calibrate_rounds(target, low=ROUNDS, high=10) <= 10
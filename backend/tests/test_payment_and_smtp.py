@@ -167,9 +167,9 @@ class TestPaymentConfirmation:
         
         assert result["is_paid"] == True
         assert result["message"] == "Payment confirmed"
-        # email_sent can be True or False depending on SMTP config
-        assert "email_sent" in result
-        print(f"✓ Payment confirmed: is_paid={result['is_paid']}, email_sent={result['email_sent']}")
+        # email_queued can be True or False depending on SMTP config
+        assert "email_queued" in result
+        print(f"✓ Payment confirmed: is_paid={result['is_paid']}, email_queued={result['email_queued']}")
         
         # Verify event is now marked as paid
         get_response = requests.get(f"{BASE_URL}/api/events/{event_id}", headers=headers)
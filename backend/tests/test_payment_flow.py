@@ -269,6 +269,16 @@ class TestAdminApprovePayment:
         
         assert data.get("is_paid") == True, f"Expected is_paid=True, got {data.get('is_paid')}"
         print(f"✓ Admin approve sets is_paid=True")
+
+        # The QR card email goes through the outbox; its delivery state is on the admin API
+        email_resp = admin_session.get(f"{BASE_URL}/api/admin/events/{event_id}/qr-email")
+        if data.get("email_queued"):
+            assert email_resp.status_code == 200
+            assert email_resp.json()["id"] == data["email_id"]
+            assert email_resp.json()["status"] in ("queued", "running", "done", "failed")
+        else:
+            assert data.get("email_id") is None
+            assert email_resp.status_code == 404
         
         # Verify by GET
         get_response = organizer_session.get(f"{BASE_URL}/api/events/{event_id}")
@@ -0,0 +1,48 @@
+"""
+Test the organiser's QR card preview: one cached server render, revalidated by ETag
+"""
+import os
+
+import requests
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+EVENT = {"title": "TEST_QR Preview Event", "subtitle": "20 June 2026"}
+
+GUEST_URL = "https://snapvault.uk/e/preview-test"
+
+
+def preview(headers, event_id, **params):
+    return requests.get(f"{BASE_URL}/api/events/{event_id}/qr-card", headers=headers,
+                        params={"template": "modern_minimal", "size": "8x6", "guest_url": GUEST_URL, **params})
+
+
+class TestPreview:
+    """The card is rendered once and then served from cache, with an ETag per card content"""
+
+    def test_png(self, admin_headers, event):
+        resp = preview(admin_headers, event["id"])
+        assert resp.status_code == 200
+        assert resp.headers["content-type"] == "image/png"
+        assert resp.content[:8] == b"\x89PNG\r\n\x1a\n"
+        assert resp.headers["ETag"]
+
+    def test_not_modified(self, admin_headers, event):
+        etag = preview(admin_headers, event["id"]).headers["ETag"]
+        resp = preview({**admin_headers, "If-None-Match": etag}, event["id"])
+        assert resp.status_code == 304
+
+    def test_etag_follows_content(self, admin_headers, event):
+        first = preview(admin_headers, event["id"]).headers["ETag"]
+        assert preview(admin_headers, event["id"], size="10x8").headers["ETag"] != first
+        requests.put(f"{BASE_URL}/api/events/{event['id']}", headers=admin_headers, json={"subtitle": "Changed"})
+        assert preview(admin_headers, event["id"]).headers["ETag"] != first
+
+    def test_defaults_need_a_submitted_card(self, admin_headers, event):
+        resp = requests.get(f"{BASE_URL}/api/events/{event['id']}/qr-card", headers=admin_headers)
+        assert resp.status_code == 400
+
+    def test_bad_size(self, admin_headers, event):
+        assert preview(admin_headers, event["id"], size="4x4").status_code == 422
+
+    def test_requires_owner(self, event):
+        assert preview({}, event["id"]).status_code == 401
@@ -0,0 +1,125 @@
+"""
+Test QR card rendering: prepared template assets, a QR code drawn without resampling, cache keys and PNG encoding
+"""
+import qrcode
+from PIL import Image
+
+import qrcards
+from qrcards import CardAssets, QR_CARD_SIZES, QR_CARD_TEMPLATES, qr_image, render_card
+
+URL = "https://snapvault.uk/e/abcd1234"
+
+
+class TestAssets:
+    """Backgrounds and fonts are prepared once per template and size"""
+
+    def test_preload_every_template_and_size(self):
+        assets = CardAssets()
+        count = sum(len(t) for t in QR_CARD_TEMPLATES.values()) * len(QR_CARD_SIZES)
+        assert assets.preload() == count
+        assert assets.preload() == count
+
+    def test_background_reused(self):
+        assets = CardAssets()
+        tmpl = QR_CARD_TEMPLATES["wedding"]["golden_elegance"]
+        first, has_bg_image = assets.background(tmpl, 960, 768)
+        assert has_bg_image and first.size == (960, 768)
+        assert assets.background(tmpl, 960, 768)[0] is first
+        assert assets.font("sans_reg", 30) is assets.font("sans_reg", 30)
+
+    def test_render_leaves_background_untouched(self):
+        assets = CardAssets()
+        tmpl = QR_CARD_TEMPLATES["corporate"]["clean_white"]
+        before = assets.background(tmpl, 768, 576)[0].tobytes()
+        render_card("corporate", "clean_white", "8x6", "Launch", "", URL, assets)
+        assert assets.background(tmpl, 768, 576)[0].tobytes() == before
+
+    def test_missing_background_image(self, tmp_path):
+        img, has_bg_image = CardAssets(tmp_path).background(QR_CARD_TEMPLATES["wedding"]["golden_elegance"], 960, 768)
+        assert not has_bg_image
+        assert img.getpixel((480, 384)) == qrcards.hex_to_rgb("#FDF8F3")
+
+
+class TestQRCode:
+    """Whole pixels per module, pure black and white"""
+
+    def test_integer_module_size(self):
+        qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_H, border=qrcards.QR_BORDER_MODULES)
+        qr.add_data(URL)
+        qr.make(fit=True)
+        modules = len(qr.get_matrix())
+        img = qr_image(URL, 291)
+        assert img.width == img.height
+        assert img.width % modules == 0 and 291 - modules < img.width <= 291
+
+    def test_never_resampled(self):
+        assert {c for _n, c in qr_image(URL, 291).getcolors()} == {(0, 0, 0), (255, 255, 255)}
+
+
+class TestRenderCard:
+    """Cards come out at the requested size for every template"""
+
+    def test_every_template(self):
+        for event_type, templates in QR_CARD_TEMPLATES.items():
+            for key in templates:
+                assert render_card(event_type, key, "8x6", "Party", "Saturday", URL).size == QR_CARD_SIZES["8x6"]
+
+    def test_legacy_and_unknown_keys(self):
+        assert render_card("wedding", "elegant_frame", "10x8", "Us", "", URL).size == (960, 768)
+        assert render_card("nope", "nope", "nope", "Us", "", URL).size == (960, 768)
+
+    def test_qr_is_crisp_on_card(self):
+        img = render_card("wedding", "golden_elegance", "10x8", "A very long wedding title " * 4, "", URL)
+        width, height = img.size
+        centre = img.crop((width // 2 - 40, height // 2 - 20, width // 2 + 40, height // 2 + 60))
+        assert {c for _n, c in centre.getcolors()} <= {(0, 0, 0), (255, 255, 255)}
+
+
+class TestCacheKey:
+    """The key changes with anything drawn on the card, and only with that"""
+
+    def key(self, **overrides):
+        args = {"event_type": "wedding", "template_key": "golden_elegance", "size_key": "10x8",
+                "event_title": "Us", "event_subtitle": "June", "guest_url": URL, **overrides}
+        return qrcards.cache_key(**args)
+
+    def test_stable(self):
+        assert self.key() == self.key()
+        assert self.key().endswith(".png")
+
+    def test_every_input_counts(self):
+        changed = [self.key(event_type="birthday"), self.key(template_key="botanical_garden"),
+                   self.key(size_key="8x6"), self.key(event_title="Them"), self.key(event_subtitle=""),
+                   self.key(guest_url=URL + "x")]
+        assert len({self.key(), *changed}) == len(changed) + 1
+
+    def test_aliases_share_a_render(self):
+        assert self.key(template_key="elegant_frame") == self.key()
+        assert self.key(event_subtitle=None) == self.key(event_subtitle="")
+
+
+class TestEncoding:
+    """PNG output is lossless; few-colour images become palette PNGs"""
+
+    def test_palette_when_lossless(self, tmp_path):
+        img = Image.new("RGB", (64, 64), (255, 255, 255))
+        img.paste((15, 39, 68), (0, 0, 32, 32))
+        qrcards.encode_png(img, tmp_path / "a.png")
+        with Image.open(tmp_path / "a.png") as out:
+            assert out.mode == "P"
+            assert out.convert("RGB").tobytes() == img.tobytes()
+
+    def test_photo_card_stays_rgb(self, tmp_path):
+        img = render_card("wedding", "golden_elegance", "8x6", "Us", "", URL)
+        qrcards.encode_png(img, tmp_path / "a.png")
+        with Image.open(tmp_path / "a.png") as out:
+            assert out.mode == "RGB"
+            assert out.tobytes() == img.tobytes()
+
+    def test_render_card_file(self, tmp_path):
+        dest = tmp_path / qrcards.cache_key("corporate", "clean_white", "8x6", "Launch", "", URL)
+        size = qrcards.render_card_file("corporate", "clean_white", "8x6", "Launch", "", URL, dest)
+        assert size == dest.stat().st_size
+        assert [p.name for p in tmp_path.iterdir()] == [dest.name]
+        with Image.open(dest) as out:
+            assert out.size == QR_CARD_SIZES["8x6"]
@@ -0,0 +1,119 @@
+"""
+Test byte-range requests on served media (video seeking): 206, multipart/byteranges, If-Range
+"""
+import io
+import pytest
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+EVENT = {"title": "TEST_Range Event"}
+
+VIDEO_SIZE = 12 * 1024 * 1024
+VIDEO_BYTES = os.urandom(VIDEO_SIZE)
+
+
+@pytest.fixture(scope="module")
+def video_url(admin_headers, event):
+    files = {"file": ("clip.mp4", io.BytesIO(VIDEO_BYTES), "video/mp4")}
+    resp = requests.post(f"{BASE_URL}/api/guest/event/{event['slug']}/upload", files=files, data={"uploader_name": "TestGuest"})
+    assert resp.status_code == 200
+    media_id = resp.json()["id"]
+    listing = requests.get(f"{BASE_URL}/api/events/{event['id']}/media", headers=admin_headers).json()
+    return f"{BASE_URL}{next(m['url'] for m in listing if m['id'] == media_id)}"
+
+
+def multipart_parts(content: bytes, boundary: str) -> list:
+    """(headers, body) per part of a multipart/byteranges body."""
+    chunks = content.split(f"--{boundary}".encode())
+    assert chunks[0] == b"" and chunks[-1] == b"--\r\n"
+    parts = []
+    for chunk in chunks[1:-1]:
+        headers, body = chunk[2:-2].split(b"\r\n\r\n", 1)  # drop the CRLFs around each part
+        parts.append((headers, body))
+    return parts
+
+
+def get_range(url, spec, **headers):
+    return requests.get(url, headers={"Range": f"bytes={spec}", **headers})
+
+
+class TestRangeRequests:
+    """Seeking into the middle of a large file fetches only the bytes asked for"""
+
+    def test_full_response_advertises_ranges(self, video_url):
+        resp = requests.get(video_url, stream=True)
+        assert resp.status_code == 200
+        assert resp.headers["accept-ranges"] == "bytes"
+        assert int(resp.headers["content-length"]) == VIDEO_SIZE
+        resp.close()
+
+    def test_seek_to_middle(self, video_url):
+        start = VIDEO_SIZE // 2 + 12345
+        resp = get_range(video_url, f"{start}-{start + 65535}")
+        assert resp.status_code == 206
+        assert resp.headers["content-range"] == f"bytes {start}-{start + 65535}/{VIDEO_SIZE}"
+        assert resp.content == VIDEO_BYTES[start:start + 65536]
+
+    def test_open_ended_from_middle(self, video_url):
+        start = VIDEO_SIZE - 3 * 1024 * 1024 + 7
+        resp = get_range(video_url, f"{start}-")
+        assert resp.status_code == 206
+        assert int(resp.headers["content-length"]) == VIDEO_SIZE - start
+        assert resp.content == VIDEO_BYTES[start:]
+
+    def test_suffix_range(self, video_url):
+        resp = get_range(video_url, "-1000")
+        assert resp.status_code == 206
+        assert resp.content == VIDEO_BYTES[-1000:]
+
+    def test_safari_probe(self, video_url):
+        resp = get_range(video_url, "0-1")
+        assert resp.status_code == 206
+        assert resp.headers["content-range"] == f"bytes 0-1/{VIDEO_SIZE}"
+        assert resp.content == VIDEO_BYTES[:2]
+
+    def test_end_past_size_is_clamped(self, video_url):
+        resp = get_range(video_url, f"{VIDEO_SIZE - 10}-{VIDEO_SIZE * 2}")
+        assert resp.status_code == 206
+        assert resp.content == VIDEO_BYTES[-10:]
+
+    def test_multiple_ranges(self, video_url):
+        mid = VIDEO_SIZE // 2
+        resp = get_range(video_url, f"0-99,{mid}-{mid + 99},-50")
+        assert resp.status_code == 206
+        content_type = resp.headers["content-type"]
+        assert content_type.startswith("multipart/byteranges; boundary=")
+        assert int(resp.headers["content-length"]) == len(resp.content)
+        parts = multipart_parts(resp.content, content_type.split("boundary=")[1])
+        bodies = [body for _headers, body in parts]
+        assert bodies == [VIDEO_BYTES[:100], VIDEO_BYTES[mid:mid + 100], VIDEO_BYTES[-50:]]
+        assert f"Content-Range: bytes {mid}-{mid + 99}/{VIDEO_SIZE}".encode() in parts[1][0]
+
+    def test_overlapping_ranges_are_merged(self, video_url):
+        resp = get_range(video_url, "100-199,150-299")
+        assert resp.status_code == 206
+        assert resp.headers["content-range"] == f"bytes 100-299/{VIDEO_SIZE}"
+        assert resp.content == VIDEO_BYTES[100:300]
+
+    def test_if_range_matching_etag(self, video_url):
+        etag = get_range(video_url, "0-0").headers["etag"]
+        resp = get_range(video_url, "1000-1999", **{"If-Range": etag})
+        assert resp.status_code == 206
+        assert resp.content == VIDEO_BYTES[1000:2000]
+
+    def test_if_range_stale_etag_gets_whole_file(self, video_url):
+        resp = requests.get(video_url, headers={"Range": "bytes=1000-1999", "If-Range": '"stale-1"'}, stream=True)
+        assert resp.status_code == 200
+        assert int(resp.headers["content-length"]) == VIDEO_SIZE
+        resp.close()
+
+    def test_unsatisfiable(self, video_url):
+        resp = get_range(video_url, f"{VIDEO_SIZE}-")
+        assert resp.status_code == 416
+        assert resp.headers["content-range"] == f"bytes */{VIDEO_SIZE}"
+
+    def test_malformed_range_is_ignored(self, video_url):
+        resp = requests.get(video_url, headers={"Range": "items=0-10"}, stream=True)
+        assert resp.status_code == 200
+        resp.close()
@@ -0,0 +1,125 @@
+"""
+Test format negotiation, client-hint sizing and the rendition LRU used by ?w= resizing
+"""
+import asyncio
+
+import resizer
+from resizer import RenditionCache, negotiate_format, target_width, parse_dpr
+
+
+def fake_render(calls, size=100, delay=0.0):
+    async def render(dest):
+        calls.append(dest)
+        await asyncio.sleep(delay)
+        dest.write_bytes(b"x" * size)
+        return size
+    return render
+
+
+class TestNegotiation:
+    """fmt=auto follows Accept; explicit formats are kept"""
+
+    def test_avif_preferred(self):
+        assert negotiate_format("auto", "image/avif,image/webp,*/*") == "avif"
+
+    def test_webp(self):
+        assert negotiate_format("auto", "image/webp,*/*") == "webp"
+
+    def test_jpeg_fallback(self):
+        assert negotiate_format("auto", "*/*") == "jpeg"
+        assert negotiate_format("auto", "") == "jpeg"
+
+    def test_explicit(self):
+        assert negotiate_format("jpeg", "image/avif,image/webp") == "jpeg"
+
+
+class TestTargetWidth:
+    """CSS width x DPR, 1x under Save-Data, rounded up to a bucket"""
+
+    def test_dpr_multiplies(self):
+        assert target_width(320, 2.0, False) == 640
+
+    def test_rounds_up_to_step(self):
+        assert target_width(300, 1.0, False) == 320
+        assert target_width(1, 1.0, False) == resizer.WIDTH_STEP
+
+    def test_save_data_ignores_dpr(self):
+        assert target_width(320, 3.0, True) == 320
+
+    def test_capped(self):
+        assert target_width(4000, 3.0, False) == resizer.MAX_WIDTH
+
+    def test_parse_dpr(self):
+        assert parse_dpr("2") == 2.0
+        assert parse_dpr("0.5") == 1.0
+        assert parse_dpr("10") == resizer.MAX_DPR
+        assert parse_dpr("bogus") == 1.0
+        assert parse_dpr(None) == 1.0
+
+
+class TestRenditionCache:
+    """Renders once per key, evicts least recently used past the byte budget"""
+
+    def test_concurrent_requests_render_once(self, tmp_path):
+        cache = RenditionCache(tmp_path, max_bytes=10_000)
+        calls = []
+
+        async def run():
+            render = fake_render(calls, delay=0.05)
+            return await asyncio.gather(*(cache.get_or_render("ab01.webp", render) for _ in range(10)))
+
+        paths = asyncio.run(run())
+        assert len(calls) == 1
+        assert len(set(paths)) == 1 and paths[0].read_bytes() == b"x" * 100
+
+    def test_cached_rendition_is_reused(self, tmp_path):
+        cache = RenditionCache(tmp_path, max_bytes=10_000)
+        calls = []
+
+        async def run():
+            await cache.get_or_render("ab01.webp", fake_render(calls))
+            await cache.get_or_render("ab01.webp", fake_render(calls))
+
+        asyncio.run(run())
+        assert len(calls) == 1
+
+    def test_least_recently_used_is_evicted(self, tmp_path):
+        cache = RenditionCache(tmp_path, max_bytes=250)
+        calls = []
+
+        async def run():
+            a = await cache.get_or_render("aa01.jpg", fake_render(calls))
+            b = await cache.get_or_render("bb01.jpg", fake_render(calls))
+            await cache.get_or_render("aa01.jpg", fake_render(calls))  # a is now most recent
+            await cache.get_or_render("cc01.jpg", fake_render(calls))
+            return a, b
+
+        a, b = asyncio.run(run())
+        assert a.exists()
+        assert not b.exists()
+        assert cache.total == 200
+
+    def test_failed_render_is_not_cached(self, tmp_path):
+        cache = RenditionCache(tmp_path, max_bytes=10_000)
+
+        async def broken(dest):
+            raise ValueError("bad image")
+
+        async def run():
+            try:
+                await cache.get_or_render("ab01.jpg", broken)
+            except ValueError:
+                pass
+            return await cache.get_or_render("ab01.jpg", fake_render([]))
+
+        assert asyncio.run(run()).exists()
+        assert cache.inflight == {}
+
+    def test_reload_indexes_existing_files(self, tmp_path):
+        (tmp_path / "ab").mkdir()
+        (tmp_path / "ab" / "ab01.jpg").write_bytes(b"x" * 100)
+        (tmp_path / "ab" / ".ab02.jpg.123.tmp").write_bytes(b"x")
+        cache = RenditionCache(tmp_path, max_bytes=10_000)
+        cache.load()
+        assert cache.total == 100
+        assert not (tmp_path / "ab" / ".ab02.jpg.123.tmp").exists()
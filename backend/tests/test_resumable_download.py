@@ -0,0 +1,69 @@
+"""
+Test exact-length, resumable gallery ZIP downloads (Content-Length, Range, If-Range)
+"""
+import io
+import zipfile
+import pytest
+import requests
+import os
+
+from conftest import JPEG_BYTES, upload
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+EVENT = {"title": "TEST_Resumable Download"}
+
+
+@pytest.fixture(scope="module")
+def event_id(event):
+    for name in ("first.jpg", "second.jpg", "first.jpg"):
+        upload(event["slug"], name, JPEG_BYTES)
+    return event["id"]
+
+
+@pytest.fixture(scope="module")
+def full_download(admin_headers, event_id):
+    resp = requests.get(f"{BASE_URL}/api/events/{event_id}/download", headers=admin_headers)
+    assert resp.status_code == 200
+    return resp
+
+
+class TestResumableDownload:
+    """Stored archive with exact length and byte-range resume"""
+
+    def test_full_download_has_exact_length(self, full_download):
+        assert full_download.headers["Accept-Ranges"] == "bytes"
+        assert int(full_download.headers["Content-Length"]) == len(full_download.content)
+        zf = zipfile.ZipFile(io.BytesIO(full_download.content))
+        assert zf.testzip() is None
+        assert sorted(zf.namelist()) == ["first.jpg", "first_1.jpg", "second.jpg"]
+        assert zf.read("second.jpg") == JPEG_BYTES
+
+    def test_resume_from_middle(self, admin_headers, event_id, full_download):
+        body = full_download.content
+        offset = len(body) // 2
+        resp = requests.get(f"{BASE_URL}/api/events/{event_id}/download", headers={
+            **admin_headers, "Range": f"bytes={offset}-", "If-Range": full_download.headers["ETag"]
+        })
+        assert resp.status_code == 206
+        assert resp.headers["Content-Range"] == f"bytes {offset}-{len(body) - 1}/{len(body)}"
+        assert body[:offset] + resp.content == body
+
+    def test_suffix_range(self, admin_headers, event_id, full_download):
+        resp = requests.get(f"{BASE_URL}/api/events/{event_id}/download",
+                            headers={**admin_headers, "Range": "bytes=-22"})
+        assert resp.status_code == 206
+        assert resp.content == full_download.content[-22:]
+
+    def test_stale_if_range_gets_full_archive(self, admin_headers, event_id, full_download):
+        resp = requests.get(f"{BASE_URL}/api/events/{event_id}/download", headers={
+            **admin_headers, "Range": "bytes=10-", "If-Range": '"stale"'
+        })
+        assert resp.status_code == 200
+        assert resp.content == full_download.content
+
+    def test_unsatisfiable_range(self, admin_headers, event_id, full_download):
+        size = len(full_download.content)
+        resp = requests.get(f"{BASE_URL}/api/events/{event_id}/download",
+                            headers={**admin_headers, "Range": f"bytes={size + 10}-"})
+        assert resp.status_code == 416
+        assert resp.headers["Content-Range"] == f"bytes */{size}"
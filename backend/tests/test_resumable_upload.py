@@ -0,0 +1,159 @@
+"""
+Test the resumable guest upload protocol: create, PATCH chunks at offsets, HEAD/GET status, finalize
+"""
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+EVENT = {"title": "TEST_Resumable Event"}
+
+CHUNK = 1024 * 1024
+VIDEO_BYTES = os.urandom(5 * CHUNK + 12345)
+CHUNK_HEADERS = {"Content-Type": "application/offset+octet-stream"}
+
+
+def create(slug, size=len(VIDEO_BYTES), content_type="video/mp4"):
+    return requests.post(f"{BASE_URL}/api/guest/event/{slug}/uploads", json={
+        "filename": "clip.mp4", "content_type": content_type, "size": size, "uploader_name": "TestGuest"
+    })
+
+
+def send_chunk(upload_id, offset, data):
+    return requests.patch(f"{BASE_URL}/api/guest/uploads/{upload_id}", data=data,
+                          headers={**CHUNK_HEADERS, "Upload-Offset": str(offset)})
+
+
+def chunk_offsets():
+    return range(0, len(VIDEO_BYTES), CHUNK)
+
+
+class TestCreate:
+    """Sessions are created with the total length and validated like plain uploads"""
+
+    def test_create(self, event):
+        resp = create(event["slug"])
+        assert resp.status_code == 201
+        data = resp.json()
+        assert data["size"] == len(VIDEO_BYTES)
+        assert data["chunk_size"] > 0
+        assert resp.headers["Location"] == f"/api/guest/uploads/{data['id']}"
+        assert resp.headers["Upload-Offset"] == "0"
+
+    def test_unsupported_type(self, event):
+        assert create(event["slug"], content_type="application/pdf").status_code == 400
+
+    def test_too_large(self, event):
+        assert create(event["slug"], size=201 * 1024 * 1024).status_code == 400
+
+    def test_unknown_event(self):
+        assert create("nonexistent-slug-xyz").status_code == 404
+
+
+class TestChunks:
+    """Chunks land at their offset in any order; HEAD reports the contiguous prefix"""
+
+    def test_sequential_upload_and_finalize(self, admin_headers, event):
+        upload_id = create(event["slug"]).json()["id"]
+        for offset in chunk_offsets():
+            resp = send_chunk(upload_id, offset, VIDEO_BYTES[offset:offset + CHUNK])
+            assert resp.status_code == 204
+            assert int(resp.headers["Upload-Offset"]) == min(offset + CHUNK, len(VIDEO_BYTES))
+        resp = requests.post(f"{BASE_URL}/api/guest/uploads/{upload_id}/finalize")
+        assert resp.status_code == 200
+        media_id = resp.json()["id"]
+        listing = requests.get(f"{BASE_URL}/api/events/{event['id']}/media", headers=admin_headers).json()
+        media = next(m for m in listing if m["id"] == media_id)
+        assert media["file_size"] == len(VIDEO_BYTES)
+        assert media["original_name"] == "clip.mp4"
+
+    def test_parallel_out_of_order_chunks(self, admin_headers, event):
+        upload_id = create(event["slug"]).json()["id"]
+        offsets = list(chunk_offsets())[::-1]
+        with ThreadPoolExecutor(4) as pool:
+            codes = list(pool.map(lambda o: send_chunk(upload_id, o, VIDEO_BYTES[o:o + CHUNK]).status_code, offsets))
+        assert codes == [204] * len(offsets)
+        resp = requests.post(f"{BASE_URL}/api/guest/uploads/{upload_id}/finalize")
+        assert resp.status_code == 200
+        listing = requests.get(f"{BASE_URL}/api/events/{event['id']}/media", headers=admin_headers).json()
+        media = next(m for m in listing if m["id"] == resp.json()["id"])
+        assert requests.get(f"{BASE_URL}{media['url']}").content == VIDEO_BYTES
+
+    def test_head_and_status_report_gaps(self, event):
+        upload_id = create(event["slug"]).json()["id"]
+        send_chunk(upload_id, 0, VIDEO_BYTES[:CHUNK])
+        send_chunk(upload_id, 2 * CHUNK, VIDEO_BYTES[2 * CHUNK:3 * CHUNK])
+        head = requests.head(f"{BASE_URL}/api/guest/uploads/{upload_id}")
+        assert head.status_code == 200
+        assert head.headers["Upload-Offset"] == str(CHUNK)
+        assert head.headers["Upload-Length"] == str(len(VIDEO_BYTES))
+        assert head.headers["Cache-Control"] == "no-store"
+        status = requests.get(f"{BASE_URL}/api/guest/uploads/{upload_id}").json()
+        assert status["missing"] == [[CHUNK, 2 * CHUNK], [3 * CHUNK, len(VIDEO_BYTES)]]
+
+    def test_chunk_past_end_rejected(self, event):
+        upload_id = create(event["slug"], size=100).json()["id"]
+        assert send_chunk(upload_id, 50, b"x" * 51).status_code == 400
+
+    def test_wrong_content_type_rejected(self, event):
+        upload_id = create(event["slug"]).json()["id"]
+        resp = requests.patch(f"{BASE_URL}/api/guest/uploads/{upload_id}", data=b"x",
+                              headers={"Upload-Offset": "0", "Content-Type": "text/plain"})
+        assert resp.status_code == 415
+
+    def test_missing_offset_rejected(self, event):
+        upload_id = create(event["slug"]).json()["id"]
+        resp = requests.patch(f"{BASE_URL}/api/guest/uploads/{upload_id}", data=b"x", headers=CHUNK_HEADERS)
+        assert resp.status_code == 400
+
+
+class TestFinalize:
+    """Finalize needs every byte, is idempotent, and the file is checksummed"""
+
+    def test_incomplete_upload_cannot_finalize(self, event):
+        upload_id = create(event["slug"]).json()["id"]
+        send_chunk(upload_id, 0, VIDEO_BYTES[:CHUNK])
+        resp = requests.post(f"{BASE_URL}/api/guest/uploads/{upload_id}/finalize")
+        assert resp.status_code == 409
+        # Still open: the rest can be sent and finalize retried
+        assert send_chunk(upload_id, CHUNK, VIDEO_BYTES[CHUNK:]).status_code == 204
+        assert requests.post(f"{BASE_URL}/api/guest/uploads/{upload_id}/finalize").status_code == 200
+
+    def test_finalize_twice_returns_same_media(self, event):
+        upload_id = create(event["slug"], size=10).json()["id"]
+        send_chunk(upload_id, 0, b"0123456789")
+        first = requests.post(f"{BASE_URL}/api/guest/uploads/{upload_id}/finalize").json()
+        second = requests.post(f"{BASE_URL}/api/guest/uploads/{upload_id}/finalize").json()
+        assert first["id"] == second["id"]
+
+    def test_chunks_after_finalize_rejected(self, event):
+        upload_id = create(event["slug"], size=10).json()["id"]
+        send_chunk(upload_id, 0, b"0123456789")
+        requests.post(f"{BASE_URL}/api/guest/uploads/{upload_id}/finalize")
+        assert send_chunk(upload_id, 0, b"0123456789").status_code == 409
+
+    def test_crc_matches_content(self, admin_headers, event):
+        upload_id = create(event["slug"], size=10).json()["id"]
+        send_chunk(upload_id, 5, b"56789")
+        send_chunk(upload_id, 0, b"01234")
+        media_id = requests.post(f"{BASE_URL}/api/guest/uploads/{upload_id}/finalize").json()["id"]
+        listing = requests.get(f"{BASE_URL}/api/events/{event['id']}/media", headers=admin_headers).json()
+        url = next(m["url"] for m in listing if m["id"] == media_id)
+        resp = requests.get(f"{BASE_URL}{url}")
+        assert resp.content == b"0123456789"
+        assert resp.headers["ETag"] == f'"{zlib.crc32(b"0123456789"):08x}-a"'
+
+
+class TestAbort:
+    """Aborted or unknown sessions are gone"""
+
+    def test_abort(self, event):
+        upload_id = create(event["slug"]).json()["id"]
+        assert requests.delete(f"{BASE_URL}/api/guest/uploads/{upload_id}").status_code == 204
+        assert requests.head(f"{BASE_URL}/api/guest/uploads/{upload_id}").status_code == 404
+        assert send_chunk(upload_id, 0, b"x").status_code == 404
+
+    def test_unknown_upload(self):
+        assert requests.get(f"{BASE_URL}/api/guest/uploads/{'0' * 32}").status_code == 404
@@ -0,0 +1,61 @@
+"""
+Test session tokens are revoked by password changes and account deletion despite the user cache
+"""
+import os
+import uuid
+
+import pytest
+import requests
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+
+@pytest.fixture(scope="module")
+def user(admin_headers):
+    email = f"test_revoke_{uuid.uuid4().hex[:8]}@example.com"
+    resp = requests.post(f"{BASE_URL}/api/auth/register", json={
+        "email": email, "password": "first-pass", "name": "TEST Revoke"
+    })
+    assert resp.status_code == 200, resp.text
+    data = resp.json()
+    yield {"email": email, "id": data["user"]["id"], "token": data["token"]}
+    requests.delete(f"{BASE_URL}/api/admin/users/{data['user']['id']}", headers=admin_headers)
+
+
+def me(token):
+    return requests.get(f"{BASE_URL}/api/auth/me", headers={"Authorization": f"Bearer {token}"})
+
+
+class TestRevocation:
+    """Old tokens stop working as soon as the password changes or the account is gone"""
+
+    def test_repeated_requests(self, user):
+        for _ in range(3):
+            resp = me(user["token"])
+            assert resp.status_code == 200
+            assert resp.json()["email"] == user["email"]
+            assert "hashed_password" not in resp.json()
+
+    def test_change_password(self, user):
+        other = requests.post(f"{BASE_URL}/api/auth/login",
+                              json={"email": user["email"], "password": "first-pass"}).json()["token"]
+        resp = requests.post(f"{BASE_URL}/api/auth/change-password",
+                             headers={"Authorization": f"Bearer {user['token']}"},
+                             json={"current_password": "first-pass", "new_password": "second-pass"})
+        assert resp.status_code == 200, resp.text
+        fresh = resp.json()["token"]
+
+        assert me(user["token"]).status_code == 401
+        assert me(other).status_code == 401
+        assert me(fresh).status_code == 200
+        user["token"] = fresh
+
+    def test_login_after_change(self, user):
+        resp = requests.post(f"{BASE_URL}/api/auth/login", json={"email": user["email"], "password": "second-pass"})
+        assert resp.status_code == 200
+        assert me(resp.json()["token"]).status_code == 200
+
+    def test_deleted_account(self, admin_headers, user):
+        resp = requests.delete(f"{BASE_URL}/api/admin/users/{user['id']}", headers=admin_headers)
+        assert resp.status_code == 200
+        assert me(user["token"]).status_code == 401
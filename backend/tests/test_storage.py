@@ -0,0 +1,146 @@
+"""
+Test the storage drivers. The S3 driver runs against a MinIO (or other S3-compatible)
+endpoint when S3_TEST_ENDPOINT_URL is set, e.g.
+
+    docker run -p 9000:9000 minio/minio server /data
+    S3_TEST_ENDPOINT_URL=http://localhost:9000 pytest tests/test_storage.py
+"""
+import asyncio
+import os
+import urllib.request
+import uuid
+
+import pytest
+
+from storage import LocalStorage, media_key
+
+S3_ENDPOINT = os.environ.get("S3_TEST_ENDPOINT_URL")
+S3_ACCESS_KEY = os.environ.get("S3_TEST_ACCESS_KEY_ID", "minioadmin")
+S3_SECRET_KEY = os.environ.get("S3_TEST_SECRET_ACCESS_KEY", "minioadmin")
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+@pytest.fixture(params=["local", "s3"])
+def storage(request, tmp_path):
+    if request.param == "local":
+        yield LocalStorage(tmp_path / "uploads")
+        return
+    if not S3_ENDPOINT:
+        pytest.skip("S3_TEST_ENDPOINT_URL not set")
+    from storage import S3Storage
+    bucket = f"snapvault-test-{uuid.uuid4().hex[:12]}"
+    s3 = S3Storage(bucket, endpoint_url=S3_ENDPOINT, region="us-east-1", access_key=S3_ACCESS_KEY,
+                   secret_key=S3_SECRET_KEY, staging_root=tmp_path / "staging", part_size=5 * 1024 * 1024)
+    s3.client.create_bucket(Bucket=bucket)
+    yield s3
+    for o in s3._list(""):
+        s3.client.delete_object(Bucket=bucket, Key=o["Key"])
+    s3.client.delete_bucket(Bucket=bucket)
+
+
+async def write(storage, key, data, piece=1024 * 1024):
+    writer = storage.open_writer(key)
+    for i in range(0, len(data), piece):
+        await writer.write(data[i:i + piece])
+    await writer.commit()
+
+
+async def read_all(storage, key, offset, length):
+    return b"".join([chunk async for chunk in storage.read_range(key, offset, length, chunk_size=4096)])
+
+
+class TestWriteAndRead:
+    """Streamed writes, multipart-sized writes and ranged reads round-trip"""
+
+    def test_small_file(self, storage):
+        key = media_key("ev1", "a.jpg")
+        run(write(storage, key, b"hello world"))
+        assert run(storage.stat(key))[0] == 11
+        assert run(read_all(storage, key, 6, 5)) == b"world"
+
+    def test_large_file_spans_parts(self, storage):
+        data = os.urandom(11 * 1024 * 1024 + 7)
+        key = media_key("ev1", "b.mp4")
+        run(write(storage, key, data))
+        assert run(storage.stat(key))[0] == len(data)
+        assert run(read_all(storage, key, 5 * 1024 * 1024 - 3, 10)) == data[5 * 1024 * 1024 - 3:5 * 1024 * 1024 + 7]
+
+    def test_abort_leaves_nothing(self, storage):
+        key = media_key("ev1", "c.mp4")
+        writer = storage.open_writer(key)
+
+        async def partial():
+            await writer.write(os.urandom(6 * 1024 * 1024))
+            await writer.abort()
+
+        run(partial())
+        assert run(storage.stat(key)) is None
+
+    def test_missing_file(self, storage):
+        assert run(storage.stat(media_key("ev1", "nope.jpg"))) is None
+
+        async def fetch_missing():
+            async with storage.fetch(media_key("ev1", "nope.jpg")):
+                pass
+
+        with pytest.raises(FileNotFoundError):
+            run(fetch_missing())
+
+
+class TestLocalFiles:
+    """Staged files are stored with put_file and fetched back as local paths"""
+
+    def test_put_and_fetch(self, storage):
+        key = media_key("ev2", "thumb_320.webp")
+        staged = storage.staging_path(key)
+        staged.write_bytes(b"rendition")
+        run(storage.put_file(key, staged))
+
+        async def fetched():
+            async with storage.fetch(key) as path:
+                return path.read_bytes()
+
+        assert run(fetched()) == b"rendition"
+
+
+class TestListingAndDeletes:
+    """Per-event sizes, single deletes and whole-event deletes"""
+
+    def test_list_sizes_and_usage(self, storage):
+        run(write(storage, media_key("ev3", "a.jpg"), b"x" * 10))
+        run(write(storage, media_key("ev3", "b.jpg"), b"x" * 20))
+        run(write(storage, media_key("ev4", "c.jpg"), b"x" * 40))
+        assert run(storage.list_sizes("ev3")) == {"a.jpg": 10, "b.jpg": 20}
+        assert run(storage.usage("ev3")) == 30
+
+    def test_delete(self, storage):
+        run(write(storage, media_key("ev5", "a.jpg"), b"x"))
+        run(write(storage, media_key("ev5", "b.jpg"), b"x"))
+        run(storage.delete([media_key("ev5", "a.jpg"), media_key("ev5", "missing.jpg")]))
+        assert run(storage.list_sizes("ev5")) == {"b.jpg": 1}
+
+    def test_delete_event(self, storage):
+        run(write(storage, media_key("ev6", "a.jpg"), b"x"))
+        run(write(storage, media_key("ev60", "a.jpg"), b"x"))
+        run(storage.delete_event("ev6"))
+        assert run(storage.list_sizes("ev6")) == {}
+        assert run(storage.list_sizes("ev60")) == {"a.jpg": 1}
+
+
+class TestPresignedUrls:
+    """S3 hands out stable presigned GET URLs; local storage serves through the API"""
+
+    def test_presigned_get(self, storage):
+        key = media_key("ev7", "a.jpg")
+        run(write(storage, key, b"presigned"))
+        url = run(storage.presigned_url(key, "public, max-age=60"))
+        if storage.local:
+            assert url is None
+            return
+        with urllib.request.urlopen(url) as resp:
+            assert resp.read() == b"presigned"
+            assert resp.headers["Cache-Control"] == "public, max-age=60"
+        assert run(storage.presigned_url(key, "public, max-age=60")) == url
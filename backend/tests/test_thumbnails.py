@@ -0,0 +1,102 @@
+"""
+Test the WebP/JPEG rendition renderer the worker runs for uploaded photos
+"""
+import zlib
+
+from PIL import Image
+
+import thumbnails
+from thumbnails import render_thumbnails, RENDITION_WIDTHS
+
+
+def write_photo(path, size=(4000, 3000), orientation=None):
+    img = Image.new("RGB", size, (200, 120, 40))
+    exif = Image.Exif()
+    if orientation:
+        exif[thumbnails.EXIF_ORIENTATION] = orientation
+    img.save(path, "JPEG", quality=90, exif=exif)
+
+
+class TestRenderThumbnails:
+    """Every width in WebP and JPEG, never upscaled, orientation applied"""
+
+    def test_all_sizes_and_formats(self, tmp_path):
+        write_photo(tmp_path / "abc.jpg")
+        renditions = render_thumbnails(tmp_path / "abc.jpg", tmp_path, "abc.jpg")
+        assert {(r["width"], r["format"]) for r in renditions} == {
+            (w, f) for w in RENDITION_WIDTHS for f in ("webp", "jpeg")
+        }
+        for r in renditions:
+            with Image.open(tmp_path / r["filename"]) as img:
+                assert img.size == (r["width"], r["height"])
+                assert img.format == r["format"].upper()
+            assert r["size"] == (tmp_path / r["filename"]).stat().st_size
+            assert r["crc32"] == zlib.crc32((tmp_path / r["filename"]).read_bytes())
+        assert {p.name for p in tmp_path.iterdir()} == {"abc.jpg"} | {r["filename"] for r in renditions}
+        assert {r["filename"] for r in renditions if r["width"] == 320} == {
+            f"abc_320_{r['crc32']:08x}{thumbnails.FORMATS[r['format']][0]}" for r in renditions if r["width"] == 320
+        }
+
+    def test_height_keeps_aspect_ratio(self, tmp_path):
+        write_photo(tmp_path / "a.jpg", size=(4000, 3000))
+        renditions = render_thumbnails(tmp_path / "a.jpg", tmp_path, "a.jpg")
+        assert {(r["width"], r["height"]) for r in renditions} == {(320, 240), (800, 600), (1600, 1200)}
+
+    def test_exif_rotation_is_applied(self, tmp_path):
+        write_photo(tmp_path / "a.jpg", size=(4000, 3000), orientation=6)
+        renditions = render_thumbnails(tmp_path / "a.jpg", tmp_path, "a.jpg")
+        assert (800, round(800 * 4000 / 3000)) in {(r["width"], r["height"]) for r in renditions}
+
+    def test_small_image_is_not_upscaled(self, tmp_path):
+        write_photo(tmp_path / "a.jpg", size=(500, 400))
+        widths = {r["width"] for r in render_thumbnails(tmp_path / "a.jpg", tmp_path, "a.jpg")}
+        assert widths == {320}
+
+    def test_tiny_image_gets_one_rendition(self, tmp_path):
+        write_photo(tmp_path / "a.jpg", size=(100, 80))
+        widths = {r["width"] for r in render_thumbnails(tmp_path / "a.jpg", tmp_path, "a.jpg")}
+        assert widths == {100}
+
+    def test_png_with_alpha(self, tmp_path):
+        Image.new("RGBA", (1000, 1000), (0, 0, 0, 0)).save(tmp_path / "a.png")
+        renditions = render_thumbnails(tmp_path / "a.png", tmp_path, "a.png")
+        assert {r["width"] for r in renditions} == {320, 800}
+
+    def test_transparency_becomes_white(self, tmp_path):
+        img = Image.new("RGBA", (1000, 1000), (0, 0, 0, 0))
+        img.paste((200, 0, 0, 255), (0, 0, 500, 1000))
+        img.save(tmp_path / "a.png")
+        for r in render_thumbnails(tmp_path / "a.png", tmp_path, "a.png"):
+            with Image.open(tmp_path / r["filename"]) as out:
+                out = out.convert("RGB")
+                assert min(out.getpixel((out.width * 3 // 4, out.height // 2))) > 240
+                red, green, blue = out.getpixel((out.width // 4, out.height // 2))
+                assert red > 180 and green < 30 and blue < 30
+
+    def test_palette_transparency_becomes_white(self, tmp_path):
+        img = Image.new("P", (400, 400), 0)
+        img.putpalette([0, 0, 0, 0, 0, 255])
+        img.paste(1, (0, 0, 200, 400))
+        img.save(tmp_path / "a.gif", transparency=0)
+        [r] = [r for r in render_thumbnails(tmp_path / "a.gif", tmp_path, "a.gif") if r["format"] == "jpeg"]
+        with Image.open(tmp_path / r["filename"]) as out:
+            assert min(out.getpixel((300, 200))) > 240
+            assert out.getpixel((100, 200))[2] > 220
+
+
+class TestRenderResized:
+    """On-demand copies decode the same way as thumbnails"""
+
+    def test_transparency_becomes_white(self, tmp_path):
+        Image.new("LA", (1000, 1000), (0, 0)).save(tmp_path / "a.png")
+        thumbnails.render_resized(tmp_path / "a.png", tmp_path / "a_400.webp", 400, "webp", 80)
+        with Image.open(tmp_path / "a_400.webp") as out:
+            assert out.width == 400
+            assert min(out.convert("RGB").getpixel((200, 200))) > 240
+
+    def test_names_follow_content(self, tmp_path):
+        write_photo(tmp_path / "a.jpg", size=(1000, 750))
+        first = {r["filename"] for r in render_thumbnails(tmp_path / "a.jpg", tmp_path, "a.jpg")}
+        assert {r["filename"] for r in render_thumbnails(tmp_path / "a.jpg", tmp_path, "a.jpg")} == first
+        Image.new("RGB", (1000, 750), (10, 20, 200)).save(tmp_path / "a.jpg", "JPEG")
+        assert not first & {r["filename"] for r in render_thumbnails(tmp_path / "a.jpg", tmp_path, "a.jpg")}
@@ -0,0 +1,130 @@
+"""
+Test the ffprobe-driven skip / remux / re-encode decisions made by the worker
+"""
+import struct
+
+import transcode
+from transcode import SKIP, REMUX, REENCODE, MP4_FORMAT
+
+
+def ffprobe_output(codec="h264", width=1920, height=1080, fps="30/1", video_bitrate="8000000",
+                   audio="aac", container=MP4_FORMAT, pix_fmt="yuv420p", rotate=None):
+    video = {
+        "codec_type": "video", "codec_name": codec, "width": width, "height": height,
+        "avg_frame_rate": fps, "pix_fmt": pix_fmt, "disposition": {"attached_pic": 0},
+    }
+    if video_bitrate:
+        video["bit_rate"] = video_bitrate
+    if rotate is not None:
+        video["side_data_list"] = [{"side_data_type": "Display Matrix", "rotation": rotate}]
+    streams = [video]
+    if audio:
+        streams.append({"codec_type": "audio", "codec_name": audio, "bit_rate": "192000"})
+    return {"format": {"format_name": container, "duration": "42.5", "bit_rate": "8200000"},
+            "streams": streams}
+
+
+def probe(**kwargs):
+    return transcode.parse_probe(ffprobe_output(**kwargs))
+
+
+def mp4_boxes(*kinds):
+    return b"".join(struct.pack(">I4s", 16, kind) + b"\x00" * 8 for kind in kinds)
+
+
+class TestParseProbe:
+    """ffprobe JSON is flattened into the fields stored on the media doc"""
+
+    def test_fields(self):
+        p = probe(rotate=-90)
+        assert p["video_codec"] == "h264"
+        assert (p["width"], p["height"], p["fps"]) == (1920, 1080, 30.0)
+        assert p["duration"] == 42.5
+        assert p["video_bitrate"] == 8000000
+        assert p["audio_codec"] == "aac"
+        assert p["rotation"] == 270
+        assert transcode.display_size(p) == (1080, 1920)
+
+    def test_missing_stream_bitrate_falls_back_to_container(self):
+        p = probe(video_bitrate=None, container="matroska,webm")
+        assert p["video_bitrate"] == 8200000 - 192000
+
+
+class TestDecide:
+    """Re-encode only for codec, resolution or bitrate; otherwise remux or leave alone"""
+
+    def test_web_ready_file_is_skipped(self):
+        assert transcode.decide(probe(), faststart=True)[0] == SKIP
+
+    def test_missing_faststart_is_remuxed(self):
+        assert transcode.decide(probe(), faststart=False)[0] == REMUX
+
+    def test_other_container_is_remuxed(self):
+        assert transcode.decide(probe(container="matroska,webm"), faststart=None)[0] == REMUX
+
+    def test_incompatible_audio_is_remuxed(self):
+        decision, reason = transcode.decide(probe(audio="pcm_s16le"), faststart=True)
+        assert decision == REMUX
+        assert "pcm_s16le" in reason
+
+    def test_hevc_is_reencoded(self):
+        assert transcode.decide(probe(codec="hevc"), faststart=True)[0] == REENCODE
+
+    def test_4k_is_reencoded(self):
+        assert transcode.decide(probe(width=3840, height=2160, video_bitrate="1000000"), faststart=True)[0] == REENCODE
+
+    def test_portrait_1080p_is_not_oversized(self):
+        assert transcode.decide(probe(width=1080, height=1920), faststart=True)[0] == SKIP
+
+    def test_high_bitrate_is_reencoded(self):
+        decision, reason = transcode.decide(probe(video_bitrate="40000000"), faststart=True)
+        assert decision == REENCODE
+        assert "bitrate" in reason
+
+    def test_budget_scales_with_frame_rate(self):
+        p = probe(fps="60/1", video_bitrate="20000000")
+        assert transcode.decide(p, faststart=True, max_kbps=12000)[0] == SKIP
+        assert transcode.decide(probe(video_bitrate="20000000"), faststart=True, max_kbps=12000)[0] == REENCODE
+
+    def test_no_video_stream_is_skipped(self):
+        data = ffprobe_output()
+        data["streams"] = data["streams"][1:]
+        assert transcode.decide(transcode.parse_probe(data), faststart=True)[0] == SKIP
+
+
+class TestFfmpegArgs:
+    """Remux copies streams; re-encode caps the short side at 1080"""
+
+    def test_remux_copies(self, tmp_path):
+        args = transcode.ffmpeg_args(REMUX, probe(), tmp_path / "in.mov", tmp_path / "out.mp4")
+        assert args[args.index("-c:v") + 1] == "copy"
+        assert args[args.index("-c:a") + 1] == "copy"
+        assert "+faststart" in args
+
+    def test_remux_converts_audio(self, tmp_path):
+        args = transcode.ffmpeg_args(REMUX, probe(audio="pcm_s16le"), tmp_path / "in.mov", tmp_path / "out.mp4")
+        assert args[args.index("-c:a") + 1] == "aac"
+
+    def test_reencode_scales_portrait_by_width(self, tmp_path):
+        args = transcode.ffmpeg_args(REENCODE, probe(width=3840, height=2160, rotate=90),
+                                     tmp_path / "in.mov", tmp_path / "out.mp4")
+        assert args[args.index("-vf") + 1].startswith("scale='min(iw,1080)'")
+
+
+class TestFaststart:
+    """The moov/mdat order is read from the top-level MP4 boxes"""
+
+    def test_moov_first(self, tmp_path):
+        path = tmp_path / "a.mp4"
+        path.write_bytes(mp4_boxes(b"ftyp", b"moov", b"mdat"))
+        assert transcode.moov_before_mdat(path) is True
+
+    def test_mdat_first(self, tmp_path):
+        path = tmp_path / "a.mp4"
+        path.write_bytes(mp4_boxes(b"ftyp", b"free", b"mdat", b"moov"))
+        assert transcode.moov_before_mdat(path) is False
+
+    def test_truncated(self, tmp_path):
+        path = tmp_path / "a.mp4"
+        path.write_bytes(mp4_boxes(b"ftyp")[:12])
+        assert transcode.moov_before_mdat(path) is None
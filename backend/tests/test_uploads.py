@@ -0,0 +1,35 @@
+"""
+Test the span bookkeeping and offset writes behind resumable uploads
+"""
+from uploads import merge_spans, contiguous_offset, missing_spans, write_at
+
+
+class TestSpans:
+    """Received [start, end) spans are merged, and gaps are reported"""
+
+    def test_merge_overlapping_and_adjacent(self):
+        assert merge_spans([[10, 20], [0, 5], [5, 10], [15, 30]]) == [[0, 30]]
+
+    def test_merge_keeps_gaps(self):
+        assert merge_spans([[20, 30], [0, 10]]) == [[0, 10], [20, 30]]
+
+    def test_contiguous_offset(self):
+        assert contiguous_offset([]) == 0
+        assert contiguous_offset([[0, 10], [20, 30]]) == 10
+        assert contiguous_offset([[5, 10]]) == 0
+
+    def test_missing(self):
+        assert missing_spans([[0, 10], [20, 30]], 40) == [[10, 20], [30, 40]]
+        assert missing_spans([[0, 40]], 40) == []
+        assert missing_spans([], 40) == [[0, 40]]
+
+
+class TestWriteAt:
+    """Chunks written out of order land at their offsets"""
+
+    def test_out_of_order(self, tmp_path):
+        path = tmp_path / ".abc.part"
+        path.touch()
+        write_at(path, 5, b"56789")
+        write_at(path, 0, b"01234")
+        assert path.read_bytes() == b"0123456789"
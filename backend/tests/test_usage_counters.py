@@ -0,0 +1,40 @@
+"""
+Test the denormalized media_count / storage_bytes counters kept by uploads and deletes
+"""
+import requests
+import os
+
+from conftest import JPEG_BYTES, upload
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+EVENT = {"title": "TEST_Counter Event"}
+
+
+class TestUsageCounters:
+    """Counters follow uploads and deletes without recounting"""
+
+    def test_new_event_starts_at_zero(self, event):
+        assert event["media_count"] == 0
+
+    def test_upload_and_delete_move_event_and_totals(self, admin_headers, event):
+        before = requests.get(f"{BASE_URL}/api/admin/stats", headers=admin_headers).json()
+
+        media_id = upload(event["slug"], "counter.jpg", JPEG_BYTES)["id"]
+        resp = requests.get(f"{BASE_URL}/api/events/{event['id']}", headers=admin_headers)
+        assert resp.json()["media_count"] == 1
+        during = requests.get(f"{BASE_URL}/api/admin/stats", headers=admin_headers).json()
+        assert during["total_media"] == before["total_media"] + 1
+
+        resp = requests.delete(f"{BASE_URL}/api/media/{media_id}", headers=admin_headers)
+        assert resp.status_code == 200
+        resp = requests.get(f"{BASE_URL}/api/events/{event['id']}", headers=admin_headers)
+        assert resp.json()["media_count"] == 0
+        after = requests.get(f"{BASE_URL}/api/admin/stats", headers=admin_headers).json()
+        assert after["total_media"] == before["total_media"]
+
+    def test_double_delete_does_not_decrement_twice(self, admin_headers, event):
+        media_id = upload(event["slug"], "counter.jpg", JPEG_BYTES)["id"]
+        assert requests.delete(f"{BASE_URL}/api/media/{media_id}", headers=admin_headers).status_code == 200
+        assert requests.delete(f"{BASE_URL}/api/media/{media_id}", headers=admin_headers).status_code == 404
+        resp = requests.get(f"{BASE_URL}/api/events/{event['id']}", headers=admin_headers)
+        assert resp.json()["media_count"] == 0
@@ -0,0 +1,107 @@
+"""
+Test the streaming ZIP writer used by the bulk download endpoint
+"""
+import asyncio
+import io
+import zipfile
+import zlib
+
+import zipstream
+from zipstream import ZipStream, ZipLayout, StoredFile, unique_arcname
+
+
+def build_zip(files, **kwargs) -> bytes:
+    async def run():
+        zs = ZipStream(chunk_size=4096)
+        out = bytearray()
+        for arcname, path in files:
+            async for chunk in zs.add_file(arcname, path, **kwargs):
+                out += chunk
+        out += zs.finish()
+        return bytes(out)
+    return asyncio.run(run())
+
+
+class TestZipStream:
+    """Archives written incrementally read back with zipfile"""
+
+    def test_round_trip(self, tmp_path):
+        photo = tmp_path / "photo.jpg"
+        photo.write_bytes(bytes(range(256)) * 100)
+        note = tmp_path / "note.wav"
+        note.write_bytes(b"\x00" * 50000)
+        data = build_zip([("photo.jpg", photo), ("note.wav", note)])
+        zf = zipfile.ZipFile(io.BytesIO(data))
+        assert zf.testzip() is None
+        assert zf.read("photo.jpg") == photo.read_bytes()
+        assert zf.read("note.wav") == note.read_bytes()
+
+    def test_precompressed_media_is_stored(self, tmp_path):
+        photo = tmp_path / "a.jpg"
+        photo.write_bytes(b"x" * 10000)
+        wav = tmp_path / "a.wav"
+        wav.write_bytes(b"x" * 10000)
+        zf = zipfile.ZipFile(io.BytesIO(build_zip([("a.jpg", photo), ("a.wav", wav)])))
+        assert zf.getinfo("a.jpg").compress_type == zipfile.ZIP_STORED
+        assert zf.getinfo("a.wav").compress_type == zipfile.ZIP_DEFLATED
+
+    def test_empty_file_and_unicode_name(self, tmp_path):
+        empty = tmp_path / "empty.mp3"
+        empty.write_bytes(b"")
+        zf = zipfile.ZipFile(io.BytesIO(build_zip([("Zoë's song.mp3", empty)])))
+        assert zf.read("Zoë's song.mp3") == b""
+
+    def test_zip64_entries(self, tmp_path):
+        video = tmp_path / "v.mp4"
+        video.write_bytes(b"v" * 5000)
+        zf = zipfile.ZipFile(io.BytesIO(build_zip([("v.mp4", video)], zip64=True)))
+        assert zf.testzip() is None
+        assert zf.read("v.mp4") == video.read_bytes()
+
+    def test_zip64_end_record_for_many_entries(self, tmp_path):
+        empty = tmp_path / "e.jpg"
+        empty.write_bytes(b"")
+        count = zipstream.ZIP16_LIMIT + 5
+        data = build_zip([(f"{i}.jpg", empty) for i in range(count)], size=0, mtime=0)
+        assert len(zipfile.ZipFile(io.BytesIO(data)).infolist()) == count
+
+    def test_unique_arcname(self):
+        seen = {}
+        names = [unique_arcname(n, seen) for n in ["a.jpg", "a.jpg", "b.jpg", "a.jpg"]]
+        assert names == ["a.jpg", "a_1.jpg", "b.jpg", "a_2.jpg"]
+
+
+def read_layout(layout, start=0, end=None) -> bytes:
+    async def run():
+        out = bytearray()
+        async for chunk in layout.stream(start, end):
+            out += chunk
+        return bytes(out)
+    return asyncio.run(run())
+
+
+def stored_files(tmp_path):
+    files = []
+    for name, data in [("a.jpg", b"a" * 3000), ("empty.mp3", b""), ("b.mp4", bytes(range(256)) * 40)]:
+        path = tmp_path / name
+        path.write_bytes(data)
+        files.append(StoredFile(name, path, len(data), zlib.crc32(data), 0))
+    return files
+
+
+class TestZipLayout:
+    """Precomputed stored archives: exact size and independent byte ranges"""
+
+    def test_size_is_exact(self, tmp_path):
+        layout = ZipLayout(stored_files(tmp_path), chunk_size=512)
+        data = read_layout(layout)
+        assert len(data) == layout.size
+        zf = zipfile.ZipFile(io.BytesIO(data))
+        assert zf.testzip() is None
+        assert zf.read("b.mp4") == bytes(range(256)) * 40
+
+    def test_any_range_matches_full_archive(self, tmp_path):
+        layout = ZipLayout(stored_files(tmp_path), chunk_size=512)
+        full = read_layout(layout)
+        for start, end in [(0, 0), (0, 29), (17, 3100), (3000, layout.size - 1), (layout.size - 22, layout.size - 1)]:
+            assert read_layout(layout, start, end) == full[start:end + 1]
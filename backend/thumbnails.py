@@ -0,0 +1,107 @@
+"""
+Downscaled renditions of uploaded photos for gallery grids.
+
+render_thumbnails() is CPU-bound and meant to run in a process pool (the
+worker does this). JPEGs are decoded in draft mode, where libjpeg scales by
+1/2, 1/4 or 1/8 while decoding, so a 12 MP photo never has to be fully
+decompressed to make an 800px thumbnail. Each size is written as WebP with a
+JPEG fallback, named after its content so the files can be cached as
+immutable. Renditions are never upscaled. Transparent images are flattened
+onto white, since JPEG has no alpha channel. render_resized() makes single
+on-demand copies the same way for the resize endpoint.
+"""
+import io
+import os
+import zlib
+from pathlib import Path
+
+from PIL import Image, ImageOps
+
+RENDITION_WIDTHS = (320, 800, 1600)
+FORMATS = {
+    # format: (extension, save options)
+    "webp": (".webp", {"quality": 80, "method": 4}),
+    "jpeg": (".jpg", {"quality": 82, "optimize": True, "progressive": True}),
+    "avif": (".avif", {"quality": 60, "speed": 8}),
+}
+THUMBNAIL_FORMATS = ("webp", "jpeg")
+EXIF_ORIENTATION = 0x0112
+MATTE = (255, 255, 255, 255)
+
+
+def rendition_name(filename: str, width: int, fmt: str, crc: int) -> str:
+    """The CRC-32 of the bytes is in the name, so a re-render that changes them gets a new URL."""
+    return f"{Path(filename).stem}_{width}_{crc:08x}{FORMATS[fmt][0]}"
+
+
+def target_widths(display_width: int) -> list:
+    """Widths to render: each configured size below the original, or the original if it is tiny."""
+    widths = [w for w in RENDITION_WIDTHS if w < display_width]
+    return widths or [display_width]
+
+
+def display_width(img: Image.Image) -> int:
+    """Width of the image as shown, after EXIF orientation."""
+    return img.height if img.getexif().get(EXIF_ORIENTATION) in (5, 6, 7, 8) else img.width
+
+
+def decode_for_width(img: Image.Image, width: int) -> Image.Image:
+    """Decode `img` upright in RGB (or L), as cheaply as possible for output `width` pixels wide.
+
+    Transparent pixels are composited over MATTE.
+    """
+    if img.format == "JPEG":
+        # Ask libjpeg for the smallest scale that still covers the requested width
+        scale = width / display_width(img)
+        img.draft("RGB", (max(1, round(img.width * scale)), max(1, round(img.height * scale))))
+    frame = ImageOps.exif_transpose(img)
+    if frame.mode in ("RGBA", "LA", "PA", "RGBa", "La") or "transparency" in frame.info:
+        # A plain convert("RGB") drops alpha, leaving black (or whatever hid under it) behind
+        rgba = frame.convert("RGBA")
+        return Image.alpha_composite(Image.new("RGBA", rgba.size, MATTE), rgba).convert("RGB")
+    if frame.mode not in ("RGB", "L"):
+        frame = frame.convert("RGB")
+    return frame
+
+
+def render_thumbnails(src: Path, out_dir: Path, filename: str) -> list:
+    """
+    Write renditions of `src` into `out_dir`.
+    Returns [{width, height, format, filename, size, crc32}].
+    """
+    renditions = []
+    with Image.open(src) as img:
+        widths = sorted(target_widths(display_width(img)), reverse=True)
+        frame = decode_for_width(img, widths[0])
+        aspect = frame.height / frame.width
+        for width in widths:
+            height = max(1, round(width * aspect))
+            if frame.width != width:
+                # Each size is made from the previous, larger one: cheaper, and looks the same
+                frame = frame.resize((width, height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+            for fmt in THUMBNAIL_FORMATS:
+                buf = io.BytesIO()
+                frame.save(buf, fmt.upper(), **FORMATS[fmt][1])
+                data = buf.getvalue()
+                crc = zlib.crc32(data)
+                name = rendition_name(filename, width, fmt, crc)
+                (out_dir / name).write_bytes(data)
+                renditions.append({
+                    "width": width, "height": height, "format": fmt,
+                    "filename": name, "size": len(data), "crc32": crc,
+                })
+    return sorted(renditions, key=lambda r: (r["width"], r["format"]))
+
+
+def render_resized(src: Path, dest: Path, width: int, fmt: str, quality: int) -> int:
+    """Atomically write a `fmt` copy of `src` at most `width` wide to `dest`; returns its size."""
+    with Image.open(src) as img:
+        width = min(width, display_width(img))
+        frame = decode_for_width(img, width)
+        if frame.width != width:
+            height = max(1, round(width * frame.height / frame.width))
+            frame = frame.resize((width, height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+        tmp = dest.with_name(f".{dest.name}.{os.getpid()}.tmp")
+        frame.save(tmp, fmt.upper(), **{**FORMATS[fmt][1], "quality": quality})
+    tmp.replace(dest)
+    return dest.stat().st_size
@@ -0,0 +1,177 @@
+"""
+Transcode decisions for uploaded videos, driven by ffprobe rather than file size.
+
+A video that is already H.264 at 1080p or below with browser-playable audio
+and a sane bitrate is never re-encoded. It is either left alone, or remuxed
+(stream copy into MP4 with the moov atom up front) when only the container
+is wrong. Re-encoding is reserved for incompatible codecs, oversized
+resolutions and bitrates above the budget for the video's pixel rate.
+"""
+import os
+import struct
+from pathlib import Path
+from typing import Optional
+
+SKIP = "skip"
+REMUX = "remux"
+REENCODE = "reencode"
+
+WEB_VIDEO_CODECS = {"h264"}
+WEB_AUDIO_CODECS = {"aac", "mp3"}
+MP4_FORMAT = "mov,mp4,m4a,3gp,3g2,mj2"  # ffprobe's format_name for the ISO/QuickTime family
+MAX_SHORT_SIDE = 1080
+
+# Bitrate allowed for 1080p30; other sizes and frame rates scale with pixels per second
+MAX_BITRATE_KBPS = int(os.environ.get('VIDEO_MAX_BITRATE_KBPS', 12000))
+REFERENCE_PIXEL_RATE = 1920 * 1080 * 30
+
+
+def _int(value) -> Optional[int]:
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def _fps(rate: Optional[str]) -> Optional[float]:
+    try:
+        num, _, den = (rate or "").partition("/")
+        fps = float(num) / float(den or 1)
+    except (ValueError, ZeroDivisionError):
+        return None
+    return round(fps, 3) if fps > 0 else None
+
+
+def _rotation(stream: dict) -> int:
+    rotation = _int(stream.get("tags", {}).get("rotate"))
+    if rotation is None:
+        for side_data in stream.get("side_data_list", []):
+            if "rotation" in side_data:
+                rotation = _int(side_data["rotation"])
+                break
+    return (rotation or 0) % 360
+
+
+def parse_probe(data: dict) -> dict:
+    """Flatten `ffprobe -print_format json -show_format -show_streams` output into what the media doc stores."""
+    fmt = data.get("format", {})
+    streams = data.get("streams", [])
+    video = next((s for s in streams if s.get("codec_type") == "video"
+                  and not s.get("disposition", {}).get("attached_pic")), None)
+    audio = next((s for s in streams if s.get("codec_type") == "audio"), None)
+    probe = {
+        "container": fmt.get("format_name"),
+        "duration": float(fmt.get("duration") or 0),
+        "bitrate": _int(fmt.get("bit_rate")),
+        "video_codec": None,
+        "audio_codec": audio.get("codec_name") if audio else None,
+        "audio_bitrate": _int(audio.get("bit_rate")) if audio else None,
+    }
+    if video:
+        probe.update({
+            "video_codec": video.get("codec_name"),
+            "width": _int(video.get("width")),
+            "height": _int(video.get("height")),
+            "fps": _fps(video.get("avg_frame_rate")) or _fps(video.get("r_frame_rate")),
+            "video_bitrate": _int(video.get("bit_rate")),
+            "pix_fmt": video.get("pix_fmt"),
+            "rotation": _rotation(video),
+        })
+        if not probe["video_bitrate"] and probe["bitrate"]:
+            # MKV/WebM carry no per-stream bitrate; attribute the rest to video
+            probe["video_bitrate"] = max(0, probe["bitrate"] - (probe["audio_bitrate"] or 0))
+    return probe
+
+
+def display_size(probe: dict) -> tuple:
+    """Width and height as shown, after applying rotation metadata."""
+    width, height = probe.get("width") or 0, probe.get("height") or 0
+    if probe.get("rotation") in (90, 270):
+        return height, width
+    return width, height
+
+
+def bitrate_budget(probe: dict, max_kbps: int = MAX_BITRATE_KBPS) -> int:
+    """Largest video bitrate (bits/s) worth keeping for this resolution and frame rate."""
+    pixel_rate = (probe.get("width") or 0) * (probe.get("height") or 0) * min(probe.get("fps") or 30, 60)
+    return int(max_kbps * 1000 * pixel_rate / REFERENCE_PIXEL_RATE)
+
+
+def moov_before_mdat(path: Path) -> Optional[bool]:
+    """True if an MP4/MOV file is already fast-start (index before media data); None if unknown."""
+    with open(path, "rb") as f:
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                return None
+            size, kind = struct.unpack(">I4s", header)
+            if kind == b"moov":
+                return True
+            if kind == b"mdat":
+                return False
+            if size == 1:
+                size = struct.unpack(">Q", f.read(8))[0]
+                f.seek(size - 16, os.SEEK_CUR)
+            elif size == 0:
+                return None  # box runs to end of file
+            elif size < 8:
+                return None
+            else:
+                f.seek(size - 8, os.SEEK_CUR)
+
+
+def codecs_playable(probe: dict) -> bool:
+    """Video and audio streams that browsers play without conversion."""
+    return (probe.get("video_codec") in WEB_VIDEO_CODECS
+            and probe.get("pix_fmt") in (None, "yuv420p", "yuvj420p")
+            and (probe.get("audio_codec") is None or probe["audio_codec"] in WEB_AUDIO_CODECS))
+
+
+def web_ready(probe: dict, faststart: Optional[bool]) -> bool:
+    """The file could be served as-is: playable codecs in an MP4 that starts without a full download."""
+    return codecs_playable(probe) and probe.get("container") == MP4_FORMAT and faststart is True
+
+
+def decide(probe: dict, faststart: Optional[bool], max_kbps: int = MAX_BITRATE_KBPS) -> tuple:
+    """Pick (decision, reason) for a probed video: SKIP, REMUX or REENCODE."""
+    codec = probe.get("video_codec")
+    if not codec:
+        return SKIP, "no video stream"
+    if codec not in WEB_VIDEO_CODECS:
+        return REENCODE, f"video codec {codec}"
+    if probe.get("pix_fmt") not in (None, "yuv420p", "yuvj420p"):
+        return REENCODE, f"pixel format {probe['pix_fmt']}"
+    short_side = min(probe.get("width") or 0, probe.get("height") or 0)
+    if short_side > MAX_SHORT_SIDE:
+        return REENCODE, f"resolution {probe['width']}x{probe['height']}"
+    budget = bitrate_budget(probe, max_kbps)
+    if probe.get("video_bitrate") and budget and probe["video_bitrate"] > budget:
+        return REENCODE, f"bitrate {probe['video_bitrate'] // 1000}k over {budget // 1000}k"
+    if probe.get("audio_codec") and probe["audio_codec"] not in WEB_AUDIO_CODECS:
+        return REMUX, f"audio codec {probe['audio_codec']}"
+    if probe.get("container") != MP4_FORMAT:
+        return REMUX, f"container {probe.get('container')}"
+    if faststart is not True:
+        return REMUX, "moov atom after media data"
+    return SKIP, "already web-ready"
+
+
+def ffmpeg_args(decision: str, probe: dict, input_path: Path, output_path: Path) -> list:
+    """ffmpeg arguments (after the global flags) for a REMUX or REENCODE decision."""
+    args = ['-i', str(input_path)]
+    if decision == REMUX:
+        args += ['-c:v', 'copy']
+        if probe.get("audio_codec") in WEB_AUDIO_CODECS:
+            args += ['-c:a', 'copy']
+        else:
+            args += ['-c:a', 'aac', '-b:a', '192k']
+    else:
+        width, height = display_size(probe)
+        # Cap the short side at 1080 whichever way up the video is shown
+        scale = f"scale='min(iw,{MAX_SHORT_SIDE})':-2" if height > width else f"scale=-2:'min(ih,{MAX_SHORT_SIDE})'"
+        args += [
+            '-vf', scale,
+            '-c:v', 'libx264', '-crf', '18', '-preset', 'medium', '-pix_fmt', 'yuv420p',
+            '-c:a', 'aac', '-b:a', '192k',
+        ]
+    return args + ['-movflags', '+faststart', '-y', str(output_path)]
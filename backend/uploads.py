@@ -0,0 +1,159 @@
+"""
+Resumable (tus-style) upload sessions stored in MongoDB.
+
+A session is created with the final length up front. Chunks may then arrive
+in any order, including in parallel. Each chunk is written at its offset into
+a hidden `.{id}.part` file in the event directory, and the byte span it covered
+is recorded on the session. Finalize checks that the spans cover the whole
+file, renames the part file in place and hands it to the normal media path.
+
+A session's expiry slides forward with every chunk. expire() removes sessions
+(and their part files) that have gone quiet for longer than the TTL.
+"""
+import os
+import uuid
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+from typing import Optional
+
+from pymongo import ReturnDocument
+
+OPEN = "open"
+FINALIZING = "finalizing"
+COMPLETE = "complete"
+COMPACT_AFTER = 64  # recorded spans before they are merged in place
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def merge_spans(spans: list) -> list:
+    """Merge half-open [start, end) spans into sorted, non-overlapping, non-adjacent ones."""
+    merged = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def contiguous_offset(spans: list) -> int:
+    """Bytes received without a gap from the start of the file (the tus Upload-Offset)."""
+    merged = merge_spans(spans)
+    return merged[0][1] if merged and merged[0][0] == 0 else 0
+
+
+def missing_spans(spans: list, length: int) -> list:
+    """The [start, end) spans of a `length`-byte file not covered by `spans`."""
+    missing, pos = [], 0
+    for start, end in merge_spans(spans):
+        if start > pos:
+            missing.append([pos, start])
+        pos = max(pos, end)
+    if pos < length:
+        missing.append([pos, length])
+    return missing
+
+
+def part_name(session_id) -> str:
+    return f".{session_id}.part"
+
+
+def write_at(path: Path, offset: int, data: bytes):
+    """Write `data` at `offset` of an existing file without disturbing other writers."""
+    fd = os.open(path, os.O_WRONLY)
+    try:
+        view = memoryview(data)
+        while view:
+            written = os.pwrite(fd, view, offset)
+            view, offset = view[written:], offset + written
+    finally:
+        os.close(fd)
+
+
+class UploadSessions:
+    def __init__(self, collection, upload_dir: Path, ttl: int = 86400):
+        self.sessions = collection
+        self.upload_dir = upload_dir
+        self.ttl = timedelta(seconds=ttl)
+
+    def part_path(self, session: dict) -> Path:
+        return self.upload_dir / session["event_id"] / part_name(session["_id"])
+
+    async def create(self, event_id: str, length: int, **fields) -> dict:
+        now = utcnow()
+        session = {
+            "_id": uuid.uuid4().hex,  # unguessable: the id is the guest's only credential
+            "event_id": event_id,
+            "length": length,
+            "received": [],
+            "status": OPEN,
+            "created_at": now,
+            "expires_at": now + self.ttl,
+            **fields,
+        }
+        path = self.part_path(session)
+        path.parent.mkdir(exist_ok=True)
+        path.touch()
+        await self.sessions.insert_one(session)
+        return session
+
+    async def get(self, session_id: str) -> Optional[dict]:
+        """The session, or None if it does not exist or has expired."""
+        session = await self.sessions.find_one({"_id": session_id})
+        if not session or session["expires_at"].replace(tzinfo=timezone.utc) < utcnow():
+            return None
+        return session
+
+    async def record(self, session: dict, start: int, end: int) -> dict:
+        """Record that [start, end) has been written and push the expiry out; returns the updated session."""
+        if end <= start:
+            return session
+        updated = await self.sessions.find_one_and_update(
+            {"_id": session["_id"], "status": OPEN},
+            {"$push": {"received": [start, end]}, "$set": {"expires_at": utcnow() + self.ttl}},
+            return_document=ReturnDocument.AFTER,
+        )
+        if not updated:
+            return session
+        spans = updated["received"]
+        if len(spans) > COMPACT_AFTER:
+            # Only replaces the exact array read above; a concurrent push just skips this round
+            await self.sessions.update_one({"_id": session["_id"], "received": spans},
+                                           {"$set": {"received": merge_spans(spans)}})
+        return updated
+
+    async def claim(self, session: dict) -> Optional[dict]:
+        """Move an open session to finalizing; None if another request got there first."""
+        return await self.sessions.find_one_and_update(
+            {"_id": session["_id"], "status": OPEN},
+            {"$set": {"status": FINALIZING}},
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def reopen(self, session: dict):
+        await self.sessions.update_one({"_id": session["_id"], "status": FINALIZING},
+                                       {"$set": {"status": OPEN}})
+
+    async def complete(self, session: dict, result: dict):
+        """Keep the finalize response so a retried finalize (lost reply) gets the same answer."""
+        await self.sessions.update_one({"_id": session["_id"]},
+                                       {"$set": {"status": COMPLETE, "result": result}})
+
+    async def abort(self, session: dict) -> bool:
+        deleted = await self.sessions.find_one_and_delete({"_id": session["_id"], "status": OPEN})
+        if deleted:
+            self.part_path(deleted).unlink(missing_ok=True)
+        return bool(deleted)
+
+    async def expire(self) -> int:
+        """Delete sessions past their expiry along with any part file; returns how many."""
+        expired = 0
+        async for s in self.sessions.find({"expires_at": {"$lt": utcnow()}}, {"_id": 1}):
+            deleted = await self.sessions.find_one_and_delete({"_id": s["_id"], "expires_at": {"$lt": utcnow()}})
+            if deleted:
+                self.part_path(deleted).unlink(missing_ok=True)
+                expired += 1
+        return expired
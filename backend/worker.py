@@ -0,0 +1,365 @@
+"""
+SnapVault background worker.
+
+Runs jobs from the Mongo-backed queue (see jobs.py) in its own process so
+slow work such as video transcoding never blocks the API event loop.
+
+    python worker.py
+
+Job kinds run in lanes with their own concurrency so a backlog of long video
+transcodes never holds up thumbnails: WORKER_CONCURRENCY bounds concurrent
+transcodes (default 2), THUMBNAIL_WORKERS the processes rendering thumbnails
+(default: one per CPU).
+"""
+import asyncio
+import collections
+import json
+import os
+import signal
+import socket
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+
+from bson import ObjectId
+from PIL import Image, UnidentifiedImageError
+
+import server
+from server import db, job_queue, logger, storage, blob_store, bump_usage, hold_usage
+from storage import media_key
+from zipstream import crc32_file
+import metadata
+import thumbnails
+import transcode
+
+WORKER_CONCURRENCY = int(os.environ.get('WORKER_CONCURRENCY', 2))
+THUMBNAIL_WORKERS = int(os.environ.get('THUMBNAIL_WORKERS', os.cpu_count() or 2))
+POLL_INTERVAL = 2
+FFMPEG_TIMEOUT = 600
+
+
+def shared_media(m: dict) -> dict:
+    """Filter for every media doc sharing m's stored file (deduplicated uploads share a blob)."""
+    return {"blob_id": m["blob_id"]} if m.get("blob_id") else {"_id": m["_id"]}
+
+
+async def job_media(job: dict):
+    """The media a job is for or, if that was deleted, another upload of the same blob."""
+    payload = job["payload"]
+    m = await db.media.find_one({"_id": ObjectId(payload["media_id"])})
+    if not m and payload.get("blob_id"):
+        m = await db.media.find_one({"blob_id": ObjectId(payload["blob_id"])})
+    return m
+
+
+# --- Video Transcoding ---
+async def probe_media(path) -> dict:
+    """Raw ffprobe JSON for a file (see transcode.parse_probe)."""
+    proc = await asyncio.create_subprocess_exec(
+        'ffprobe', '-v', 'error', '-print_format', 'json', '-show_format', '-show_streams', str(path),
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+    )
+    out, err = await proc.communicate()
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffprobe exited with {proc.returncode}: {err.decode(errors='replace')[-500:]}")
+    return json.loads(out or b"{}")
+
+
+async def run_ffmpeg(args: list, duration: float, report) -> None:
+    """Run ffmpeg, reporting progress (0-1) parsed from -progress output. Raises on failure."""
+    proc = await asyncio.create_subprocess_exec(
+        'ffmpeg', '-hide_banner', '-nostats', '-progress', 'pipe:1', *args,
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+    )
+    stderr_tail = collections.deque(maxlen=20)
+
+    async def drain_stderr():
+        async for line in proc.stderr:
+            stderr_tail.append(line.decode(errors="replace").rstrip())
+
+    stderr_task = asyncio.create_task(drain_stderr())
+    try:
+        async with asyncio.timeout(FFMPEG_TIMEOUT):
+            async for line in proc.stdout:
+                key, _, value = line.decode(errors="replace").strip().partition("=")
+                if key == "out_time_us" and duration > 0:
+                    try:
+                        report(min(1.0, int(value) / 1_000_000 / duration))
+                    except ValueError:
+                        pass
+            returncode = await proc.wait()
+            await stderr_task
+    except BaseException:
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+        stderr_task.cancel()
+        raise
+    if returncode != 0:
+        raise RuntimeError(f"ffmpeg exited with {returncode}: {' | '.join(stderr_tail)[-500:]}")
+
+
+async def transcode_video(job: dict, report) -> dict:
+    m = await job_media(job)
+    if not m:
+        return {"skipped": "media deleted"}
+    await db.media.update_many(shared_media(m), {"$set": {"processing_status": "processing"}})
+    async with storage.fetch(media_key(m["event_id"], m["filename"])) as input_path:
+        return await transcode_file(m, input_path, report)
+
+
+async def transcode_file(m: dict, input_path: Path, report) -> dict:
+    data = await probe_media(input_path)
+    probe = transcode.parse_probe(data)
+    meta = metadata.video_metadata(data, probe)
+    timeline = {"metadata": meta}
+    if meta.get("captured_at"):
+        timeline["taken_at"] = meta["captured_at"]
+    await db.media.update_many(shared_media(m), {"$set": timeline})
+    faststart = None
+    if probe.get("container") == transcode.MP4_FORMAT:
+        faststart = await asyncio.to_thread(transcode.moov_before_mdat, input_path)
+    decision, reason = transcode.decide(probe, faststart)
+    record = {"decision": decision, "reason": reason, "kept": "original",
+              "input_size": m["file_size"], "output_size": m["file_size"], "seconds": 0.0}
+    logger.info(f"Video {m['filename']} ({m['file_size'] / 1024 / 1024:.1f}MB): {decision} ({reason})")
+
+    if decision == transcode.SKIP:
+        await db.media.update_many(
+            shared_media(m),
+            {"$set": {"probe": probe, "transcode": record, "processing_status": "ready"}}
+        )
+        return record
+
+    output_name = f"c_{Path(m['filename']).stem}.mp4"
+    output_key = media_key(m["event_id"], output_name)
+    output_path = storage.staging_path(output_key)
+    started = time.monotonic()
+    try:
+        await run_ffmpeg(transcode.ffmpeg_args(decision, probe, input_path, output_path),
+                         probe.get("duration") or 0.0, report)
+    except BaseException:
+        output_path.unlink(missing_ok=True)
+        raise
+    new_size = output_path.stat().st_size
+    record.update({"output_size": new_size, "seconds": round(time.monotonic() - started, 1)})
+
+    # Keep whichever is smaller, unless the original can't be served as-is
+    if new_size >= m["file_size"] and transcode.web_ready(probe, faststart):
+        output_path.unlink(missing_ok=True)
+        await db.media.update_many(
+            shared_media(m),
+            {"$set": {"probe": probe, "transcode": record, "processing_status": "ready"}}
+        )
+        logger.info(f"Kept original: {decision} output was {new_size / 1024 / 1024:.1f}MB")
+        return record
+
+    record["kept"] = "output"
+    crc = await asyncio.to_thread(crc32_file, output_path)
+    await hold_usage(m["event_id"])
+    await storage.put_file(output_key, output_path)
+    # Swap only if the media still points at the original (not deleted meanwhile);
+    # the blob first, so deleting its last media from here on removes the output
+    original_key = media_key(m["event_id"], m["filename"])
+    stored = {"filename": output_name, "size": new_size, "crc32": crc}
+    if m.get("blob_id") and not await blob_store.update_stored(m["blob_id"], stored, m["filename"]):
+        await storage.delete([output_key])
+        return {"skipped": "media deleted"}
+    result = await db.media.update_many(
+        {**shared_media(m), "filename": m["filename"]},
+        {"$set": {"filename": output_name, "file_size": new_size, "crc32": crc,
+                  "probe": probe, "transcode": record, "processing_status": "ready"}}
+    )
+    if not result.matched_count:
+        await storage.delete([output_key, original_key] if m.get("blob_id") else [output_key])
+        return {"skipped": "media deleted"}
+    await storage.delete([original_key])
+    await bump_usage(m["event_id"], 0, new_size - m["file_size"])
+    logger.info(f"Video {decision} done: {new_size / 1024 / 1024:.1f}MB in {record['seconds']}s")
+    return record
+
+
+async def transcode_failed(job: dict, error: str):
+    # The original upload is untouched and still served
+    m = await job_media(job)
+    if m:
+        await db.media.update_many(shared_media(m), {"$set": {"processing_status": "failed"}})
+
+
+async def transcode_retrying(job: dict, error: str):
+    m = await job_media(job)
+    if m:
+        await db.media.update_many(shared_media(m), {"$set": {"processing_status": "queued"}})
+
+
+# --- Thumbnails ---
+thumbnail_pool = None  # ProcessPoolExecutor, created in main()
+
+
+async def make_thumbnails(job: dict, report) -> dict:
+    m = await job_media(job)
+    if not m:
+        return {"skipped": "media deleted"}
+    out_dir = storage.staging_dir(m["event_id"])
+    loop = asyncio.get_running_loop()
+    try:
+        async with storage.fetch(media_key(m["event_id"], m["filename"])) as src:
+            renditions = await loop.run_in_executor(
+                thumbnail_pool, thumbnails.render_thumbnails, src, out_dir, m["filename"]
+            )
+        await hold_usage(m["event_id"])
+        for r in renditions:
+            await storage.put_file(media_key(m["event_id"], r["filename"]), out_dir / r["filename"])
+    except (UnidentifiedImageError, Image.DecompressionBombError) as e:
+        # Not something Pillow can (or should) decode; the original is shown instead
+        logger.warning(f"No thumbnails for {m['filename']}: {e}")
+        renditions = []
+
+    blob_id = m.get("blob_id")
+    if blob_id and not await blob_store.update_stored(blob_id, {"renditions": renditions}, m["filename"]):
+        await storage.delete([media_key(m["event_id"], r["filename"]) for r in renditions])
+        return {"skipped": "media deleted"}
+    result = await db.media.update_many(
+        {**shared_media(m), "filename": m["filename"]},
+        {"$set": {"renditions": renditions}}
+    )
+    if not result.matched_count:
+        await storage.delete([media_key(m["event_id"], r["filename"]) for r in renditions])
+        return {"skipped": "media deleted"}
+    # Renditions are named by content: unchanged ones keep their files, changed ones
+    # replace files that nothing refers to any more, so only the difference is new storage
+    stale = {r["filename"] for r in m.get("renditions", [])} - {r["filename"] for r in renditions}
+    if stale:
+        await storage.delete([media_key(m["event_id"], f) for f in stale])
+    added = sum(r["size"] for r in renditions) - sum(r["size"] for r in m.get("renditions", []))
+    await bump_usage(m["event_id"], 0, added)
+    return {"renditions": len(renditions), "bytes": sum(r["size"] for r in renditions)}
+
+
+async def no_op(job: dict, error: str):
+    pass
+
+
+# kind -> (handler, on_retry, on_final_failure)
+HANDLERS = {
+    "transcode_video": (transcode_video, transcode_retrying, transcode_failed),
+    "thumbnails": (make_thumbnails, no_op, no_op),
+}
+
+# lane -> (job kinds, concurrent jobs)
+LANES = {
+    "video": (["transcode_video"], WORKER_CONCURRENCY),
+    "images": (["thumbnails"], THUMBNAIL_WORKERS),
+}
+
+
+# --- Runner ---
+async def run_job(job: dict):
+    handler, on_retry, on_failed = HANDLERS[job["kind"]]
+    state = {"progress": None, "lease_lost": False}
+    task = asyncio.create_task(handler(job, lambda p: state.__setitem__("progress", p)))
+
+    async def heartbeat():
+        while True:
+            await asyncio.sleep(job_queue.visibility_timeout.total_seconds() / 3)
+            if not await job_queue.heartbeat(job, state["progress"]):
+                logger.warning(f"Lost lease on job {job['_id']}; abandoning it")
+                state["lease_lost"] = True
+                task.cancel()
+                return
+
+    beat = asyncio.create_task(heartbeat())
+    try:
+        result = await task
+    except asyncio.CancelledError:
+        if state["lease_lost"]:
+            return  # another worker owns the job now
+        # The worker itself is shutting down: hand the job back for someone else
+        await job_queue.release(job)
+        raise
+    except Exception as e:
+        logger.error(f"Job {job['_id']} ({job['kind']}) attempt {job['attempts']} failed: {e}")
+        if await job_queue.fail(job, str(e)):
+            await on_failed(job, str(e))
+        else:
+            await on_retry(job, str(e))
+        return
+    finally:
+        beat.cancel()
+    await job_queue.complete(job, result)
+
+
+async def sweep_expired():
+    """Fail jobs whose worker died during their final attempt."""
+    for job in await job_queue.expired():
+        await job_queue.mark_failed(job, "worker lease expired")
+        _handler, _on_retry, on_failed = HANDLERS.get(job["kind"], (None, None, None))
+        if on_failed:
+            await on_failed(job, "worker lease expired")
+
+
+async def run_lane(worker_id: str, kinds: list, concurrency: int, stop: asyncio.Event, running: set):
+    """Claim jobs of `kinds` while fewer than `concurrency` of them are running."""
+    slots = asyncio.Semaphore(concurrency)
+    stopping = asyncio.create_task(stop.wait())
+    while not stop.is_set():
+        slot = asyncio.create_task(slots.acquire())
+        await asyncio.wait({slot, stopping}, return_when=asyncio.FIRST_COMPLETED)
+        if not slot.done():
+            slot.cancel()
+            break
+        try:
+            job = await job_queue.claim(worker_id, kinds)
+        except Exception as e:
+            logger.error(f"Claiming a job failed: {e}")
+            job = None
+        if job is None:
+            slots.release()
+            try:
+                await sweep_expired()
+            except Exception as e:
+                logger.error(f"Sweeping expired jobs failed: {e}")
+            try:
+                await asyncio.wait_for(stop.wait(), POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        task = asyncio.create_task(run_job(job))
+        running.add(task)
+        task.add_done_callback(running.discard)
+        task.add_done_callback(lambda _t: slots.release())
+    stopping.cancel()
+
+
+async def main():
+    global thumbnail_pool
+    worker_id = f"{socket.gethostname()}-{os.getpid()}"
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+
+    await server.ensure_indexes()
+    # forkserver: children start clean instead of inheriting the Mongo client's threads
+    context = get_context("forkserver")
+    context.set_forkserver_preload(["thumbnails"])
+    thumbnail_pool = ProcessPoolExecutor(max_workers=THUMBNAIL_WORKERS, mp_context=context)
+    running: set = set()
+    logger.info(f"Worker {worker_id} started ({', '.join(f'{lane}: {n}' for lane, (_k, n) in LANES.items())})")
+
+    await asyncio.gather(*(
+        run_lane(worker_id, kinds, concurrency, stop, running)
+        for kinds, concurrency in LANES.values()
+    ))
+
+    logger.info(f"Worker {worker_id} stopping; releasing {len(running)} running job(s)")
+    for task in list(running):
+        task.cancel()
+    await asyncio.gather(*running, return_exceptions=True)
+    thumbnail_pool.shutdown(cancel_futures=True)
+    server.client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
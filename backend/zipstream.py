@@ -0,0 +1,300 @@
+"""
+Streaming ZIP writer for gallery downloads.
+
+Entries are emitted as they are read, so memory stays constant however large
+the archive is. File data is read (and deflated) in a worker thread, one chunk
+at a time, to keep the event loop free. Already-compressed media is stored
+as-is. Zip64 records are written only when an entry, offset or entry count
+exceeds the classic ZIP limits, which keeps small archives readable by every
+unzip tool.
+"""
+import asyncio
+import os
+import struct
+import time
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import AsyncIterator, Callable, Optional
+
+CHUNK_SIZE = 1024 * 1024
+ZIP32_LIMIT = 0xFFFFFFFF
+ZIP16_LIMIT = 0xFFFF
+
+METHOD_STORED = 0
+METHOD_DEFLATED = 8
+
+FLAG_DATA_DESCRIPTOR = 0x08
+FLAG_UTF8 = 0x800
+
+VERSION_DEFAULT = 20
+VERSION_ZIP64 = 45
+
+# Formats that are already compressed; deflating them again only burns CPU
+COMPRESSED_EXTENSIONS = {
+    ".jpg", ".jpeg", ".png", ".gif", ".webp", ".heic", ".heif", ".avif",
+    ".mp4", ".m4v", ".mov", ".webm", ".mkv", ".3gp", ".avi",
+    ".mp3", ".m4a", ".aac", ".ogg", ".oga", ".opus", ".weba", ".amr",
+    ".zip", ".gz",
+}
+
+
+def is_precompressed(name: str) -> bool:
+    return Path(name).suffix.lower() in COMPRESSED_EXTENSIONS
+
+
+def dos_datetime(timestamp: float) -> tuple:
+    t = time.localtime(timestamp)
+    if t.tm_year < 1980:
+        return 0, (1 << 5) | 1  # 1980-01-01 00:00
+    dos_time = (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2)
+    dos_date = ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+    return dos_time, dos_date
+
+
+@dataclass
+class ZipEntry:
+    name: str
+    method: int
+    dos_time: int
+    dos_date: int
+    offset: int
+    zip64: bool
+    crc: int = 0
+    compressed_size: int = 0
+    size: int = 0
+    flags: int = FLAG_UTF8
+
+
+def local_header(entry: ZipEntry) -> bytes:
+    name = entry.name.encode("utf-8")
+    extra = b""
+    if entry.zip64:
+        csize = usize = ZIP32_LIMIT
+        sizes = (entry.size, entry.compressed_size) if not entry.flags & FLAG_DATA_DESCRIPTOR else (0, 0)
+        extra = struct.pack("<HHQQ", 0x0001, 16, *sizes)
+    else:
+        csize, usize = entry.compressed_size, entry.size
+    return struct.pack(
+        "<IHHHHHIIIHH",
+        0x04034B50,
+        VERSION_ZIP64 if entry.zip64 else VERSION_DEFAULT,
+        entry.flags, entry.method, entry.dos_time, entry.dos_date,
+        entry.crc, csize, usize, len(name), len(extra),
+    ) + name + extra
+
+
+def data_descriptor(entry: ZipEntry) -> bytes:
+    if entry.zip64:
+        return struct.pack("<IIQQ", 0x08074B50, entry.crc, entry.compressed_size, entry.size)
+    return struct.pack("<IIII", 0x08074B50, entry.crc, entry.compressed_size, entry.size)
+
+
+def central_header(entry: ZipEntry) -> bytes:
+    name = entry.name.encode("utf-8")
+    zip64_fields = []
+    usize, csize, offset = entry.size, entry.compressed_size, entry.offset
+    if usize >= ZIP32_LIMIT or entry.zip64:
+        zip64_fields.append(usize)
+        usize = ZIP32_LIMIT
+    if csize >= ZIP32_LIMIT or entry.zip64:
+        zip64_fields.append(csize)
+        csize = ZIP32_LIMIT
+    if offset >= ZIP32_LIMIT:
+        zip64_fields.append(offset)
+        offset = ZIP32_LIMIT
+    extra = b""
+    if zip64_fields:
+        extra = struct.pack(f"<HH{len(zip64_fields)}Q", 0x0001, 8 * len(zip64_fields), *zip64_fields)
+    version = VERSION_ZIP64 if zip64_fields else VERSION_DEFAULT
+    return struct.pack(
+        "<IHHHHHHIIIHHHHHII",
+        0x02014B50,
+        (3 << 8) | version,  # made by: unix
+        version,
+        entry.flags, entry.method, entry.dos_time, entry.dos_date,
+        entry.crc, csize, usize, len(name), len(extra), 0, 0, 0,
+        (0o100644 << 16),
+        offset,
+    ) + name + extra
+
+
+def end_records(entries: list, cd_offset: int, cd_size: int) -> bytes:
+    count = len(entries)
+    out = b""
+    if count >= ZIP16_LIMIT or cd_offset >= ZIP32_LIMIT or cd_size >= ZIP32_LIMIT:
+        zip64_eocd_offset = cd_offset + cd_size
+        out += struct.pack(
+            "<IQHHIIQQQQ", 0x06064B50, 44, VERSION_ZIP64, VERSION_ZIP64, 0, 0,
+            count, count, cd_size, cd_offset,
+        )
+        out += struct.pack("<IIQI", 0x07064B50, 0, zip64_eocd_offset, 1)
+    out += struct.pack(
+        "<IHHHHIIH", 0x06054B50, 0, 0,
+        min(count, ZIP16_LIMIT), min(count, ZIP16_LIMIT),
+        min(cd_size, ZIP32_LIMIT), min(cd_offset, ZIP32_LIMIT), 0,
+    )
+    return out
+
+
+class ZipStream:
+    """Incrementally writes a ZIP archive; feed entries with add_file(), then yield finish()."""
+
+    def __init__(self, chunk_size: int = CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self.offset = 0
+        self.entries: list = []
+
+    def _emit(self, data: bytes) -> bytes:
+        self.offset += len(data)
+        return data
+
+    async def add_file(self, arcname: str, path: Path, compress: Optional[bool] = None,
+                       size: Optional[int] = None, mtime: Optional[float] = None,
+                       zip64: Optional[bool] = None) -> AsyncIterator[bytes]:
+        if size is None or mtime is None:
+            st = await asyncio.to_thread(os.stat, path)
+            size, mtime = st.st_size, st.st_mtime
+        if compress is None:
+            compress = not is_precompressed(arcname)
+        dos_time, dos_date = dos_datetime(mtime)
+        entry = ZipEntry(
+            name=arcname,
+            method=METHOD_DEFLATED if compress else METHOD_STORED,
+            dos_time=dos_time, dos_date=dos_date,
+            offset=self.offset,
+            # Deflate can expand incompressible input slightly, so leave headroom
+            zip64=zip64 if zip64 is not None else size + (size >> 8) + 1024 >= ZIP32_LIMIT,
+            flags=FLAG_UTF8 | FLAG_DATA_DESCRIPTOR,
+        )
+        yield self._emit(local_header(entry))
+
+        compressor = zlib.compressobj(6, zlib.DEFLATED, -15) if compress else None
+
+        def read_chunk(f, crc):
+            data = f.read(self.chunk_size)
+            if not data:
+                return b"", crc, 0, compressor.flush() if compressor else b""
+            crc = zlib.crc32(data, crc)
+            return data, crc, len(data), compressor.compress(data) if compressor else data
+
+        f = await asyncio.to_thread(open, path, "rb")
+        try:
+            crc = 0
+            while True:
+                raw, crc, n, out = await asyncio.to_thread(read_chunk, f, crc)
+                entry.size += n
+                if out:
+                    entry.compressed_size += len(out)
+                    yield self._emit(out)
+                if not raw:
+                    break
+        finally:
+            await asyncio.to_thread(f.close)
+
+        entry.crc = crc
+        yield self._emit(data_descriptor(entry))
+        self.entries.append(entry)
+
+    def finish(self) -> bytes:
+        cd_offset = self.offset
+        central = b"".join(central_header(e) for e in self.entries)
+        return self._emit(central + end_records(self.entries, cd_offset, len(central)))
+
+
+def unique_arcname(name: str, seen: dict) -> str:
+    """Suffix repeated names as name_1.ext, name_2.ext, ... (tracks state in `seen`)."""
+    if name in seen:
+        seen[name] += 1
+        stem, ext = os.path.splitext(name)
+        return f"{stem}_{seen[name]}{ext}"
+    seen[name] = 0
+    return name
+
+
+@dataclass
+class StoredFile:
+    """A file whose CRC-32 and size are already known (captured at upload time)."""
+    arcname: str
+    path: Path  # or whatever the layout's reader takes, e.g. a storage key
+    size: int
+    crc: int
+    mtime: float
+
+
+class ZipLayout:
+    """
+    Byte-exact layout of a stored (uncompressed) ZIP over files with known CRCs.
+
+    Because every header can be computed up front, the archive length is known
+    before a byte is sent and any byte range can be produced on its own, reading
+    only the file data that overlaps it.
+    """
+
+    def __init__(self, files: list, chunk_size: int = CHUNK_SIZE, reader: Optional[Callable] = None):
+        self.chunk_size = chunk_size
+        # reader(path, offset, length, chunk_size) yields file bytes; local files by default
+        self.reader = reader or read_file_range
+        self.segments: list = []  # (start, length, bytes | path)
+        entries = []
+        offset = 0
+        for f in files:
+            dos_time, dos_date = dos_datetime(f.mtime)
+            entry = ZipEntry(
+                name=f.arcname, method=METHOD_STORED,
+                dos_time=dos_time, dos_date=dos_date,
+                offset=offset, zip64=f.size >= ZIP32_LIMIT,
+                crc=f.crc, compressed_size=f.size, size=f.size,
+            )
+            header = local_header(entry)
+            self.segments.append((offset, len(header), header))
+            offset += len(header)
+            if f.size:
+                self.segments.append((offset, f.size, f.path))
+                offset += f.size
+            entries.append(entry)
+        central = b"".join(central_header(e) for e in entries)
+        tail = central + end_records(entries, offset, len(central))
+        self.segments.append((offset, len(tail), tail))
+        self.size = offset + len(tail)
+
+    async def stream(self, start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        """Yield bytes start..end inclusive (the whole archive by default)."""
+        end = self.size - 1 if end is None else end
+        for seg_start, length, payload in self.segments:
+            seg_end = seg_start + length - 1
+            if seg_end < start:
+                continue
+            if seg_start > end:
+                break
+            lo = max(start, seg_start) - seg_start
+            hi = min(end, seg_end) - seg_start + 1
+            if isinstance(payload, bytes):
+                yield payload[lo:hi]
+            else:
+                async for chunk in self.reader(payload, lo, hi - lo, self.chunk_size):
+                    yield chunk
+
+
+async def read_file_range(path: Path, offset: int, length: int, chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """Read `length` bytes from `offset` in a worker thread, one chunk at a time."""
+    f = await asyncio.to_thread(open, path, "rb")
+    try:
+        await asyncio.to_thread(f.seek, offset)
+        remaining = length
+        while remaining > 0:
+            data = await asyncio.to_thread(f.read, min(chunk_size, remaining))
+            if not data:
+                raise IOError(f"{path} is shorter than expected")
+            remaining -= len(data)
+            yield data
+    finally:
+        await asyncio.to_thread(f.close)
+
+
+def crc32_file(path: Path, chunk_size: int = CHUNK_SIZE) -> int:
+    crc = 0
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            crc = zlib.crc32(chunk, crc)
+    return crc
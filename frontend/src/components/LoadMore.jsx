@@ -0,0 +1,31 @@
+import React, { useEffect, useRef } from 'react';
+
+// Fetches the next page as it scrolls into view, or on click where IntersectionObserver is missing.
+export default function LoadMore({ hasMore, loading, onLoadMore, testId = 'load-more-btn' }) {
+  const ref = useRef(null);
+
+  useEffect(() => {
+    if (!hasMore || loading || !ref.current || !('IntersectionObserver' in window)) return;
+    const observer = new IntersectionObserver(
+      entries => { if (entries[0].isIntersecting) onLoadMore(); },
+      { rootMargin: '400px' }
+    );
+    observer.observe(ref.current);
+    return () => observer.disconnect();
+  }, [hasMore, loading, onLoadMore]);
+
+  if (!hasMore) return null;
+  return (
+    <div ref={ref} className="flex justify-center py-6">
+      <button
+        data-testid={testId}
+        onClick={onLoadMore}
+        disabled={loading}
+        className="flex items-center gap-2 bg-white border border-slate-200 text-slate-700 px-4 py-2 rounded-xl text-sm font-medium hover:bg-slate-50 transition-all disabled:opacity-60"
+      >
+        {loading && <div className="w-4 h-4 border-2 border-slate-400 border-t-transparent rounded-full animate-spin" />}
+        {loading ? 'Loading...' : 'Load more'}
+      </button>
+    </div>
+  );
+}
@@ -0,0 +1,54 @@
+import { useCallback, useEffect, useRef, useState } from 'react';
+import { fetchPage } from '../utils/api';
+
+// A keyset-paginated listing loaded one page at a time: the first page when path or params
+// change, then each further page on loadMore() for as long as the server sends X-Next-Cursor.
+function usePagedList(path, params = {}, { onError } = {}) {
+  const [items, setItems] = useState([]);
+  const [cursor, setCursor] = useState(null);
+  const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const paramsKey = JSON.stringify(params);
+  // Pages answering a listing that has since been reloaded are dropped
+  const generation = useRef(0);
+  const onErrorRef = useRef(onError);
+  onErrorRef.current = onError;
+
+  const reload = useCallback(async () => {
+    const gen = ++generation.current;
+    setLoading(true);
+    setCursor(null);
+    try {
+      const page = await fetchPage(path, JSON.parse(paramsKey));
+      if (gen !== generation.current) return;
+      setItems(page.rows);
+      setCursor(page.cursor);
+    } catch (err) {
+      if (gen === generation.current) onErrorRef.current ? onErrorRef.current(err) : console.error(err);
+    } finally {
+      if (gen === generation.current) setLoading(false);
+    }
+  }, [path, paramsKey]);
+
+  useEffect(() => { reload(); }, [reload]);
+
+  const loadMore = useCallback(async () => {
+    if (!cursor || loadingMore) return;
+    const gen = generation.current;
+    setLoadingMore(true);
+    try {
+      const page = await fetchPage(path, JSON.parse(paramsKey), cursor);
+      if (gen !== generation.current) return;
+      setItems(prev => [...prev, ...page.rows]);
+      setCursor(page.cursor);
+    } catch (err) {
+      console.error(err);
+    } finally {
+      setLoadingMore(false);
+    }
+  }, [path, paramsKey, cursor, loadingMore]);
+
+  return { items, setItems, loading, loadingMore, hasMore: Boolean(cursor), loadMore, reload };
+}
+
+export { usePagedList };
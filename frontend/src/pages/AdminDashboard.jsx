@@ -2,6 +2,8 @@ import React, { useState, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom';
 import Layout from '../components/Layout';
 import api, { API } from '../utils/api';
+import { usePagedList } from '../hooks/use-paged-list';
+import LoadMore from '../components/LoadMore';
 import { getTemplate } from '../utils/themes';
 import {
   Users, Calendar, Images, Download, Trash2,
@@ -27,29 +29,26 @@ function StatCard({ label, value, icon: Icon, color }) {
 }
 
 export default function AdminDashboard() {
+  const navigate = useNavigate();
+  const leaveIfNotAdmin = err => { if (err.response?.status === 403) navigate('/dashboard'); };
   const [stats, setStats] = useState(null);
-  const [events, setEvents] = useState([]);
-  const [users, setUsers] = useState([]);
-  const [loading, setLoading] = useState(true);
+  const [statsLoading, setStatsLoading] = useState(true);
+  const eventList = usePagedList('/admin/events', {}, { onError: leaveIfNotAdmin });
+  const userList = usePagedList('/admin/users', {}, { onError: leaveIfNotAdmin });
+  const { items: events, setItems: setEvents } = eventList;
+  const { items: users, setItems: setUsers } = userList;
+  const loading = statsLoading || eventList.loading || userList.loading;
   const [tab, setTab] = useState('events');
   const [downloading, setDownloading] = useState(null);
   const [deletingEvent, setDeletingEvent] = useState(null);
   const [deletingUser, setDeletingUser] = useState(null);
   const [approvingEvent, setApprovingEvent] = useState(null);
-  const navigate = useNavigate();
 
   useEffect(() => {
-    Promise.all([
-      api.get('/admin/stats'),
-      api.get('/admin/events'),
-      api.get('/admin/users')
-    ]).then(([s, e, u]) => {
-      setStats(s.data);
-      setEvents(e.data);
-      setUsers(u.data);
-    }).catch(err => {
-      if (err.response?.status === 403) navigate('/dashboard');
-    }).finally(() => setLoading(false));
+    api.get('/admin/stats')
+      .then(res => setStats(res.data))
+      .catch(leaveIfNotAdmin)
+      .finally(() => setStatsLoading(false));
   }, []);
 
   const handleBulkDownload = async (event) => {
@@ -114,13 +113,10 @@ export default function AdminDashboard() {
     try {
       await api.delete(`/admin/users/${userId}`);
       setUsers(prev => prev.filter(u => u.id !== userId));
-      // Refresh events and stats
-      const [statsRes, eventsRes] = await Promise.all([
-        api.get('/admin/stats'),
-        api.get('/admin/events')
-      ]);
+      // Their events went with them; refresh the stats
+      setEvents(prev => prev.filter(e => e.organizer_id !== userId));
+      const statsRes = await api.get('/admin/stats');
       setStats(statsRes.data);
-      setEvents(eventsRes.data);
     } catch {
       alert('Failed to delete user');
     } finally {
@@ -169,8 +165,8 @@ export default function AdminDashboard() {
       {/* Tabs */}
       <div className="flex bg-slate-100 rounded-xl p-1 w-fit mb-5 gap-0.5">
         {[
-          { key: 'events', label: `All Events (${events.length})` },
-          { key: 'users', label: `Users (${users.length})` },
+          { key: 'events', label: `All Events (${stats?.total_events ?? events.length})` },
+          { key: 'users', label: `Users (${stats?.total_users ?? users.length})` },
           { key: 'settings', label: 'Settings' }
         ].map(t => (
           <button
@@ -304,6 +300,8 @@ export default function AdminDashboard() {
               </table>
             </div>
           )}
+          <LoadMore hasMore={eventList.hasMore} loading={eventList.loadingMore} onLoadMore={eventList.loadMore}
+            testId="admin-load-more-events" />
         </div>
       )}
 
@@ -383,6 +381,8 @@ export default function AdminDashboard() {
               </table>
             </div>
           )}
+          <LoadMore hasMore={userList.hasMore} loading={userList.loadingMore} onLoadMore={userList.loadMore}
+            testId="admin-load-more-users" />
         </div>
       )}
 
@@ -564,10 +564,12 @@ function AccountSettings() {
 
     setLoading(true);
     try {
-      await api.post('/auth/change-password', {
+      const res = await api.post('/auth/change-password', {
         current_password: currentPassword,
         new_password: newPassword
       });
+      // Other sessions are signed out; this one continues on the new token
+      localStorage.setItem('snapvault_token', res.data.token);
       setMessage({ type: 'success', text: 'Password changed successfully!' });
       setCurrentPassword('');
       setNewPassword('');
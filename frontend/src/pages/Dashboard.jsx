@@ -1,33 +1,21 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { useAuth } from '../context/AuthContext';
 import Layout from '../components/Layout';
 import api from '../utils/api';
+import { usePagedList } from '../hooks/use-paged-list';
+import LoadMore from '../components/LoadMore';
 import { getTemplate } from '../utils/themes';
 import { Plus, Heart, Cake, Briefcase, Images, Calendar, Trash2 } from 'lucide-react';
 
 const EVENT_ICONS = { wedding: Heart, birthday: Cake, corporate: Briefcase };
 
 export default function Dashboard() {
-  const [events, setEvents] = useState([]);
-  const [loading, setLoading] = useState(true);
+  const { items: events, setItems: setEvents, loading, loadingMore, hasMore, loadMore } = usePagedList('/events');
   const [deleting, setDeleting] = useState(null);
   const { user } = useAuth();
   const navigate = useNavigate();
 
-  useEffect(() => { fetchEvents(); }, []);
-
-  const fetchEvents = async () => {
-    try {
-      const res = await api.get('/events');
-      setEvents(res.data);
-    } catch (e) {
-      console.error(e);
-    } finally {
-      setLoading(false);
-    }
-  };
-
   const handleDelete = async (eventId, e) => {
     e.stopPropagation();
     if (!window.confirm('Delete this event and all its uploaded media? This cannot be undone.')) return;
@@ -42,6 +30,8 @@ export default function Dashboard() {
     }
   };
 
+  // Figures over the pages loaded so far; "+" while there are more
+  const more = hasMore ? '+' : '';
   const totalMedia = events.reduce((s, e) => s + e.media_count, 0);
   const thisMonth = events.filter(e => {
     const d = new Date(e.created_at);
@@ -72,9 +62,9 @@ export default function Dashboard() {
       {/* Stats */}
       <div className="grid grid-cols-1 sm:grid-cols-3 gap-4 mb-7">
         {[
-          { label: 'Total Events', value: events.length, color: 'bg-indigo-50 text-indigo-600' },
-          { label: 'Total Uploads', value: totalMedia, color: 'bg-emerald-50 text-emerald-600' },
-          { label: 'Events This Month', value: thisMonth, color: 'bg-violet-50 text-violet-600' },
+          { label: 'Total Events', value: `${events.length}${more}`, color: 'bg-indigo-50 text-indigo-600' },
+          { label: 'Total Uploads', value: `${totalMedia}${more}`, color: 'bg-emerald-50 text-emerald-600' },
+          { label: 'Events This Month', value: `${thisMonth}${more}`, color: 'bg-violet-50 text-violet-600' },
         ].map(stat => (
           <div key={stat.label} className="bg-white rounded-2xl border border-slate-100 p-5 shadow-sm">
             <p className="text-xs text-slate-500 font-medium uppercase tracking-wide mb-2">{stat.label}</p>
@@ -200,6 +190,7 @@ export default function Dashboard() {
           })}
         </div>
       )}
+      <LoadMore hasMore={hasMore} loading={loadingMore} onLoadMore={loadMore} testId="load-more-events" />
     </Layout>
   );
 }
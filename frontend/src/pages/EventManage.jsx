@@ -8,6 +8,40 @@ import { Copy, Check, Edit, Trash2, Images, ExternalLink, Calendar, ArrowLeft, C
 import PrintableQRCards from '../components/PrintableQRCards';
 import { QR_CARD_TEMPLATES } from '../components/PrintableQRCards';
 
+function QRCardPreview({ eventId, template, size, guestUrl }) {
+  const [src, setSrc] = useState(null);
+  const [failed, setFailed] = useState(false);
+
+  useEffect(() => {
+    let url = null;
+    let cancelled = false;
+    setFailed(false);
+    // Rendered (and cached) by the server: the same PNG that is emailed on approval
+    api.get(`/events/${eventId}/qr-card`, { params: { template, size, guest_url: guestUrl }, responseType: 'blob' })
+      .then(res => {
+        if (cancelled) return;
+        url = URL.createObjectURL(res.data);
+        setSrc(url);
+      })
+      .catch(() => { if (!cancelled) setFailed(true); });
+    return () => {
+      cancelled = true;
+      if (url) URL.revokeObjectURL(url);
+    };
+  }, [eventId, template, size, guestUrl]);
+
+  if (failed) return null;
+  return (
+    <div className="mt-4">
+      {src ? (
+        <img src={src} alt="QR card preview" data-testid="qr-card-preview" className="w-full max-w-md rounded-xl border border-slate-200 shadow-sm" />
+      ) : (
+        <div className="w-full max-w-md aspect-[5/4] rounded-xl bg-slate-100 animate-pulse" />
+      )}
+    </div>
+  );
+}
+
 function PaymentGate({ event, guestUrl, onSubmitted }) {
   const [selectedTemplate, setSelectedTemplate] = useState(null);
   const [selectedSize, setSelectedSize] = useState('10x8');
@@ -112,6 +146,9 @@ function PaymentGate({ event, guestUrl, onSubmitted }) {
               ))}
             </div>
           )}
+          {selectedTemplate && (
+            <QRCardPreview eventId={event.id} template={selectedTemplate.key} size={selectedSize} guestUrl={guestUrl} />
+          )}
         </div>
 
         {/* Step 2: Pay via PayPal */}
@@ -4,6 +4,8 @@ import { useDropzone } from 'react-dropzone';
 import axios from 'axios';
 import { getTemplate } from '../utils/themes';
 import { API } from '../utils/api';
+import { resumableUpload, RESUMABLE_THRESHOLD } from '../utils/resumableUpload';
+import { sha256Hex, checkUpload } from '../utils/hashFirst';
 import { Upload, Check, X, Image as ImageIcon, Video, Music } from 'lucide-react';
 
 function formatSize(bytes) {
@@ -12,6 +14,7 @@ function formatSize(bytes) {
 }
 
 const STATUS = { uploading: 'uploading', done: 'done', error: 'error' };
+const BATCH_FILES = 20;
 
 export default function GuestUpload() {
   const { slug } = useParams();
@@ -28,24 +31,24 @@ export default function GuestUpload() {
       .finally(() => setPageLoading(false));
   }, [slug]);
 
+  // Large files go up one at a time, in resumable chunks
   const uploadFile = useCallback(async (file) => {
     const uid = `${Date.now()}-${Math.random()}`;
     setUploads(prev => [...prev, {
       uid, name: file.name, size: file.size, progress: 0, status: STATUS.uploading
     }]);
 
-    const formData = new FormData();
-    formData.append('file', file);
-    formData.append('uploader_name', uploaderName || 'Guest');
+    const setProgress = (pct) => {
+      setUploads(prev => prev.map(u => u.uid === uid ? { ...u, progress: pct } : u));
+    };
 
     try {
-      await axios.post(`${API}/guest/event/${slug}/upload`, formData, {
-        headers: { 'Content-Type': 'multipart/form-data' },
-        onUploadProgress: (e) => {
-          const pct = e.total ? Math.round((e.loaded * 100) / e.total) : 0;
-          setUploads(prev => prev.map(u => u.uid === uid ? { ...u, progress: pct } : u));
-        }
-      });
+      const sha256 = await sha256Hex(file);
+      if (await checkUpload(slug, file, sha256, uploaderName || 'Guest')) {
+        setProgress(100); // already in the event: recorded without sending the bytes
+      } else {
+        await resumableUpload(slug, file, uploaderName || 'Guest', setProgress, sha256);
+      }
       setUploads(prev => prev.map(u =>
         u.uid === uid ? { ...u, progress: 100, status: STATUS.done } : u
       ));
@@ -57,15 +60,58 @@ export default function GuestUpload() {
     }
   }, [slug, uploaderName]);
 
+  // Small files go up together, BATCH_FILES per request
+  const uploadBatch = useCallback(async (files) => {
+    const items = files.map(file => ({ file, uid: `${Date.now()}-${Math.random()}` }));
+    setUploads(prev => [...prev, ...items.map(({ file, uid }) => ({
+      uid, name: file.name, size: file.size, progress: 0, status: STATUS.uploading
+    }))]);
+    const update = (uids, patch) => {
+      setUploads(prev => prev.map(u => uids.includes(u.uid) ? { ...u, ...patch } : u));
+    };
+    const name = uploaderName || 'Guest';
+
+    const hashes = [];
+    for (const file of files) hashes.push(await sha256Hex(file));
+    const known = await Promise.all(files.map((file, i) => checkUpload(slug, file, hashes[i], name)));
+    update(items.filter((_, i) => known[i]).map(item => item.uid), { progress: 100, status: STATUS.done });
+    const pending = items.map((item, i) => ({ ...item, sha256: hashes[i] })).filter((_, i) => !known[i]);
+    if (pending.length === 0) return;
+
+    const formData = new FormData();
+    for (const { file, sha256 } of pending) {
+      formData.append('files', file);
+      formData.append('sha256', sha256 || '');
+    }
+    formData.append('uploader_name', name);
+    const uids = pending.map(item => item.uid);
+    try {
+      const res = await axios.post(`${API}/guest/event/${slug}/upload/batch`, formData, {
+        headers: { 'Content-Type': 'multipart/form-data' },
+        onUploadProgress: (e) => update(uids, { progress: e.total ? Math.round((e.loaded * 100) / e.total) : 0 })
+      });
+      res.data.results.forEach((r, i) => update([uids[i]], r.ok
+        ? { progress: 100, status: STATUS.done }
+        : { status: STATUS.error, error: r.error }));
+    } catch (err) {
+      const msg = err.response?.data?.detail || 'Upload failed. Please try again.';
+      update(uids, { status: STATUS.error, error: msg });
+    }
+  }, [slug, uploaderName]);
+
   const onDrop = useCallback(async (acceptedFiles, rejectedFiles) => {
     if (rejectedFiles.length > 0) {
       const errs = rejectedFiles.map(r => `${r.file.name}: ${r.errors.map(e => e.message).join(', ')}`);
       alert(`Some files were rejected:\n${errs.join('\n')}`);
     }
-    for (const file of acceptedFiles) {
+    const small = acceptedFiles.filter(file => file.size <= RESUMABLE_THRESHOLD);
+    for (let i = 0; i < small.length; i += BATCH_FILES) {
+      await uploadBatch(small.slice(i, i + BATCH_FILES));
+    }
+    for (const file of acceptedFiles.filter(file => file.size > RESUMABLE_THRESHOLD)) {
       await uploadFile(file);
     }
-  }, [uploadFile]);
+  }, [uploadBatch, uploadFile]);
 
   const { getRootProps, getInputProps, isDragActive } = useDropzone({
     onDrop,
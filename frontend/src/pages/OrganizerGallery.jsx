@@ -2,6 +2,8 @@ import React, { useState, useEffect } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import Layout from '../components/Layout';
 import api, { BACKEND_URL, API } from '../utils/api';
+import { usePagedList } from '../hooks/use-paged-list';
+import LoadMore from '../components/LoadMore';
 import { Trash2, Download, Image as ImageIcon, Video, ArrowLeft, X, Music } from 'lucide-react';
 
 function formatSize(bytes) {
@@ -9,6 +11,47 @@ function formatSize(bytes) {
   return `${(bytes / 1024 / 1024).toFixed(1)} MB`;
 }
 
+const ON_DEMAND_WIDTHS = [320, 800, 1600];
+
+// srcset strings per format from the server-made renditions; until the worker has
+// made them, sizes are resized on demand (?w=) in whatever format the browser accepts
+function srcSets(m) {
+  if (!m.renditions || m.renditions.length === 0) {
+    const auto = ON_DEMAND_WIDTHS.map(w => `${BACKEND_URL}${m.url}?w=${w}&fmt=auto ${w}w`).join(', ');
+    return { webp: '', jpeg: auto };
+  }
+  const sets = {};
+  for (const r of m.renditions) {
+    (sets[r.format] = sets[r.format] || []).push(`${BACKEND_URL}${r.url} ${r.width}w`);
+  }
+  return { webp: (sets.webp || []).join(', '), jpeg: (sets.jpeg || []).join(', ') };
+}
+
+function Photo({ media, sizes, className, loading }) {
+  const { webp, jpeg } = srcSets(media);
+  return (
+    <picture className="contents">
+      {webp && <source type="image/webp" srcSet={webp} sizes={sizes} />}
+      <img
+        src={`${BACKEND_URL}${media.url}`}
+        srcSet={jpeg || undefined}
+        sizes={jpeg ? sizes : undefined}
+        alt={media.original_name}
+        className={className}
+        loading={loading}
+      />
+    </picture>
+  );
+}
+
+const GRID_SIZES = '(min-width: 1024px) 20vw, (min-width: 768px) 25vw, (min-width: 640px) 33vw, 50vw';
+
+// Newest uploads first, or the timeline: capture time (upload time if unknown), oldest first
+const MEDIA_ORDERS = {
+  uploaded: { label: 'Latest uploads', params: {} },
+  taken: { label: 'As it happened', params: { sort: 'taken_at', order: 'asc' } }
+};
+
 function formatDate(iso) {
   return new Date(iso).toLocaleDateString('en-GB', { day: 'numeric', month: 'short', year: 'numeric' });
 }
@@ -16,23 +59,20 @@ function formatDate(iso) {
 export default function OrganizerGallery() {
   const { id } = useParams();
   const navigate = useNavigate();
-  const [media, setMedia] = useState([]);
   const [event, setEvent] = useState(null);
-  const [loading, setLoading] = useState(true);
   const [filter, setFilter] = useState('all');
+  const [order, setOrder] = useState('uploaded');
+  const {
+    items: media, setItems: setMedia, loading, loadingMore, hasMore, loadMore
+  } = usePagedList(`/events/${id}/media`, MEDIA_ORDERS[order].params, { onError: () => navigate('/dashboard') });
   const [deleting, setDeleting] = useState(null);
   const [lightbox, setLightbox] = useState(null);
   const [downloading, setDownloading] = useState(false);
 
   useEffect(() => {
-    Promise.all([
-      api.get(`/events/${id}`),
-      api.get(`/events/${id}/media`)
-    ]).then(([evRes, mediaRes]) => {
-      setEvent(evRes.data);
-      setMedia(mediaRes.data);
-    }).catch(() => navigate('/dashboard'))
-      .finally(() => setLoading(false));
+    api.get(`/events/${id}`)
+      .then(res => setEvent(res.data))
+      .catch(() => navigate('/dashboard'));
   }, [id]);
 
   const handleDelete = async (mediaId, e) => {
@@ -42,6 +82,7 @@ export default function OrganizerGallery() {
     try {
       await api.delete(`/media/${mediaId}`);
       setMedia(prev => prev.filter(m => m.id !== mediaId));
+      setEvent(prev => prev ? { ...prev, media_count: prev.media_count - 1 } : prev);
       if (lightbox?.id === mediaId) setLightbox(null);
     } catch {
       alert('Failed to delete');
@@ -50,6 +91,9 @@ export default function OrganizerGallery() {
     }
   };
 
+  // The type counts cover the pages loaded so far; "+" while there are more
+  const more = hasMore ? '+' : '';
+  const totalCount = event ? event.media_count : media.length;
   const imageCount = media.filter(m => m.file_type === 'image').length;
   const videoCount = media.filter(m => m.file_type === 'video').length;
   const audioCount = media.filter(m => m.file_type === 'audio').length;
@@ -62,7 +106,7 @@ export default function OrganizerGallery() {
   });
 
   const handleBulkDownload = async () => {
-    if (media.length === 0) { alert('No files to download.'); return; }
+    if (totalCount === 0) { alert('No files to download.'); return; }
     setDownloading(true);
     try {
       const token = localStorage.getItem('snapvault_token');
@@ -103,9 +147,9 @@ export default function OrganizerGallery() {
           </button>
           <div className="max-w-4xl max-h-[85vh] relative" onClick={e => e.stopPropagation()}>
             {lightbox.file_type === 'image' ? (
-              <img
-                src={`${BACKEND_URL}${lightbox.url}`}
-                alt={lightbox.original_name}
+              <Photo
+                media={lightbox}
+                sizes="(min-width: 896px) 896px, 100vw"
                 className="max-w-full max-h-[80vh] rounded-xl object-contain"
               />
             ) : lightbox.file_type === 'audio' ? (
@@ -133,7 +177,8 @@ export default function OrganizerGallery() {
               <div>
                 <p className="text-white text-sm font-medium">{lightbox.original_name}</p>
                 <p className="text-white/50 text-xs mt-0.5">
-                  By {lightbox.uploader_name} · {formatSize(lightbox.file_size)} · {formatDate(lightbox.created_at)}
+                  By {lightbox.uploader_name} · {formatSize(lightbox.file_size)} · {formatDate(lightbox.taken_at)}
+                  {lightbox.metadata?.camera && ` · ${lightbox.metadata.camera}`}
                 </p>
               </div>
               <div className="flex gap-2">
@@ -173,7 +218,7 @@ export default function OrganizerGallery() {
             <div>
               <h2 className="text-lg font-bold text-slate-900">{event?.title}</h2>
               <p className="text-xs text-slate-400 mt-0.5">
-                {media.length} file{media.length !== 1 ? 's' : ''} · {imageCount} photos · {videoCount} videos{audioCount > 0 ? ` · ${audioCount} voice` : ''}
+                {totalCount} file{totalCount !== 1 ? 's' : ''} · {imageCount}{more} photos · {videoCount}{more} videos{audioCount > 0 ? ` · ${audioCount}${more} voice` : ''}
               </p>
             </div>
           </div>
@@ -183,7 +228,7 @@ export default function OrganizerGallery() {
             <button
               data-testid="bulk-download-btn"
               onClick={handleBulkDownload}
-              disabled={downloading || media.length === 0}
+              disabled={downloading || totalCount === 0}
               className="flex items-center gap-2 px-4 py-2 bg-emerald-600 text-white rounded-xl text-sm font-semibold hover:bg-emerald-700 disabled:opacity-40 transition-all active:scale-[0.98]"
             >
               {downloading ? (
@@ -197,10 +242,10 @@ export default function OrganizerGallery() {
             {/* Filter Tabs */}
             <div className="flex bg-slate-100 rounded-xl p-1 gap-0.5">
               {[
-                { key: 'all', label: `All (${media.length})` },
-                { key: 'images', label: `Photos (${imageCount})` },
-                { key: 'videos', label: `Videos (${videoCount})` },
-                ...(audioCount > 0 ? [{ key: 'audio', label: `Voice (${audioCount})` }] : [])
+                { key: 'all', label: `All (${totalCount})` },
+                { key: 'images', label: `Photos (${imageCount}${more})` },
+                { key: 'videos', label: `Videos (${videoCount}${more})` },
+                ...(audioCount > 0 ? [{ key: 'audio', label: `Voice (${audioCount}${more})` }] : [])
               ].map(f => (
                 <button
                   key={f.key}
@@ -216,6 +261,24 @@ export default function OrganizerGallery() {
                 </button>
               ))}
             </div>
+
+            {/* Order */}
+            <div className="flex bg-slate-100 rounded-xl p-1 gap-0.5">
+              {Object.entries(MEDIA_ORDERS).map(([key, o]) => (
+                <button
+                  key={key}
+                  data-testid={`order-${key}`}
+                  onClick={() => setOrder(key)}
+                  className={`px-3 py-1.5 text-xs font-semibold rounded-lg transition-all ${
+                    order === key
+                      ? 'bg-white shadow-sm text-slate-900'
+                      : 'text-slate-500 hover:text-slate-700'
+                  }`}
+                >
+                  {o.label}
+                </button>
+              ))}
+            </div>
           </div>
         </div>
 
@@ -236,7 +299,7 @@ export default function OrganizerGallery() {
             <p className="text-slate-500 text-sm">
               {media.length === 0
                 ? 'Share your event link and guests will start uploading.'
-                : 'Try switching to a different filter.'}
+                : hasMore ? 'Load more to look further back.' : 'Try switching to a different filter.'}
             </p>
           </div>
         ) : (
@@ -249,9 +312,9 @@ export default function OrganizerGallery() {
                 onClick={() => setLightbox(m)}
               >
                 {m.file_type === 'image' ? (
-                  <img
-                    src={`${BACKEND_URL}${m.url}`}
-                    alt={m.original_name}
+                  <Photo
+                    media={m}
+                    sizes={GRID_SIZES}
                     className="w-full h-full object-cover transition-transform duration-300 group-hover:scale-105"
                     loading="lazy"
                   />
@@ -310,6 +373,7 @@ export default function OrganizerGallery() {
             ))}
           </div>
         )}
+        {!loading && <LoadMore hasMore={hasMore} loading={loadingMore} onLoadMore={loadMore} testId="load-more-media" />}
       </div>
     </Layout>
   );
@@ -25,4 +25,10 @@ api.interceptors.response.use(
   }
 );
 
+// One page of a keyset-paginated listing, and the X-Next-Cursor to pass for the next (null on the last page).
+export async function fetchPage(path, params = {}, cursor = null) {
+  const res = await api.get(path, { params: cursor ? { ...params, cursor } : params });
+  return { rows: res.data, cursor: res.headers['x-next-cursor'] || null };
+}
+
 export default api;
@@ -0,0 +1,33 @@
+import axios from 'axios';
+import { API } from './api';
+
+// Hash-first uploads: the file's SHA-256 is posted before its bytes. If the event
+// already has exactly that content (a re-upload, or a photo forwarded between
+// guests) the server records it straight away and nothing is transferred. The
+// hash also goes along with a real upload, so the server can verify what arrived.
+export async function sha256Hex(file) {
+  if (!window.crypto?.subtle) return null; // WebCrypto needs HTTPS (or localhost)
+  try {
+    const digest = await window.crypto.subtle.digest('SHA-256', await file.arrayBuffer());
+    return Array.from(new Uint8Array(digest), b => b.toString(16).padStart(2, '0')).join('');
+  } catch {
+    return null; // e.g. not enough memory for a large video: just upload it
+  }
+}
+
+// The new media if the server already had the content, otherwise null
+export async function checkUpload(slug, file, sha256, uploaderName) {
+  if (!sha256) return null;
+  try {
+    const res = await axios.post(`${API}/guest/event/${slug}/upload/check`, {
+      sha256,
+      size: file.size,
+      filename: file.name,
+      content_type: file.type,
+      uploader_name: uploaderName
+    });
+    return res.data.exists ? res.data : null;
+  } catch {
+    return null; // the check only saves bandwidth; fall back to a normal upload
+  }
+}
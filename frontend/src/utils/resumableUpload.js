@@ -0,0 +1,92 @@
+import axios from 'axios';
+import { API } from './api';
+
+// Large guest uploads go through the resumable endpoints: the file is sent in
+// chunks, a few at a time, and a dropped connection only costs the chunk in
+// flight. The session id is kept in localStorage, so picking the same file
+// again after a reload sends only what the server is still missing.
+export const RESUMABLE_THRESHOLD = 8 * 1024 * 1024;
+const PARALLEL_CHUNKS = 3;
+const MAX_RETRIES = 6;
+
+const sleep = ms => new Promise(resolve => setTimeout(resolve, ms));
+
+function storageKey(slug, file) {
+  return `snapvault_upload:${slug}:${file.name}:${file.size}:${file.lastModified}`;
+}
+
+async function withRetry(request) {
+  for (let attempt = 0; ; attempt++) {
+    try {
+      return await request();
+    } catch (err) {
+      const status = err.response?.status;
+      // Client errors won't go away on retry; network errors and 5xx might
+      if (attempt >= MAX_RETRIES || (status && status < 500 && status !== 408 && status !== 429)) throw err;
+      await sleep(Math.min(1000 * 2 ** attempt, 30000));
+    }
+  }
+}
+
+async function openSession(slug, file, uploaderName, sha256) {
+  const key = storageKey(slug, file);
+  const saved = localStorage.getItem(key);
+  if (saved) {
+    try {
+      return (await axios.get(`${API}/guest/uploads/${saved}`)).data;
+    } catch {
+      localStorage.removeItem(key); // expired: start again
+    }
+  }
+  const res = await withRetry(() => axios.post(`${API}/guest/event/${slug}/uploads`, {
+    filename: file.name,
+    content_type: file.type,
+    size: file.size,
+    uploader_name: uploaderName,
+    sha256
+  }));
+  localStorage.setItem(key, res.data.id);
+  return { ...res.data, status: 'open', missing: [[0, file.size]] };
+}
+
+export async function resumableUpload(slug, file, uploaderName, onProgress, sha256 = null) {
+  const session = await openSession(slug, file, uploaderName, sha256);
+  const url = `${API}/guest/uploads/${session.id}`;
+
+  if (session.status !== 'complete') {
+    const chunks = [];
+    for (const [start, end] of session.missing) {
+      for (let offset = start; offset < end; offset += session.chunk_size) {
+        chunks.push([offset, Math.min(offset + session.chunk_size, end)]);
+      }
+    }
+    let done = file.size - chunks.reduce((n, [start, end]) => n + end - start, 0);
+    const inFlight = new Map();
+    const report = () => {
+      const sent = [...inFlight.values()].reduce((a, b) => a + b, 0);
+      onProgress(Math.round(((done + sent) * 100) / file.size));
+    };
+
+    let next = 0;
+    const sendChunks = async () => {
+      while (next < chunks.length) {
+        const [start, end] = chunks[next++];
+        await withRetry(() => {
+          inFlight.set(start, 0);
+          return axios.patch(url, file.slice(start, end), {
+            headers: { 'Content-Type': 'application/offset+octet-stream', 'Upload-Offset': String(start) },
+            onUploadProgress: e => { inFlight.set(start, e.loaded); report(); }
+          });
+        });
+        inFlight.delete(start);
+        done += end - start;
+        report();
+      }
+    };
+    await Promise.all(Array.from({ length: PARALLEL_CHUNKS }, sendChunks));
+  }
+
+  const res = await withRetry(() => axios.post(`${url}/finalize`));
+  localStorage.removeItem(storageKey(slug, file));
+  return res.data;
+}